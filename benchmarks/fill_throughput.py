@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+
+# Copyright 2016 DIANA-HEP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Fill-throughput benchmark: rows per second and peak memory of filling every primitive and common nestings.
+
+Modes: "fill" (row by row, from dicts), "numpy" (fill.numpy of a pandas DataFrame), "pandas" (make_histograms of
+a pandas DataFrame) and "spark" (make_histograms of a local Spark DataFrame, if pyspark is installed).
+Each case runs in a forked process, so that its peak resident memory is its own; "fill_rss_mb" is the growth of
+the peak over the memory held before filling (the data included).
+
+Usage:
+    python benchmarks/fill_throughput.py [--rows N] [--fill-rows N] [--repeat N] [--modes fill,numpy,pandas]
+                                         [--cases REGEX] [--output results.json]
+    python benchmarks/fill_throughput.py --compare baseline.json results.json [--tolerance 0.1]
+
+The comparison exits with status 1 if any case got slower, or uses more memory, beyond the tolerance.
+make_histograms prints progress bars to stderr; redirect it (2>/dev/null) to see only the results.
+"""
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import re
+import resource
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import histogrammar as hg
+from histogrammar.dfinterface.make_histograms import make_histograms
+from histogrammar.version import version
+
+MODES = ("fill", "numpy", "pandas", "spark")
+
+
+def generate_data(rows, seed=0):
+    """Synthetic DataFrame with numeric, categorical, timestamp and high-cardinality columns.
+
+    Columns: "x" (normal, 1% NaN), "y" (exponential), "i" (Poisson integers), "flag" (booleans), "cat" (10
+    categories of Zipf-like frequencies), "hicard" (about rows/2 distinct strings), "ts" (timestamps over two
+    years) and "ts_ns" (the same timestamps as integer nanoseconds).
+    """
+    rng = np.random.default_rng(seed)
+    x = rng.normal(size=rows)
+    x[rng.random(rows) < 0.01] = np.nan
+    frequencies = 1.0 / np.arange(1, 11)
+    categories = np.array(["category_{0}".format(k) for k in range(10)])
+    ts = np.datetime64("2020-01-01", "ns") + rng.integers(0, 730 * 86400, size=rows).astype("timedelta64[s]")
+    return pd.DataFrame({
+        "x": x,
+        "y": rng.exponential(size=rows),
+        "i": rng.poisson(5.0, size=rows),
+        "flag": rng.random(rows) < 0.3,
+        "cat": categories[rng.choice(10, size=rows, p=frequencies / frequencies.sum())],
+        "hicard": np.char.add("id", rng.integers(0, max(rows // 2, 1), size=rows).astype(str)).astype(object),
+        "ts": ts,
+        "ts_ns": ts.astype(np.int64),
+    })
+
+
+DAY = 86400e9
+
+# every primitive, filled with the columns of generate_data
+PRIMITIVES = {
+    # a Count made on its own has no fill.numpy until specialized
+    "Count": lambda: hg.Count().specialize(),
+    "Sum": lambda: hg.Sum("y"),
+    "Average": lambda: hg.Average("y"),
+    "Deviate": lambda: hg.Deviate("y"),
+    "Minimize": lambda: hg.Minimize("y"),
+    "Maximize": lambda: hg.Maximize("y"),
+    "Bag[numeric]": lambda: hg.Bag("i", "N"),
+    "Bag[string]": lambda: hg.Bag("cat", "S"),
+    "Bin": lambda: hg.Bin(100, -5.0, 5.0, "x"),
+    "SparselyBin": lambda: hg.SparselyBin(0.1, "x"),
+    "SparselyBin[timestamp]": lambda: hg.SparselyBin(DAY, "ts_ns"),
+    "CentrallyBin": lambda: hg.CentrallyBin([-3.0, -1.0, -0.5, 0.0, 0.5, 1.0, 3.0], "x"),
+    "IrregularlyBin": lambda: hg.IrregularlyBin([-3.0, -1.0, -0.5, 0.0, 0.5, 1.0, 3.0], "x"),
+    "Categorize": lambda: hg.Categorize("cat"),
+    "Categorize[bool]": lambda: hg.Categorize("flag"),
+    "Categorize[high-cardinality]": lambda: hg.Categorize("hicard"),
+    "Fraction": lambda: hg.Fraction("x > 0", hg.Count()),
+    "Select": lambda: hg.Select("x > 0", hg.Count()),
+    "Stack": lambda: hg.Stack([-1.0, 0.0, 1.0], "x"),
+    "Label": lambda: hg.Label(x=hg.Bin(100, -5.0, 5.0, "x"), y=hg.Bin(100, 0.0, 10.0, "y")),
+    "UntypedLabel": lambda: hg.UntypedLabel(x=hg.Bin(100, -5.0, 5.0, "x"), y=hg.Sum("y")),
+    "Index": lambda: hg.Index(hg.Bin(100, -5.0, 5.0, "x"), hg.Bin(100, 0.0, 10.0, "y")),
+    "Branch": lambda: hg.Branch(hg.Bin(100, -5.0, 5.0, "x"), hg.Categorize("cat")),
+}
+
+# common nestings: profiles, 2d and 3d histograms, histograms over time
+NESTINGS = {
+    "Bin:Average": lambda: hg.Bin(100, -5.0, 5.0, "x", hg.Average("y")),
+    "Bin:Bin": lambda: hg.Bin(20, -5.0, 5.0, "x", hg.Bin(20, 0.0, 10.0, "y")),
+    "SparselyBin:Categorize": lambda: hg.SparselyBin(0.1, "x", hg.Categorize("cat")),
+    "Categorize:SparselyBin": lambda: hg.Categorize("cat", hg.SparselyBin(0.1, "x")),
+    "SparselyBin[timestamp]:Categorize": lambda: hg.SparselyBin(DAY, "ts_ns", hg.Categorize("cat")),
+    "SparselyBin[timestamp]:Bin:Categorize": lambda: hg.SparselyBin(
+        DAY, "ts_ns", hg.Bin(10, -5.0, 5.0, "x", hg.Categorize("cat"))),
+}
+
+# features of make_histograms
+FEATURES = {
+    "numeric": ["x", "y", "i"],
+    "categorical": ["cat", "flag"],
+    "high-cardinality": ["hicard"],
+    "timestamp": ["ts"],
+    "2d": ["x:y", "cat:x"],
+    "timestamp:2d": ["ts:x", "ts:cat"],
+    "timestamp:3d": ["ts:x:cat"],
+}
+
+
+def cases(modes, pattern=None):
+    """(mode, case) pairs to run, optionally only those with a case name matching a regular expression."""
+    out = []
+    for mode in modes:
+        names = list(FEATURES) if mode in ("pandas", "spark") else list(PRIMITIVES) + list(NESTINGS)
+        out.extend((mode, name) for name in names if pattern is None or re.search(pattern, name))
+    return out
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024.0 ** 2 if sys.platform == "darwin" else 1024.0)
+
+
+def _spark_session():
+    from pyspark.sql import SparkSession
+    from pyspark import __version__ as pyspark_version
+
+    jars = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "jars")
+    scala = "2.12" if int(pyspark_version[0]) >= 3 else "2.11"
+    hist_spark_jar = os.path.join(jars, "histogrammar-sparksql_{0}-1.0.20.jar".format(scala))
+    hist_jar = os.path.join(jars, "histogrammar_{0}-1.0.20.jar".format(scala))
+    return (SparkSession.builder.master("local")
+            .appName("histogrammar-benchmark")
+            .config("spark.jars", "{0},{1}".format(hist_spark_jar, hist_jar))
+            .config("spark.sql.session.timeZone", "GMT")
+            .getOrCreate())
+
+
+def measure(mode, case, data, repeat, spark=None):
+    """Best time of ``repeat`` fills of one case, and the peak memory of the process.
+
+    :param str mode: "fill", "numpy", "pandas" or "spark"
+    :param str case: name of a primitive or nesting ("fill", "numpy"), or of a feature set ("pandas", "spark")
+    :param data: pandas DataFrame to fill with; for "fill", a list of dicts
+    :param int repeat: number of fills
+    :param spark: Spark session, for "spark"
+    :returns: dict with the seconds of the best fill and the memory in MB
+    """
+    if mode == "spark":
+        data = spark.createDataFrame(data.drop(columns=["ts_ns"]))
+    before = _peak_rss_mb()
+    best = float("inf")
+    for _ in range(repeat):
+        if mode in ("pandas", "spark"):
+            start = time.perf_counter()
+            make_histograms(data, features=FEATURES[case])
+        else:
+            hist = dict(PRIMITIVES, **NESTINGS)[case]()
+            if mode == "fill":
+                start = time.perf_counter()
+                for datum in data:
+                    hist.fill(datum)
+            else:
+                start = time.perf_counter()
+                hist.fill.numpy(data)
+        best = min(best, time.perf_counter() - start)
+    peak = _peak_rss_mb()
+    return {"seconds": best, "peak_rss_mb": peak, "fill_rss_mb": peak - before}
+
+
+def _measure_in_child(connection, mode, case, data, repeat):
+    try:
+        connection.send(measure(mode, case, data, repeat))
+    except Exception as err:
+        connection.send(err)
+    finally:
+        connection.close()
+
+
+def run(rows=1000000, fill_rows=20000, repeat=3, modes=("fill", "numpy", "pandas"), pattern=None, seed=0,
+        isolate=True, report=None):
+    """Run the benchmark cases and collect their results.
+
+    :param int rows: rows of data for "numpy", "pandas" and "spark"
+    :param int fill_rows: rows of data for "fill" (row by row)
+    :param int repeat: number of fills per case; the fastest counts
+    :param modes: modes to run; "spark" is skipped if pyspark is not installed
+    :param str pattern: regular expression of the case names to run (default all)
+    :param int seed: seed of the synthetic data
+    :param bool isolate: run each case in a forked process, so that its peak memory is its own (where fork is
+        available; Spark cases always run in this process)
+    :param report: function called with each result as it is made, e.g. to print it
+    :returns: dict with the metadata of the run and the list of results
+    :rtype: dict
+    """
+    spark = None
+    if "spark" in modes:
+        try:
+            spark = _spark_session()
+        except ImportError:
+            modes = [m for m in modes if m != "spark"]
+    isolate = isolate and "fork" in multiprocessing.get_all_start_methods()
+
+    data = generate_data(max(rows, fill_rows), seed)
+    records = data.head(fill_rows).drop(columns=["ts"]).to_dict("records")
+    results = []
+    for mode, case in cases(modes, pattern):
+        n = fill_rows if mode == "fill" else rows
+        inputs = records if mode == "fill" else data.head(n)
+        if isolate and mode != "spark":
+            receiver, sender = multiprocessing.get_context("fork").Pipe(duplex=False)
+            child = multiprocessing.get_context("fork").Process(
+                target=_measure_in_child, args=(sender, mode, case, inputs, repeat))
+            child.start()
+            sender.close()
+            result = receiver.recv()
+            child.join()
+            if isinstance(result, Exception):
+                raise result
+        else:
+            result = measure(mode, case, inputs, repeat, spark)
+        result = dict(mode=mode, case=case, rows=n, rows_per_sec=n / result["seconds"], **result)
+        results.append(result)
+        if report is not None:
+            report(result)
+
+    meta = {"date": datetime.datetime.now().isoformat(timespec="seconds"), "histogrammar": version,
+            "python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "platform": platform.platform(), "cpus": os.cpu_count(), "rows": rows, "fill_rows": fill_rows,
+            "repeat": repeat, "seed": seed, "isolated": isolate}
+    if spark is not None:
+        meta["spark"] = spark.version
+    return {"meta": meta, "results": results}
+
+
+def compare(baseline, current, tolerance=0.1):
+    """Compare two benchmark results, case by case.
+
+    A case regresses if its rows per second dropped by more than ``tolerance`` (a fraction), or if the memory
+    it uses to fill grew by more than that fraction plus 1 MB.
+
+    :param dict baseline: output of :func:`run`, e.g. loaded from its JSON file
+    :param dict current: output of :func:`run`, to compare with the baseline
+    :param float tolerance: allowed relative change, default 0.1
+    :returns: list of dicts, one per case in both results, with the ratios and whether the case regressed
+    """
+    before = dict(((r["mode"], r["case"]), r) for r in baseline["results"])
+    out = []
+    for result in current["results"]:
+        old = before.get((result["mode"], result["case"]))
+        if old is None:
+            continue
+        speed = result["rows_per_sec"] / old["rows_per_sec"]
+        memory = result["fill_rss_mb"] - old["fill_rss_mb"]
+        out.append({"mode": result["mode"], "case": result["case"], "speed_ratio": speed, "fill_rss_change_mb": memory,
+                    "slower": speed < 1.0 - tolerance,
+                    "larger": memory > tolerance * max(old["fill_rss_mb"], 0.0) + 1.0})
+    return out
+
+
+def _print_result(result):
+    print("{mode:7s} {case:40s} {rows_per_sec:14,.0f} rows/s  peak {peak_rss_mb:8.1f} MB  "
+          "fill {fill_rss_mb:+8.1f} MB".format(**result))
+    sys.stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--fill-rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--modes", default="fill,numpy,pandas,spark",
+                        help="comma-separated subset of " + ",".join(MODES))
+    parser.add_argument("--cases", default=None, help="regular expression of the case names to run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-isolate", action="store_true", help="run all cases in this process")
+    parser.add_argument("--output", default=None, help="JSON file to write the results to")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="compare two JSON results")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        with open(args.compare[0]) as baseline, open(args.compare[1]) as current:
+            rows = compare(json.load(baseline), json.load(current), args.tolerance)
+        for row in rows:
+            flags = " ".join(name for name in ("slower", "larger") if row[name])
+            print("{mode:7s} {case:40s} {speed_ratio:6.2f}x  fill {fill_rss_change_mb:+8.1f} MB  {0}".format(
+                flags, **row))
+        regressions = sum(row["slower"] or row["larger"] for row in rows)
+        print("{0} of {1} cases regressed".format(regressions, len(rows)))
+        sys.exit(1 if regressions > 0 else 0)
+
+    modes = [m for m in args.modes.split(",") if m]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error("unknown modes {0}; choose from {1}".format(sorted(unknown), ",".join(MODES)))
+    results = run(args.rows, args.fill_rows, args.repeat, modes, args.cases, args.seed, not args.no_isolate,
+                  report=_print_result)
+    if args.output is not None:
+        with open(args.output, "w") as stream:
+            json.dump(results, stream, indent=2)
+
+
+if __name__ == "__main__":
+    main()
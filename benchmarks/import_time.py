@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+# Copyright 2016 DIANA-HEP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Startup-time benchmark: wall time of "import histogrammar" in fresh interpreters.
+
+Usage: python benchmarks/import_time.py [--repeat N] [--statement "import histogrammar; ..."]
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+
+
+def import_time(statement, repeat):
+    """Run ``statement`` in ``repeat`` fresh interpreters and return the wall times in seconds."""
+    subprocess.run([sys.executable, "-c", statement], check=True)  # warm up the OS file cache
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--statement", default="import histogrammar")
+    args = parser.parse_args()
+
+    interpreter = min(import_time("pass", args.repeat))
+    times = import_time(args.statement, args.repeat)
+    print("{0}: best {1:.1f} ms, median {2:.1f} ms (interpreter startup {3:.1f} ms subtracted)".format(
+        args.statement, 1e3 * (min(times) - interpreter), 1e3 * (sorted(times)[len(times) // 2] - interpreter),
+        1e3 * interpreter))
+
+
+if __name__ == "__main__":
+    main()
@@ -43,5 +43,57 @@ from histogrammar.convenience import SparselyProfileErr
 from histogrammar.convenience import TwoDimensionallyHistogram
 from histogrammar.convenience import TwoDimensionallySparselyHistogram
 
-# handy monkey patch functions for pandas and spark dataframes
-import histogrammar.dfinterface
+import importlib
+import importlib.util
+import sys
+
+# Everything below is imported on first use only (PEP 562), to keep "import histogrammar" fast: plotting pulls in
+# matplotlib/bokeh, and the C99/CUDA code generators pull in the vendored pycparser. (The dataframe interface is
+# imported right away if pandas or pyspark is installed, see below.) The primitives above are imported eagerly, because Factory.fromJson needs them
+# to be registered.
+_lazySubmodules = frozenset(["comparison", "dfinterface", "parsing", "plot", "pycparser", "resources", "specialized",
+                             "store", "streaming"])
+_lazyAttributes = {
+    # memory-mapped on-disk store of many containers
+    "HistogramStore": "histogrammar.store",
+    # time-windowed aggregation of micro-batch streams
+    "WindowedAggregator": "histogrammar.streaming",
+    "LocalStream": "histogrammar.streaming",
+}
+
+
+def __getattr__(name):
+    if name in _lazySubmodules:
+        return importlib.import_module("histogrammar." + name)
+    if name in _lazyAttributes:
+        value = getattr(importlib.import_module(_lazyAttributes[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module 'histogrammar' has no attribute '{0}'".format(name))
+
+
+def __dir__():
+    return sorted(set(globals()) | _lazySubmodules | set(_lazyAttributes))
+
+
+def add_dataframe_methods():
+    """Add the hg_* methods (``hg_make_histograms``, ``hg_Bin``, ...) to the pandas and Spark DataFrame classes.
+
+    It is called when histogrammar is imported, if pandas or pyspark is installed. (It imports pandas and
+    pyspark.sql, if installed.)
+    """
+    from histogrammar.dfinterface import add_pandas_methods, add_sparksql_methods
+    if "pandas" in sys.modules:
+        add_pandas_methods(cls=sys.modules["pandas"].DataFrame, prefix="hg_")
+    if "pyspark.sql" in sys.modules:
+        try:
+            add_sparksql_methods(cls=sys.modules["pyspark.sql"].DataFrame, prefix="hg_")
+        except AttributeError:
+            pass
+
+
+# handy monkey patch functions for pandas and spark dataframes, if they are installed (this imports them)
+if "pandas" in sys.modules or "pyspark.sql" in sys.modules or \
+        any(importlib.util.find_spec(x) is not None for x in ("pandas", "pyspark")):
+    add_dataframe_methods()
+
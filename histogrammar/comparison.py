@@ -0,0 +1,233 @@
+# Copyright (c) 2021 ING Wholesale Banking Advanced Analytics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Distance statistics between pairs of histograms: chi², Kolmogorov-Smirnov, PSI and Jensen-Shannon.
+
+Two histograms are first aligned: the union of their bin keys is taken as a sorted array, and the entries of
+both are looked up in it with ``numpy.searchsorted`` (through the containers' cached sorted bin index, see
+``histogrammar.util.binIndex``), so bins present in only one of them get zero entries in the other.
+The statistics are computed on the aligned arrays, for one pair or for a batch of pairs at once (rows of a
+2-d array, padded with empty bins).
+
+Only the top level of a container is compared: entries of nested sub-aggregators are projected out.
+The Kolmogorov-Smirnov distance uses the order of the keys, which for Categorize is alphabetical.
+
+Example:
+
+.. code-block:: python
+
+    from histogrammar.comparison import compare, compare_many
+
+    compare(reference, current)
+    # {'chi2': 12.3, 'ndof': 9, 'ks': 0.02, 'psi': 0.004, 'js': 0.001}
+    compare_many([(reference, h) for h in daily_hists], statistics=["psi", "js"])
+    # {'psi': array([...]), 'js': array([...])}
+"""
+
+import numpy as np
+
+from histogrammar.util import binIndex
+
+STATISTICS = ("chi2", "ks", "psi", "js")
+
+
+def _axis(hist):
+    """Binning signature, sorted keys and entries of the top level of a container."""
+    name = hist.name
+    if name == "Bin":
+        return (name, hist.num, hist.low, hist.high), np.arange(hist.num), binIndex(hist).entries
+    if name in ("IrregularlyBin", "CentrallyBin"):
+        edges = tuple(x for x, _ in hist.bins)
+        entries = np.fromiter((v.entries for _, v in hist.bins), dtype=np.float64, count=len(hist.bins))
+        return (name, edges), np.arange(len(edges)), entries
+    if name == "SparselyBin":
+        return (name, hist.binWidth, hist.origin), binIndex(hist), None
+    if name == "Categorize":
+        return (name,), binIndex(hist), None
+    raise TypeError("cannot compare {0} containers; only Bin, SparselyBin, Categorize, IrregularlyBin and "
+                    "CentrallyBin".format(name))
+
+
+def align(hist1, hist2):
+    """Align the bins of two histograms with the same binning.
+
+    :param hist1: first histogram (Bin, SparselyBin, Categorize, IrregularlyBin or CentrallyBin)
+    :param hist2: second histogram, of the same type and binning as the first
+    :returns: sorted union of the bin keys, and the entries of both histograms at these keys (zero where a
+        histogram has no bin)
+    :rtype: tuple of three numpy arrays
+    """
+    signature1, keys1, entries1 = _axis(hist1)
+    signature2, keys2, entries2 = _axis(hist2)
+    if signature1 != signature2:
+        raise ValueError("cannot compare histograms with different binnings: {0} and {1}".format(
+            signature1, signature2))
+    if entries1 is not None:
+        # fixed binning: the bins are the same
+        return keys1, entries1, entries2
+
+    index1, index2 = keys1, keys2
+    if len(index1) == 0 or len(index2) == 0:
+        keys = index2.keys if len(index1) == 0 else index1.keys
+    elif index1.keys.dtype == object or index2.keys.dtype == object:
+        # categories of mixed types can't be sorted; keep first-seen order
+        keys = np.array(list(dict.fromkeys(index1.keys.tolist() + index2.keys.tolist())), dtype=object)
+    else:
+        keys = np.union1d(index1.keys, index2.keys)
+    lookupKeys = keys.tolist() if keys.dtype == object else keys
+    return keys, index1.lookup(lookupKeys), index2.lookup(lookupKeys)
+
+
+def align_many(pairs):
+    """Align the bins of many pairs of histograms, into two 2-d arrays.
+
+    :param pairs: iterable of pairs of histograms, each pair as for :func:`align`
+    :returns: entries of the first and the second histograms of each pair, one row per pair. Rows are padded
+        with empty bins to the length of the longest one (empty bins don't change any of the statistics).
+    :rtype: tuple of two numpy arrays
+    """
+    aligned = [align(h1, h2)[1:] for h1, h2 in pairs]
+    width = max([len(e1) for e1, _ in aligned] + [0])
+    entries1 = np.zeros((len(aligned), width))
+    entries2 = np.zeros((len(aligned), width))
+    for i, (e1, e2) in enumerate(aligned):
+        entries1[i, :len(e1)] = e1
+        entries2[i, :len(e2)] = e2
+    return entries1, entries2
+
+
+def chi2(entries1, entries2):
+    """Chi² of two histograms with possibly different totals, summed over bins that are not empty in both.
+
+    Computes ``sum((N2 * n1 - N1 * n2)**2 / (N1 * N2 * (n1 + n2)))`` with ``N1``, ``N2`` the totals; NaN if
+    either histogram is empty.
+
+    :param entries1: aligned entries of the first histogram(s), bins along the last axis
+    :param entries2: aligned entries of the second histogram(s)
+    :returns: chi² and number of degrees of freedom (bins not empty in both, minus one)
+    :rtype: tuple
+    """
+    entries1, entries2 = np.asarray(entries1, dtype=np.float64), np.asarray(entries2, dtype=np.float64)
+    total1 = entries1.sum(axis=-1, keepdims=True)
+    total2 = entries2.sum(axis=-1, keepdims=True)
+    both = entries1 + entries2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = (total2 * entries1 - total1 * entries2) ** 2 / (total1 * total2 * both)
+        terms = np.where(both > 0, terms, 0.0)
+    value = terms.sum(axis=-1)
+    value = np.where((total1[..., 0] > 0) & (total2[..., 0] > 0), value, np.nan)
+    return value, np.count_nonzero(both > 0, axis=-1) - 1
+
+
+def _probabilities(entries):
+    entries = np.asarray(entries, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return entries / entries.sum(axis=-1, keepdims=True)
+
+
+def ks(entries1, entries2):
+    """Kolmogorov-Smirnov distance: maximum difference between the normalized cumulative distributions.
+
+    :param entries1: aligned entries of the first histogram(s), bins along the last axis
+    :param entries2: aligned entries of the second histogram(s)
+    :returns: KS distance, between 0 and 1 (NaN if either histogram is empty)
+    """
+    cdf1 = np.cumsum(_probabilities(entries1), axis=-1)
+    cdf2 = np.cumsum(_probabilities(entries2), axis=-1)
+    if cdf1.shape[-1] == 0:
+        return np.zeros(cdf1.shape[:-1])
+    return np.abs(cdf1 - cdf2).max(axis=-1)
+
+
+def psi(entries1, entries2, epsilon=1e-4):
+    """Population stability index: ``sum((p - q) * ln(p / q))`` of the normalized distributions ``p`` and ``q``.
+
+    :param entries1: aligned entries of the first (reference) histogram(s), bins along the last axis
+    :param entries2: aligned entries of the second histogram(s)
+    :param float epsilon: lower bound of the bin probabilities, so that bins empty in one histogram only give a
+        finite contribution. Default is 1e-4.
+    :returns: PSI, zero for identical distributions (NaN if either histogram is empty)
+    """
+    p = np.maximum(_probabilities(entries1), epsilon)
+    q = np.maximum(_probabilities(entries2), epsilon)
+    return ((p - q) * np.log(p / q)).sum(axis=-1)
+
+
+def js(entries1, entries2):
+    """Jensen-Shannon divergence of the normalized distributions, in bits.
+
+    :param entries1: aligned entries of the first histogram(s), bins along the last axis
+    :param entries2: aligned entries of the second histogram(s)
+    :returns: JS divergence, between 0 and 1 (NaN if either histogram is empty)
+    """
+    p = _probabilities(entries1)
+    q = _probabilities(entries2)
+    m = 0.5 * (p + q)
+
+    def kl(a):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(a > 0, a * np.log2(a / m), 0.0).sum(axis=-1)
+
+    out = 0.5 * kl(p) + 0.5 * kl(q)
+    return np.where(np.isnan(m).any(axis=-1), np.nan, out)
+
+
+def _statistics(entries1, entries2, statistics, epsilon):
+    statistics = STATISTICS if statistics is None else statistics
+    unknown = set(statistics) - set(STATISTICS)
+    if unknown:
+        raise ValueError("unknown statistics {0}; choose from {1}".format(sorted(unknown), STATISTICS))
+    out = {}
+    for name in statistics:
+        if name == "chi2":
+            out["chi2"], out["ndof"] = chi2(entries1, entries2)
+        elif name == "psi":
+            out["psi"] = psi(entries1, entries2, epsilon)
+        else:
+            out[name] = globals()[name](entries1, entries2)
+    return out
+
+
+def compare(hist1, hist2, statistics=None, epsilon=1e-4):
+    """Compare two histograms with the same binning.
+
+    :param hist1: first (reference) histogram
+    :param hist2: second histogram
+    :param list statistics: names of the statistics to compute, from "chi2", "ks", "psi" and "js". Default is all.
+    :param float epsilon: lower bound of bin probabilities for the PSI, see :func:`psi`.
+    :returns: dict of statistic name to value; "chi2" comes with its number of degrees of freedom "ndof"
+    :rtype: dict
+    """
+    _, entries1, entries2 = align(hist1, hist2)
+    return dict((k, v.item()) for k, v in _statistics(entries1, entries2, statistics, epsilon).items())
+
+
+def compare_many(pairs, statistics=None, epsilon=1e-4):
+    """Compare many pairs of histograms at once; each pair as for :func:`compare`.
+
+    The pairs are aligned one by one, and all statistics are computed in one vectorized step over all pairs.
+
+    :param pairs: iterable of pairs of histograms, e.g. ``[(reference, h) for h in hists]``
+    :param list statistics: names of the statistics to compute, from "chi2", "ks", "psi" and "js". Default is all.
+    :param float epsilon: lower bound of bin probabilities for the PSI, see :func:`psi`.
+    :returns: dict of statistic name to numpy array, with one value per pair
+    :rtype: dict
+    """
+    entries1, entries2 = align_many(pairs)
+    return _statistics(entries1, entries2, statistics, epsilon)
@@ -16,10 +16,12 @@
 
 import base64
 import datetime
+import hashlib
 import json as jsonlib
 import math
 import random
 import re
+import types
 
 try:
     from collections import OrderedDict
@@ -49,12 +51,12 @@ except ImportError:
         def __len__(self):
             return len(self.keys)
 
-from histogrammar.util import FillMethod, PlotMethod, basestring, xrange, named
-from histogrammar.parsing import C99SourceToAst
-from histogrammar.parsing import C99AstToSource
-from histogrammar.pycparser import c_ast
+from histogrammar.util import FillMethod, PlotMethod, UserFcn, basestring, xrange, named
 import histogrammar.version
 
+# the C99/CUDA code generators (histogrammar.parsing and the vendored pycparser) are only imported on first use,
+# to keep "import histogrammar" fast.
+
 
 class ContainerException(Exception):
     """Exception type for improperly configured containers."""
@@ -177,6 +179,13 @@ class Factory(object):
             raise JsonFormatException(json, "Factory")
 
 
+class _NativeFiller(object):
+    """Stands in for a Cling filler object in ``_clingUpdate``, holding the ctypes mirror of native storage."""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+
 class Container(object):
     """Interface for classes that contain aggregated data, such as "Count" or "Bin".
 
@@ -243,6 +252,11 @@ class Container(object):
             # for which specialized fill and plot methods are not needed.
             if s in state:
                 del state[s]
+        # JVM objects can't be pickled
+        state.pop("_sparksqlCache", None)
+        state.pop("_metadataCache", None)
+        state.pop("_binIndexCache", None)
+        state.pop("_distributionCache", None)
         return state
 
     def __setstate__(self, dict):
@@ -297,12 +311,14 @@ class Container(object):
         return Factory.fromJson(self.toJson())
 
     _clingClassNameNumber = 0
+    _clingClassNames = {}
 
     def fillroot(self, ttree, start=-1, end=-1, debug=False, debugOnError=True, **exprs):
         self._checkForCrossReferences()
 
         if not hasattr(self, "_clingFiller"):
             import ROOT
+            from histogrammar.parsing import C99SourceToAst, C99AstToSource
 
             parser = C99SourceToAst()
             generator = C99AstToSource()
@@ -391,36 +407,32 @@ class Container(object):
                 weightVarStack,
                 tmpVarTypes)
 
-            className = "HistogrammarClingFiller_" + str(Container._clingClassNameNumber)
-            Container._clingClassNameNumber += 1
-            classCode = """class {0} {{
-public:
-{1}
-{2}{3}
-{4}{5}  {6} storage;
+            classCode = """public:
+{0}
+{1}{2}
+{3}{4}  {5} storage;
 
   void init() {{
-{7}
+{6}
     weight_0 = 1.0;
   }}
 
   void fillall(TTree* ttree, Long64_t start, Long64_t end) {{
     ttree->SetBranchStatus("*", 0);
-{11}
+{10}
     init();
-{8}
+{7}
     if (start < 0) start = 0;
     if (end < 0) end = ttree->GetEntries();
     for (;  start < end;  ++start) {{
       ttree->GetEntry(start);
-{9}{10}
+{8}{9}
     }}
 
     ttree->ResetBranchAddresses();
   }}
 }};
-""".format(className,
-                "".join(storageStructs.values()),
+""".format("".join(storageStructs.values()),
                 "".join("  double " + n + ";\n" for n in weightVars),
                 "".join("  " + t + " " + self._cppNormalizeInputName(n) + ";\n" for n,
                         t in inputFieldTypes.items() if self._cppNormalizeInputName(n) in inputFieldNames),
@@ -434,24 +446,16 @@ public:
                 "\n".join(fillCode),
                 "".join("    ttree->SetBranchStatus(\"" + key + "\", 1);\n" for key in inputFieldNames.values()))
 
-            if debug:
-                print("line |")
-                print("\n".join("{0:4d} | {1}".format(i + 1, line) for i, line in enumerate(classCode.split("\n"))))
-            if not ROOT.gInterpreter.Declare(classCode):
-                if debug:
-                    raise SyntaxError("Could not compile the above")
-                elif debugOnError:
-                    raise SyntaxError(
-                        "Could not compile the following:\n\n" +
-                        "\n".join(
-                            "{0:4d} | {1}".format(
-                                i +
-                                1,
-                                line) for i,
-                            line in enumerate(
-                                classCode.split("\n"))))
-                else:
-                    raise SyntaxError("Could not compile (rerun with debug=True to see the generated C++ code)")
+            # identical generated code (same aggregator structure, expressions and branch types) reuses the class
+            # that Cling has already compiled, rather than declaring and compiling a new one
+            sourceHash = hashlib.sha1(classCode.encode("utf-8")).hexdigest()
+            className = Container._clingClassNames.get(sourceHash)
+            if className is None:
+                className = "HistogrammarClingFiller_" + str(Container._clingClassNameNumber)
+                Container._clingClassNameNumber += 1
+                classCode = "class " + className + " {\n" + classCode
+                self._clingDeclare(ROOT, classCode, debug, debugOnError)
+                Container._clingClassNames[sourceHash] = className
 
             self._clingFiller = getattr(ROOT, className)()
 
@@ -459,10 +463,167 @@ public:
         self._clingFiller.fillall(ttree, start, end)
         self._clingUpdate(self._clingFiller, ("var", "storage"))
 
+    def fillrootparallel(self, ttree, start=-1, end=-1, numWorkers=None, numRanges=None, alignRanges=True,
+                         progress=False, startMethod="spawn", debug=False, debugOnError=True, **exprs):
+        """Like ``fillroot``, but fills entry ranges in parallel worker processes and merges them with ``+``.
+
+        See ``histogrammar.rootparallel.fillrootparallel`` for the parameters.
+        """
+        from histogrammar.rootparallel import fillrootparallel
+        fillrootparallel(self, ttree, start, end, numWorkers, numRanges, alignRanges, progress, startMethod, debug,
+                         debugOnError, **exprs)
+
+    @staticmethod
+    def _clingDeclare(ROOT, classCode, debug, debugOnError):
+        if debug:
+            print("line |")
+            print("\n".join("{0:4d} | {1}".format(i + 1, line) for i, line in enumerate(classCode.split("\n"))))
+        if not ROOT.gInterpreter.Declare(classCode):
+            if debug:
+                raise SyntaxError("Could not compile the above")
+            elif debugOnError:
+                raise SyntaxError(
+                    "Could not compile the following:\n\n" +
+                    "\n".join("{0:4d} | {1}".format(i + 1, line) for i, line in enumerate(classCode.split("\n"))))
+            else:
+                raise SyntaxError("Could not compile (rerun with debug=True to see the generated C++ code)")
+
+    def fillnative(self, weights=None, cacheDir=None, debug=False, debugOnError=True, **exprs):
+        """Fill from numpy arrays with code compiled by the system C++ compiler; needs neither ROOT nor Python loops.
+
+        The same per-row code as ``fillroot`` is generated (from ``_c99GenerateCode``), looping over contiguous
+        arrays instead of a ``TTree``. The compiled library is cached by a hash of its source, in memory and on disk,
+        so identical aggregators are only compiled once (see ``histogrammar.native``).
+
+        Parameters:
+            weights (numpy array or None): per-row weights; rows with non-positive weight are skipped.
+            cacheDir (str or None): directory for compiled libraries (default ``$HISTOGRAMMAR_CACHE_DIR`` or
+                ``~/.cache/histogrammar``).
+            debug (bool): if True, print the generated code.
+            debugOnError (bool): if True, include the generated code in the exception raised on compilation errors.
+            exprs (numpy arrays or str): input fields as one-dimensional arrays of equal length, and optionally
+                derived fields as C99 expressions of the input fields. Quantities of the aggregator must be C99
+                strings referring to these names.
+        """
+        import ctypes
+        import numpy
+        from histogrammar.parsing import C99SourceToAst, C99AstToSource
+        from histogrammar.native import compiledLibrary, storageTypes
+
+        self._checkForCrossReferences()
+        parser = C99SourceToAst()
+        generator = C99AstToSource()
+
+        inputArrays = {}
+        inputFieldNames = OrderedDict()
+        inputFieldTypes = {}
+        derivedFieldTypes = {}
+        derivedFieldExprs = OrderedDict()
+        for name, expr in exprs.items():
+            if not isinstance(expr, basestring):
+                inputArrays[name] = numpy.ascontiguousarray(expr, dtype=numpy.float64)
+                if len(inputArrays[name].shape) != 1:
+                    raise ValueError("Numpy arrays must be one-dimensional")
+                inputFieldTypes[name] = "double"
+
+        for name, expr in exprs.items():
+            if isinstance(expr, basestring):
+                self._clingAddExpr(parser, generator, name, expr, inputFieldNames, inputFieldTypes,
+                                   derivedFieldTypes, derivedFieldExprs)
+
+        storageStructs = OrderedDict()
+        initCode = []
+        fillCode = []
+        weightVars = ["weight_0"]
+        weightVarStack = ("weight_0",)
+        tmpVarTypes = {}
+        self._c99GenerateCode(parser, generator, inputFieldNames, inputFieldTypes, derivedFieldTypes,
+                              derivedFieldExprs, storageStructs, initCode, (("var", "storage"),), 4, fillCode,
+                              (("var", "storage"),), 6, weightVars, weightVarStack, tmpVarTypes)
+
+        inputs = list(inputFieldNames.items())
+        lengths = set(inputArrays[name].shape[0] for name in inputArrays)
+        if weights is not None:
+            weights = numpy.ascontiguousarray(weights, dtype=numpy.float64)
+            lengths.add(weights.shape[0])
+        if len(lengths) > 1:
+            raise ValueError("input arrays and weights must all have the same length")
+        length = lengths.pop() if len(lengths) > 0 else 0
+
+        source = """#include <cmath>
+#include <math.h>
+
+class HistogrammarNativeFiller {{
+public:
+{0}
+{1}{2}
+{3}{4}  {5} storage;
+
+  void init() {{
+{6}
+    weight_0 = 1.0;
+  }}
+
+  void fillall(const double** inputs, const double* weights, long long length) {{
+    init();
+    for (long long row = 0;  row < length;  ++row) {{
+      if (weights != 0) {{
+        weight_0 = weights[row];
+        if (!(weight_0 > 0.0)) continue;
+      }}
+{7}{8}{9}
+    }}
+  }}
+}};
+
+extern "C" {{
+  void* histogrammarNew() {{ return new HistogrammarNativeFiller(); }}
+  void histogrammarDelete(void* filler) {{ delete (HistogrammarNativeFiller*)filler; }}
+  void* histogrammarStorage(void* filler) {{ return &((HistogrammarNativeFiller*)filler)->storage; }}
+  void histogrammarFill(void* filler, const double** inputs, const double* weights, long long length) {{
+    ((HistogrammarNativeFiller*)filler)->fillall(inputs, weights, length);
+  }}
+}}
+""".format("".join(storageStructs.values()),
+           "".join("  double " + n + ";\n" for n in weightVars),
+           "".join("  double " + norm + ";\n" for norm, name in inputs),
+           "".join("  " + t + " " + n + ";\n" for n, t in derivedFieldTypes.items() if t != "auto"),
+           "".join("  " + t + " " + n + ";\n" for n, t in tmpVarTypes.items()),
+           self._c99StorageType(),
+           "\n".join(initCode),
+           "".join("      {0} = inputs[{1}][row];\n".format(norm, i) for i, (norm, name) in enumerate(inputs)),
+           "".join(x for x in derivedFieldExprs.values()),
+           "\n".join(fillCode))
+
+        if debug:
+            print("line |")
+            print("\n".join("{0:4d} | {1}".format(i + 1, line) for i, line in enumerate(source.split("\n"))))
+
+        library = compiledLibrary(source, cacheDir=cacheDir, debugOnError=debugOnError)
+        library.histogrammarNew.restype = ctypes.c_void_p
+        library.histogrammarDelete.argtypes = [ctypes.c_void_p]
+        library.histogrammarStorage.restype = ctypes.c_void_p
+        library.histogrammarStorage.argtypes = [ctypes.c_void_p]
+        library.histogrammarFill.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_longlong]
+
+        pointers = (ctypes.c_void_p * max(len(inputs), 1))(*[inputArrays[name].ctypes.data for norm, name in inputs])
+        filler = library.histogrammarNew()
+        try:
+            library.histogrammarFill(filler, pointers, None if weights is None else weights.ctypes.data, length)
+            storage = storageTypes(storageStructs)[self._c99StorageType()].from_address(
+                library.histogrammarStorage(filler))
+            if isinstance(storage, ctypes.c_double):
+                storage = storage.value
+            self._clingUpdate(_NativeFiller(storage), ("var", "storage"))
+        finally:
+            library.histogrammarDelete(filler)
+
     _cudaNamespaceNumber = 0
 
     def cuda(self, namespace=True, namespaceName=None, writeSize=False, commentMain=True,
-             split=False, testData=[round(random.gauss(0, 1), 2) for x in xrange(10)], **exprs):
+             split=False, testData=[round(random.gauss(0, 1), 2) for x in xrange(10)], timestamp=True, **exprs):
+        from histogrammar.parsing import C99SourceToAst, C99AstToSource
+
         parser = C99SourceToAst()
         generator = C99AstToSource()
 
@@ -530,7 +691,7 @@ public:
             namespaceName = "HistogrammarCUDA_" + str(Container._cudaNamespaceNumber)
             Container._cudaNamespaceNumber += 1
 
-        out = '''// Auto-generated on {timestamp:%Y-%m-%d %H:%M:%S}
+        out = '''// Auto-generated{timestamp}
 // If you edit this file, it will be hard to swap it out for another auto-generated copy.
 
 #ifndef {NS}
@@ -813,7 +974,7 @@ int main(int argc, char** argv) {{
 {endComment}
 
 #endif  // {NS}
-'''.format(timestamp=datetime.datetime.now(),
+'''.format(timestamp=" on {0:%Y-%m-%d %H:%M:%S}".format(datetime.datetime.now()) if timestamp else "",
            ns=namespaceName,
            NS=namespaceName.upper(),
            writeSize="""  __global__ void write_size(size_t *output) {{
@@ -862,12 +1023,15 @@ int main(int argc, char** argv) {{
         else:
             return out
 
-    def fillpycuda(self, length=None, **exprs):
+    _cudaModules = {}
+
+    def fillpycuda(self, length=None, cacheDir=None, **exprs):
         import numpy
         import pycuda.autoinit
         import pycuda.driver
         import pycuda.compiler
         import pycuda.gpuarray
+        from histogrammar.parsing import C99SourceToAst, C99AstToSource
 
         parser = C99SourceToAst()
         generator = C99AstToSource()
@@ -958,7 +1122,17 @@ int main(int argc, char** argv) {{
                 "no arrays specified as input fields in the aggregator to get length from "
                 "(and length not specified explicitly)")
 
-        module = pycuda.compiler.SourceModule(self.cuda(namespace=False, writeSize=True))
+        # the source is made deterministic (no timestamp, fixed names and test data), so that identical aggregators
+        # share one compiled module in memory and pycuda's on-disk cache (keyed by source) skips nvcc across runs
+        source = self.cuda(namespace=False, namespaceName="HistogrammarCUDA", writeSize=True,
+                           testData=[0.0] * 10, timestamp=False)
+        sourceHash = hashlib.sha1(source.encode("utf-8")).hexdigest()
+        # a module is loaded into the current CUDA context and can't be used in any other one
+        moduleKey = (pycuda.driver.Context.get_current(), sourceHash)
+        module = Container._cudaModules.get(moduleKey)
+        if module is None:
+            module = pycuda.compiler.SourceModule(source, cache_dir=cacheDir)
+            Container._cudaModules[moduleKey] = module
 
         numThreadsPerBlock = min(pycuda.driver.Context.get_device().get_attribute(
             pycuda.driver.device_attribute.MAX_THREADS_PER_BLOCK), length)
@@ -998,6 +1172,148 @@ int main(int argc, char** argv) {{
         pycuda.driver.Context.synchronize()
         self._cudaUnpackAndFill(result.tostring(), False, 4)    # TODO: determine bigendian, alignment and use them!
 
+    def fillopenmp(self, numThreads=None, cacheDir=None, debug=False, debugOnError=True, **exprs):
+        """Fill from numpy arrays on all CPU cores by compiling the generated CUDA aggregator as OpenMP C++.
+
+        Uses the same code as ``cuda()`` and ``fillpycuda``: each thread zeros and increments its own aggregator with
+        the generated ``zero``/``increment`` functions, the per-thread aggregators are merged with the generated
+        ``combine`` function, and the result is read back with ``_cudaUnpackAndFill``. (CUDA atomics become plain
+        operations, as no two threads share an aggregator while filling.) Computation is in single precision, as on
+        the GPU. The compiled library is cached like that of ``fillnative``.
+
+        Parameters:
+            numThreads (int or None): number of threads; if None, let OpenMP decide (usually the number of cores).
+            cacheDir (str or None): directory for compiled libraries (default ``$HISTOGRAMMAR_CACHE_DIR`` or
+                ``~/.cache/histogrammar``).
+            debug (bool): if True, print the generated code.
+            debugOnError (bool): if True, include the generated code in the exception raised on compilation errors.
+            exprs (numpy arrays or str): input fields as one-dimensional arrays of equal length, and optionally
+                derived fields as C99 expressions of the input fields.
+        """
+        import ctypes
+        import numpy
+        from histogrammar.parsing import C99SourceToAst, C99AstToSource
+        from histogrammar.native import compiledLibrary
+
+        self._checkForCrossReferences()
+        parser = C99SourceToAst()
+        generator = C99AstToSource()
+
+        inputFieldNames = OrderedDict()
+        inputFieldTypes = {}
+        derivedFieldTypes = {}
+        derivedFieldExprs = OrderedDict()
+        storageStructs = OrderedDict()
+        initCode = []
+        fillCode = []
+        combineCode = []
+        jsonCode = []
+        weightVars = ["weight_0"]
+        weightVarStack = ("weight_0",)
+        tmpVarTypes = {}
+
+        inputArrays = {}
+        for name, expr in exprs.items():
+            if isinstance(expr, basestring):
+                self._cudaAddExpr(parser, generator, name, expr, inputFieldNames, inputFieldTypes,
+                                  derivedFieldTypes, derivedFieldExprs)
+            else:
+                inputArrays[name] = numpy.ascontiguousarray(expr, dtype=numpy.float32)
+                if len(inputArrays[name].shape) != 1:
+                    raise ValueError("Numpy arrays must be one-dimensional")
+
+        self._cudaGenerateCode(parser, generator, inputFieldNames, inputFieldTypes, derivedFieldTypes,
+                               derivedFieldExprs, storageStructs, initCode, (("var", "(*aggregator)"),), 4, fillCode,
+                               (("var", "(*aggregator)"),), 4, combineCode, (("var", "(*total)"),),
+                               (("var", "(*item)"),), 4, jsonCode, (("var", "(*aggregator)"),), 4, weightVars,
+                               weightVarStack, tmpVarTypes, False)
+
+        inputs = list(inputFieldNames.items())
+        for norm, name in inputs:
+            if name not in inputArrays:
+                raise ValueError("no input supplied for \"" + name + "\"")
+        lengths = set(inputArrays[name].shape[0] for norm, name in inputs)
+        if len(lengths) > 1:
+            raise ValueError("input arrays must all have the same length")
+        length = lengths.pop() if len(lengths) > 0 else 0
+
+        tmpVarDeclarations = "".join("    " + t + " " + n + ";\n" for n, t in tmpVarTypes.items())
+        source = """#include <math.h>
+#include <omp.h>
+#include <stdlib.h>
+#include <string.h>
+
+// the generated CUDA code, on the CPU: every thread fills its own aggregator, so atomics need not be atomic
+#define __device__
+#define __host__
+#define CUDART_NAN_F NAN
+static inline float atomicAdd(float* address, float value) {{ float old = *address; *address += value; return old; }}
+static inline int atomicCAS(int* address, int compare, int value) {{
+  int old = *address;
+  if (old == compare) *address = value;
+  return old;
+}}
+{0}
+typedef {1} Aggregator;
+
+__device__ void zero(Aggregator* aggregator) {{
+{2}{3}
+}}
+
+__device__ void increment(Aggregator* aggregator{4}{5}) {{
+  const float weight_0 = 1.0f;
+{6}{2}{7}
+{8}
+}}
+
+__device__ void combine(Aggregator* total, Aggregator* item) {{
+{2}{9}
+}}
+
+extern "C" {{
+  size_t histogrammarSize() {{ return sizeof(Aggregator); }}
+
+  void histogrammarFill(Aggregator* result, const float** inputs, long long length, int numThreads) {{
+    zero(result);
+    if (numThreads <= 0) numThreads = omp_get_max_threads();
+    #pragma omp parallel num_threads(numThreads)
+    {{
+      Aggregator* aggregator = (Aggregator*)malloc(sizeof(Aggregator));
+      zero(aggregator);
+      #pragma omp for schedule(static)
+      for (long long row = 0;  row < length;  ++row)
+        increment(aggregator{4}{10});
+      #pragma omp critical
+      combine(result, aggregator);
+      free(aggregator);
+    }}
+  }}
+}}
+""".format("".join(storageStructs.values()),
+           "float" if self._c99StructName() == "Ct" else self._c99StructName(),
+           tmpVarDeclarations,
+           "\n".join(initCode),
+           ", " if len(inputs) > 0 else "",
+           ", ".join(inputFieldTypes[name] + " " + norm for norm, name in inputs),
+           "".join("  float " + n + ";\n" for n in weightVars if n != "weight_0"),
+           "".join(derivedFieldExprs.values()),
+           "\n".join(fillCode),
+           "\n".join(combineCode),
+           ", ".join("inputs[{0}][row]".format(i) for i in xrange(len(inputs))))
+
+        if debug:
+            print("line |")
+            print("\n".join("{0:4d} | {1}".format(i + 1, line) for i, line in enumerate(source.split("\n"))))
+
+        library = compiledLibrary(source, cacheDir=cacheDir, extraFlags=["-fopenmp"], debugOnError=debugOnError)
+        library.histogrammarSize.restype = ctypes.c_size_t
+        library.histogrammarFill.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_longlong, ctypes.c_int]
+
+        result = numpy.zeros(library.histogrammarSize(), dtype=numpy.uint8)
+        pointers = (ctypes.c_void_p * max(len(inputs), 1))(*[inputArrays[name].ctypes.data for norm, name in inputs])
+        library.histogrammarFill(result.ctypes.data, pointers, length, 0 if numThreads is None else numThreads)
+        self._cudaUnpackAndFill(result.tobytes(), False, 4)
+
     def _cppExpandPrefix(self, *prefix):
         return self._c99ExpandPrefix(*prefix)
 
@@ -1042,6 +1358,8 @@ int main(int argc, char** argv) {{
         return self._c99NormalizeExpr(ast, inputFieldNames, inputFieldTypes, weightVar)
 
     def _c99NormalizeExpr(self, ast, inputFieldNames, inputFieldTypes, weightVar):
+        from histogrammar.pycparser import c_ast
+
         # interpret raw identifiers as tree field names IF they're in the tree (otherwise, leave them alone)
         if isinstance(ast, c_ast.ID):
             if weightVar is not None and ast.name == "weight":
@@ -1101,6 +1419,8 @@ int main(int argc, char** argv) {{
         return ast
 
     def _cudaNormalizeExpr(self, ast, inputFieldNames, inputFieldTypes, weightVar, derivedFieldExprs, intermediates):
+        from histogrammar.pycparser import c_ast
+
         if isinstance(ast, c_ast.ID):
             if weightVar is not None and ast.name == "weight":
                 ast.name = weightVar
@@ -1193,6 +1513,8 @@ int main(int argc, char** argv) {{
 
     def _c99QuantityExpr(self, parser, generator, inputFieldNames, inputFieldTypes,
                          derivedFieldTypes, derivedFieldExprs, weightVar):
+        from histogrammar.pycparser import c_ast
+
         if weightVar is not None:
             if not isinstance(self.transform.expr, basestring):
                 raise ContainerException("Count.transform must be provided as a C99 string when used with Cling")
@@ -1247,6 +1569,8 @@ int main(int argc, char** argv) {{
 
     def _cudaQuantityExpr(self, parser, generator, inputFieldNames, inputFieldTypes,
                           derivedFieldTypes, derivedFieldExprs, weightVar):
+        from histogrammar.pycparser import c_ast
+
         if weightVar is not None:
             if not isinstance(self.transform.expr, basestring):
                 raise ContainerException("Count.transform must be provided as a C99 string when used with CUDA")
@@ -1355,6 +1679,17 @@ int main(int argc, char** argv) {{
         self._checkForCrossReferences()
         self._numpy(data, weights, shape=[None])
 
+    def fillnumba(self, data, weights=1.0, jit=True):
+        """Fill with a single Numba-compiled loop over the rows of ``data`` (see ``histogrammar.numbafill``).
+
+        Parameters:
+            data (dict of numpy arrays or pandas DataFrame): input columns, as for ``fill.numpy``.
+            weights (numpy array or float): per-row weights; rows with non-positive weight are skipped.
+            jit (bool): if False, run the generated loop in Python (no Numba needed).
+        """
+        from histogrammar.numbafill import fillnumba
+        fillnumba(self, data, weights, jit)
+
     def _checkNPQuantity(self, q, shape):
         import numpy
         if isinstance(q, (list, tuple)):
@@ -1379,13 +1714,50 @@ int main(int argc, char** argv) {{
         else:
             return weights * numpy.ones(shape, dtype=numpy.float64)
 
+    _sparksqlAggregators = {}
+    _sparksqlAggregatorsMaxSize = 256
+
     def fillsparksql(self, df):
-        converter = df._sc._jvm.org.dianahep.histogrammar.sparksql.pyspark.AggregatorConverter()
-        agg = self._sparksql(df._sc._jvm, converter)
+        converter, agg = self._sparksqlAggregator(df._sc)
         result = converter.histogrammar(df._jdf, agg)
         delta = Factory.fromJson(jsonlib.loads(result.toJsonString()))
         self += delta
 
+    def _sparksqlAggregator(self, sc):
+        """Return the ``AggregatorConverter`` and JVM aggregator tree for this container in SparkContext ``sc``.
+
+        Building the JVM tree takes a Py4J round-trip per node, so it is done once per container (and shared by
+        containers with the same structure and the same quantity Columns), then reused for every DataFrame.
+        """
+        cached = getattr(self, "_sparksqlCache", None)
+        if cached is not None and cached[0] is sc:
+            return cached[1], cached[2]
+
+        columns = self._sparksqlColumns()
+        key = (id(sc), jsonlib.dumps(self.zero().toJson(), sort_keys=True), tuple(id(x) for x in columns))
+        value = Container._sparksqlAggregators.get(key)
+        if value is None:
+            converter = sc._jvm.org.dianahep.histogrammar.sparksql.pyspark.AggregatorConverter()
+            # the key holds ids, so the cache keeps sc and the Columns alive to keep the ids from being reused
+            value = (sc, columns, converter, self._sparksql(sc._jvm, converter))
+            if len(Container._sparksqlAggregators) >= Container._sparksqlAggregatorsMaxSize:
+                Container._sparksqlAggregators.clear()
+            Container._sparksqlAggregators[key] = value
+
+        self._sparksqlCache = (sc, value[2], value[3])
+        return value[2], value[3]
+
+    def _sparksqlColumns(self):
+        out = []
+        for name in ("quantity", "transform"):
+            fcn = getattr(self, name, None)
+            if isinstance(fcn, UserFcn) and fcn.expr is not None and \
+                    not isinstance(fcn.expr, (basestring, types.FunctionType)):
+                out.append(fcn.expr)
+        for child in self.children:
+            out.extend(child._sparksqlColumns())
+        return out
+
 # useful functions
 
 
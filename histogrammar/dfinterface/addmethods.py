@@ -228,7 +228,6 @@ def hg_fill_numpy(self, hist):
 
 def hg(self, h):
     # alternative for spark
-    converter = self._sc._jvm.org.dianahep.histogrammar.sparksql.pyspark.AggregatorConverter()
-    agg = h._sparksql(self._sc._jvm, converter)
+    converter, agg = h._sparksqlAggregator(self._sc)
     result = converter.histogrammar(self._jdf, agg)
     return Factory.fromJson(json.loads(result.toJsonString()))
@@ -0,0 +1,227 @@
+# Copyright (c) 2021 ING Wholesale Banking Advanced Analytics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Asyncio pipeline that overlaps reading batches with filling histograms.
+
+A reader task pulls batches (reading happens in a thread, so blocking I/O doesn't stall the event loop) into a
+bounded queue; fill workers take batches from the queue and fill them, each with its own copy of the histogram
+filler, in threads. The first batch is filled by the original filler, so that auto-binning is fixed before the
+copies are made and all histograms have the same binning. At the end, the workers' histograms are merged into
+the original filler's with ``+=``.
+"""
+
+import asyncio
+import copy
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_DONE = object()
+
+
+def _next_batch(iterator, reader):
+    try:
+        item = next(iterator)
+    except StopIteration:
+        return _DONE
+    return item if reader is None else reader(item)
+
+
+def _clone_filler(filler):
+    """Copy of a histogram filler with its bin specs and features, but without its histograms."""
+    hists = filler._hists
+    filler._hists = {}
+    try:
+        return copy.deepcopy(filler)
+    finally:
+        filler._hists = hists
+
+
+def _merge_into(hists, other):
+    for name, hist in other.items():
+        if name in hists:
+            hists[name] += hist
+        else:
+            hists[name] = hist
+
+
+class PipelineMonitor(object):
+    """Throughput and backpressure of an :class:`AsyncFillPipeline` run.
+
+    ``producer_blocked_seconds`` is the time the reader waited for a free queue slot (filling is the bottleneck),
+    ``worker_idle_seconds`` the time workers waited for a batch (reading is the bottleneck).
+    """
+
+    def __init__(self):
+        self.batches = 0
+        self.rows = 0
+        self.read_seconds = 0.0
+        self.fill_seconds = 0.0
+        self.producer_blocked_seconds = 0.0
+        self.worker_idle_seconds = 0.0
+        self.merge_seconds = 0.0
+        self.wall_seconds = 0.0
+        self.max_queue_size = 0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    @property
+    def bottleneck(self):
+        """"reading" or "filling", whichever the other side of the queue waited for longer."""
+        return "filling" if self.producer_blocked_seconds > self.worker_idle_seconds else "reading"
+
+    def as_dict(self):
+        out = dict(self.__dict__)
+        out["rows_per_second"] = self.rows_per_second
+        out["bottleneck"] = self.bottleneck
+        return out
+
+    def summary(self):
+        return (
+            f"{self.batches} batches, {self.rows} rows in {self.wall_seconds:.3f} s "
+            f"({self.rows_per_second:.4g} rows/s); read {self.read_seconds:.3f} s, fill {self.fill_seconds:.3f} s, "
+            f"merge {self.merge_seconds:.3f} s; reader blocked {self.producer_blocked_seconds:.3f} s, "
+            f"workers idle {self.worker_idle_seconds:.3f} s, max queue {self.max_queue_size}; "
+            f"bottleneck: {self.bottleneck}"
+        )
+
+
+class AsyncFillPipeline(object):
+    """Fill histograms from a sequence of batches, reading ahead while filling.
+
+    Example:
+
+    .. code-block:: python
+
+        filler = PandasHistogrammar(features=["x", "y"], binning="auto")
+        pipeline = AsyncFillPipeline(filler, reader=pd.read_parquet, prefetch=4, workers=2)
+        hists = pipeline.fill(["part-0.parquet", "part-1.parquet", "part-2.parquet"])
+        print(pipeline.monitor.summary())
+    """
+
+    def __init__(self, filler, reader=None, prefetch=2, workers=1, executor=None):
+        """Initialize the pipeline.
+
+        :param filler: histogram filler (a ``HistogramFillerBase``, e.g. ``PandasHistogrammar``); after a run it
+            holds the merged histograms.
+        :param reader: function turning an item of the input sequence into a dataframe (e.g. ``pd.read_parquet``),
+            called in a thread. If None, the items are the dataframes (reading then happens in the iterator).
+        :param int prefetch: maximum number of batches read ahead (queue size); bounds memory use.
+        :param int workers: number of fill workers.
+        :param executor: ``concurrent.futures`` executor for reading and filling; default is a thread pool with
+            one thread per worker plus one for reading.
+        """
+        if prefetch < 1:
+            raise ValueError("prefetch must be at least 1")
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.filler = filler
+        self.reader = reader
+        self.prefetch = prefetch
+        self.workers = workers
+        self.executor = executor
+        self.monitor = PipelineMonitor()
+
+    def fill(self, batches):
+        """Fill all batches and return the dict of histograms (blocking; see :meth:`fill_async`)."""
+        return asyncio.run(self.fill_async(batches))
+
+    async def fill_async(self, batches):
+        """Fill all batches and return the dict of histograms.
+
+        :param batches: iterable or async iterable of dataframes, or of items passed to ``reader``.
+        """
+        loop = asyncio.get_running_loop()
+        monitor = self.monitor = PipelineMonitor()
+        start = time.perf_counter()
+        executor = self.executor or ThreadPoolExecutor(max_workers=self.workers + 1)
+        try:
+            is_async = hasattr(batches, "__aiter__")
+            iterator = batches.__aiter__() if is_async else iter(batches)
+
+            async def read():
+                t0 = time.perf_counter()
+                if is_async:
+                    try:
+                        item = await iterator.__anext__()
+                    except StopAsyncIteration:
+                        item = _DONE
+                    if item is not _DONE and self.reader is not None:
+                        item = await loop.run_in_executor(executor, self.reader, item)
+                else:
+                    item = await loop.run_in_executor(executor, _next_batch, iterator, self.reader)
+                monitor.read_seconds += time.perf_counter() - t0
+                return item
+
+            queue = asyncio.Queue(maxsize=self.prefetch)
+
+            async def produce():
+                while True:
+                    batch = await read()
+                    if batch is _DONE:
+                        break
+                    t0 = time.perf_counter()
+                    await queue.put(batch)
+                    monitor.producer_blocked_seconds += time.perf_counter() - t0
+                    monitor.max_queue_size = max(monitor.max_queue_size, queue.qsize())
+                for _ in range(self.workers):
+                    await queue.put(_DONE)
+
+            async def fill_batch(filler, batch):
+                t0 = time.perf_counter()
+                await loop.run_in_executor(executor, filler.get_histograms, batch)
+                monitor.fill_seconds += time.perf_counter() - t0
+                monitor.batches += 1
+                monitor.rows += len(batch)
+
+            async def work(filler):
+                while True:
+                    t0 = time.perf_counter()
+                    batch = await queue.get()
+                    monitor.worker_idle_seconds += time.perf_counter() - t0
+                    if batch is _DONE:
+                        return
+                    await fill_batch(filler, batch)
+
+            first = await read()
+            if first is _DONE:
+                return self.filler._hists
+
+            # read ahead while the first batch fixes the binning
+            producer = asyncio.ensure_future(produce())
+            try:
+                await fill_batch(self.filler, first)
+                clones = [_clone_filler(self.filler) for _ in range(self.workers)]
+                await asyncio.gather(producer, *[work(clone) for clone in clones])
+            except BaseException:
+                producer.cancel()
+                raise
+
+            t0 = time.perf_counter()
+            for clone in clones:
+                _merge_into(self.filler._hists, clone._hists)
+            monitor.merge_seconds = time.perf_counter() - t0
+        finally:
+            if self.executor is None:
+                executor.shutdown(wait=False)
+            monitor.wall_seconds = time.perf_counter() - start
+
+        self.filler.logger.info(f"Async filling: {monitor.summary()}")
+        return self.filler._hists
@@ -43,7 +43,7 @@ from ..primitives.sum import Sum
 from .pandas_histogrammar import PandasHistogrammar
 from .spark_histogrammar import SparkHistogrammar
 from .filling_utils import check_dtype
-from ..util import _get_sub_hist
+from ..util import _cachedMetadata, _get_sub_hist
 
 logger = logging.getLogger()
 
@@ -259,10 +259,17 @@ def get_one_time_axis(df):
 def _get_bin_specs(h):
     """Get histogram bin specifications
 
+    Computed once per histogram and cached on it (see ``histogrammar.util.invalidateMetadata``).
+
     :param h: input histogrammar histogram
     :return: list with bin_specs of all dimensions of the histogram
     :rtype: list
     """
+    # copies, so that callers can modify them
+    return [dict(bs) for bs in _cachedMetadata(h, "bin_specs", _compute_bin_specs)]
+
+
+def _compute_bin_specs(h):
     bin_specs = []
     if isinstance(h, Count):
         return bin_specs
@@ -300,7 +307,7 @@ def _get_bin_specs(h):
 
     # histogram may have a sub-histogram. Extract it and recurse
     hist = _get_sub_hist(h)
-    return bin_specs + _get_bin_specs(hist)
+    return bin_specs + _compute_bin_specs(hist)
 
 
 def _match_first_key(skip_first_axis=None, feature=""):
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+
+# Copyright 2016 DIANA-HEP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compiles the code generated by the primitives' ``_c99GenerateCode`` with the system C++ compiler.
+
+Shared libraries are cached by a hash of their source, in memory and on disk (in ``$HISTOGRAMMAR_CACHE_DIR``, by
+default ``~/.cache/histogrammar``), so identical aggregators are only compiled once per machine. Results are read
+back through ctypes mirrors of the generated storage structs, which expose the same attributes and ``getValues``/
+``getSubN`` accessors as the Cling objects used by ``fillroot``, so that every primitive's ``_clingUpdate`` works
+unchanged.
+"""
+
+import ctypes
+import hashlib
+import os
+import re
+import subprocess
+import tempfile
+import threading
+
+compiler = os.environ.get("CXX", "c++")
+compilerFlags = ["-O2", "-std=c++11", "-shared", "-fPIC"]
+
+_libraries = {}
+_librariesLock = threading.Lock()
+
+
+def cacheDirectory():
+    """Directory of compiled shared libraries: ``$HISTOGRAMMAR_CACHE_DIR`` or ``~/.cache/histogrammar``."""
+    return os.environ.get("HISTOGRAMMAR_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "histogrammar"))
+
+
+def compiledLibrary(source, cacheDir=None, extraFlags=(), debugOnError=True):
+    """Compile C++ ``source`` into a shared library and load it, or reuse a previously compiled one.
+
+    Parameters:
+        source (str): complete C++ source, exporting ``extern "C"`` functions.
+        cacheDir (str or None): directory for compiled libraries; if None, use ``cacheDirectory()``.
+        extraFlags (list of str): compiler flags in addition to ``compilerFlags`` (e.g. ``["-fopenmp"]``).
+        debugOnError (bool): if True, include the numbered source in the exception raised on compilation errors.
+
+    Returns a ``ctypes.CDLL``.
+    """
+    flags = list(compilerFlags) + list(extraFlags)
+    sourceHash = hashlib.sha1("\0".join([compiler] + flags + [source]).encode("utf-8")).hexdigest()
+
+    with _librariesLock:
+        if sourceHash in _libraries:
+            return _libraries[sourceHash]
+
+        if cacheDir is None:
+            cacheDir = cacheDirectory()
+        if not os.path.exists(cacheDir):
+            os.makedirs(cacheDir)
+        libraryPath = os.path.join(cacheDir, "hg_" + sourceHash + ".so")
+
+        if not os.path.exists(libraryPath):
+            fd, tmpPath = tempfile.mkstemp(suffix=".so", dir=cacheDir)
+            os.close(fd)
+            sourcePath = tmpPath[:-3] + ".cpp"
+            try:
+                with open(sourcePath, "w") as f:
+                    f.write(source)
+                compilation = subprocess.run([compiler] + flags + ["-o", tmpPath, sourcePath],
+                                             stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+                if compilation.returncode != 0:
+                    message = compilation.stdout.decode("utf-8", "replace")
+                    if debugOnError:
+                        message = "\n".join("{0:4d} | {1}".format(i + 1, line)
+                                            for i, line in enumerate(source.split("\n"))) + "\n\n" + message
+                    raise SyntaxError("Could not compile the following:\n\n" + message)
+                # atomic, so that concurrent processes never load a partially written library
+                os.replace(tmpPath, libraryPath)
+            finally:
+                for path in (tmpPath, sourcePath):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+        library = ctypes.CDLL(libraryPath)
+        _libraries[sourceHash] = library
+        return library
+
+
+_fieldPattern = re.compile(r"^\s*(\w+) (\w+)(?:\[(\d+)\])?;\s*$")
+_accessorPattern = re.compile(r"^\s*\w+& (\w+)\(\w+ \w+\) \{ return (\w+)\[\w+\]; \}\s*$")
+_structPattern = re.compile(r"typedef struct \{(.*?)\} (\w+);", re.S)
+
+
+def _accessor(field):
+    return lambda self, i: getattr(self, field)[i]
+
+
+def storageTypes(storageStructs):
+    """Build ctypes mirrors of the storage structs generated by ``_c99GenerateCode``.
+
+    Parameters:
+        storageStructs (dict): struct name to C++ source, in dependency order (as filled by ``_c99GenerateCode``).
+
+    Returns a dict from C++ type name to ctypes type, including ``"double"``.
+    """
+    types = {"double": ctypes.c_double, "float": ctypes.c_float, "int": ctypes.c_int}
+    for code in storageStructs.values():
+        for body, name in _structPattern.findall(code):
+            fields = []
+            accessors = {}
+            for line in body.split("\n"):
+                if line.strip() == "":
+                    continue
+                m = _fieldPattern.match(line)
+                if m is not None:
+                    t = types[m.group(1)]
+                    fields.append((m.group(2), t if m.group(3) is None else t * int(m.group(3))))
+                    continue
+                m = _accessorPattern.match(line)
+                if m is not None:
+                    accessors[m.group(1)] = _accessor(m.group(2))
+                    continue
+                raise NotImplementedError("cannot mirror C++ struct member in ctypes: " + line.strip())
+            accessors["_fields_"] = fields
+            types[name] = type(name, (ctypes.Structure,), accessors)
+    return types
@@ -0,0 +1,457 @@
+#!/usr/bin/env python
+
+# Copyright 2016 DIANA-HEP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Single-pass row-loop filling, compiled with Numba (optional dependency).
+
+``fillnumba`` works in three steps:
+
+1. Walk the container tree. For every node, evaluate its quantity on the whole batch with numpy (as ``fill.numpy``
+   does) and reduce it to one column: the quantity itself (Sum, Average, ...), the cut (Select, Fraction) or an
+   integer bin code (Bin, IrregularlyBin, and for SparselyBin and Categorize, an index into the keys seen in the
+   batch).
+2. Generate the source of one function that loops over rows and updates a 2-d float64 storage array per node, with
+   one row per instance of the node (a Count in a 10-bin Bin has 10 instances). The source only depends on the tree
+   structure, as bin and key counts are arguments, so the compiled function is cached by its source.
+3. Write the storage into a ``zero()`` copy of the container and add it to the container with ``+=``.
+
+Rows are filled with the same semantics as ``fill`` (rows with non-positive weight are skipped).
+
+Storage is dense: a container nested in binned containers has one row per combination of their bins (or keys seen in
+the batch), filled or not. Above ``maxStorageSize`` values in all, ``fillnumba`` raises ``NotImplementedError``
+rather than allocate them; use ``fill.numpy`` for such trees.
+"""
+
+import math
+
+import numpy as np
+
+from histogrammar.defs import identity
+from histogrammar.primitives.average import Average
+from histogrammar.primitives.bin import Bin
+from histogrammar.primitives.categorize import Categorize
+from histogrammar.primitives.collection import Branch, Index, Label, UntypedLabel
+from histogrammar.primitives.count import Count
+from histogrammar.primitives.deviate import Deviate
+from histogrammar.primitives.fraction import Fraction
+from histogrammar.primitives.irregularlybin import IrregularlyBin
+from histogrammar.primitives.minmax import Maximize, Minimize
+from histogrammar.primitives.select import Select
+from histogrammar.primitives.sparselybin import SparselyBin, LONG_MINUSINF, LONG_PLUSINF
+from histogrammar.primitives.sum import Sum
+
+# bin codes for rows that do not fall in a regular bin
+_UNDERFLOW = -1
+_OVERFLOW = -2
+_NANFLOW = -3
+
+# number of storage columns per container type; column 0 is always entries
+_widths = {Count: 1, Sum: 2, Average: 2, Deviate: 3, Minimize: 2, Maximize: 2}
+
+# maximum number of float64 values of storage for one batch (80 MB)
+maxStorageSize = 10000000
+
+
+# per-row updates with exactly the semantics of the containers' fill methods, including the entries increment
+
+def _averageFill(storage, i, q, weight):
+    if storage[i, 0] == 0.0:
+        storage[i, 1] = q
+    storage[i, 0] += weight
+    mean = storage[i, 1]
+    if math.isnan(mean) or math.isnan(q):
+        storage[i, 1] = np.nan
+    elif math.isinf(mean) or math.isinf(q):
+        if math.isinf(mean) and math.isinf(q) and mean * q < 0.0:
+            storage[i, 1] = np.nan
+        elif math.isinf(q):
+            storage[i, 1] = q
+        if math.isinf(storage[i, 0]) or math.isnan(storage[i, 0]):
+            storage[i, 1] = np.nan
+    else:
+        storage[i, 1] += (q - mean) * weight / storage[i, 0]
+
+
+def _deviateFill(storage, i, q, weight):
+    if storage[i, 0] == 0.0:
+        storage[i, 1] = q
+        storage[i, 2] = 0.0
+    storage[i, 0] += weight
+    mean = storage[i, 1]
+    if math.isnan(mean) or math.isnan(q):
+        storage[i, 1] = np.nan
+        storage[i, 2] = np.nan
+    elif math.isinf(mean) or math.isinf(q):
+        if math.isinf(mean) and math.isinf(q) and mean * q < 0.0:
+            storage[i, 1] = np.nan
+        elif math.isinf(q):
+            storage[i, 1] = q
+        if math.isinf(storage[i, 0]) or math.isnan(storage[i, 0]):
+            storage[i, 1] = np.nan
+        storage[i, 2] = np.nan
+    else:
+        delta = q - mean
+        storage[i, 1] += delta * weight / storage[i, 0]
+        storage[i, 2] += weight * delta * (q - storage[i, 1])
+
+
+def _minimizeFill(storage, i, q, weight):
+    storage[i, 0] += weight
+    if math.isnan(storage[i, 1]) or q < storage[i, 1]:
+        storage[i, 1] = q
+
+
+def _maximizeFill(storage, i, q, weight):
+    storage[i, 0] += weight
+    if math.isnan(storage[i, 1]) or q > storage[i, 1]:
+        storage[i, 1] = q
+
+
+_helpers = {"_averageFill": _averageFill, "_deviateFill": _deviateFill,
+            "_minimizeFill": _minimizeFill, "_maximizeFill": _maximizeFill}
+_jittedHelpers = None
+_compiled = {}
+
+
+def _categorizeKey(q):
+    if isinstance(q, (str, bool)):
+        return q
+    if q is None or np.isnan(q):
+        return "NaN"
+    raise TypeError("function return value ({0}) must be a string or bool".format(q))
+
+
+class _Node(object):
+    """One container of the tree, with its per-row column and its children as (node, multiplicity) pairs."""
+
+    def __init__(self, container, instances):
+        self.container = container
+        self.instances = instances
+        self.column = None
+        self.keys = None
+        self.multiplicity = 1
+        self.children = []
+
+
+class _Plan(object):
+    def __init__(self, container, data, length):
+        self.data = data
+        self.length = length
+        self.nodes = []
+        self.size = 0
+        self.root = self._node(container, 1)
+
+    def _quantity(self, container, dtype=np.float64):
+        q = np.asarray(container.quantity(self.data))
+        if q.shape != (self.length,):
+            raise ValueError("quantity of {0} has shape {1}, expected ({2},)".format(
+                container.name, q.shape, self.length))
+        return q if dtype is None else q.astype(dtype)
+
+    def _node(self, container, instances):
+        node = _Node(container, instances)
+        node.id = len(self.nodes)
+        self.nodes.append(node)
+        self.size += instances * _widths.get(type(container), 1)
+        if self.size > maxStorageSize:
+            raise NotImplementedError("fill.numba: the dense storage of this tree for this batch would have more than "
+                                      "{0} values (maxStorageSize); use fill.numpy".format(maxStorageSize))
+
+        if isinstance(container, Count):
+            if container.transform is not identity:
+                raise NotImplementedError("fill.numba: Count with a transform")
+
+        elif isinstance(container, (Sum, Average, Deviate, Minimize, Maximize)):
+            node.column = self._quantity(container)
+
+        elif isinstance(container, Bin):
+            q = self._quantity(container)
+            codes = np.full(self.length, _NANFLOW, dtype=np.int64)
+            codes[q < container.low] = _UNDERFLOW
+            codes[q >= container.high] = _OVERFLOW
+            # the same arithmetic as Bin.bin, on the rows that Bin.under, Bin.over and Bin.nan don't take
+            inside = (q >= container.low) & (q < container.high)
+            codes[inside] = np.floor(container.num * (q[inside] - container.low) / (container.high - container.low))
+            if np.any(codes[inside] >= container.num):
+                # as fill would, when rounding puts a value just below high in bin num
+                raise IndexError("fill.numba: value in bin {0} of a Bin with {0} bins".format(container.num))
+            node.column = codes
+            node.multiplicity = container.num
+            node.children = [(self._node(container.values[0], instances * container.num), container.num),
+                             (self._node(container.underflow, instances), 1),
+                             (self._node(container.overflow, instances), 1),
+                             (self._node(container.nanflow, instances), 1)]
+
+        elif isinstance(container, IrregularlyBin):
+            q = self._quantity(container)
+            lows = np.array([low for low, _ in container.bins])
+            codes = np.searchsorted(lows, q, side="right").astype(np.int64) - 1
+            codes[np.isnan(q)] = _NANFLOW
+            node.column = codes
+            node.multiplicity = len(container.bins)
+            node.children = [(self._node(container.bins[0][1], instances * node.multiplicity), node.multiplicity),
+                             (self._node(container.nanflow, instances), 1)]
+
+        elif isinstance(container, SparselyBin):
+            if container.value is None:
+                raise NotImplementedError("fill.numba: SparselyBin without a value template")
+            q = self._quantity(container)
+            nans = np.isnan(q)
+            with np.errstate(invalid="ignore"):
+                softbins = np.floor(np.clip((q[~nans] - container.origin) / container.binWidth,
+                                            LONG_MINUSINF, LONG_PLUSINF))
+            uniques, inverse = np.unique(softbins, return_inverse=True)
+            codes = np.full(self.length, _NANFLOW, dtype=np.int64)
+            codes[~nans] = inverse
+            node.column = codes
+            node.keys = [LONG_PLUSINF if x >= LONG_PLUSINF else LONG_MINUSINF if x <= LONG_MINUSINF else int(x)
+                         for x in uniques]
+            node.multiplicity = len(node.keys)
+            node.children = [(self._node(container.value, instances * node.multiplicity), node.multiplicity),
+                             (self._node(container.nanflow, instances), 1)]
+
+        elif isinstance(container, Categorize):
+            q = self._quantity(container, None)
+            if q.dtype.kind == "f":
+                if not np.isnan(q).all():
+                    raise TypeError("function return value ({0}) must be a string or bool".format(q[~np.isnan(q)][0]))
+                q = np.full(self.length, "NaN")
+            elif q.dtype.kind == "O":
+                q = [_categorizeKey(x) for x in q.tolist()]
+                q = np.array(q, dtype=object if any(isinstance(x, bool) for x in q) else str)
+            elif q.dtype.kind not in ("U", "S", "b"):
+                raise TypeError("function return value must be a string or bool, not {0}".format(q.dtype))
+            uniques, inverse = np.unique(q, return_inverse=True)
+            node.column = inverse.astype(np.int64)
+            node.keys = uniques.tolist()
+            node.multiplicity = len(node.keys)
+            node.children = [(self._node(container.value, instances * node.multiplicity), node.multiplicity)]
+
+        elif isinstance(container, Select):
+            node.column = self._quantity(container)
+            node.children = [(self._node(container.cut, instances), 1)]
+
+        elif isinstance(container, Fraction):
+            node.column = self._quantity(container)
+            node.children = [(self._node(container.numerator, instances), 1),
+                             (self._node(container.denominator, instances), 1)]
+
+        elif isinstance(container, (Label, UntypedLabel)):
+            node.children = [(self._node(container.pairs[k], instances), 1) for k in sorted(container.pairs)]
+
+        elif isinstance(container, (Index, Branch)):
+            node.children = [(self._node(v, instances), 1) for v in container.values]
+
+        else:
+            raise NotImplementedError("fill.numba: no row-loop implementation of " + container.name)
+
+        return node
+
+    def source(self):
+        lines = ["def fill(length, weights, " + ", ".join(
+            "c{0}, s{0}, k{0}".format(node.id) for node in self.nodes) + "):",
+            "    for row in range(length):",
+            "        w = weights[row]",
+            "        if w > 0.0:",
+            "            i0 = 0"]
+        self._emit(self.root, "i0", "w", 12, lines)
+        return "\n".join(lines) + "\n"
+
+    def _emit(self, node, inst, weight, indent, lines):
+        container = node.container
+        k = node.id
+        pad = " " * indent
+
+        def emitChild(index, childInst, childWeight, childIndent):
+            self._emit(node.children[index][0], childInst, childWeight, childIndent, lines)
+
+        if isinstance(container, Count):
+            pass
+        elif isinstance(container, Sum):
+            lines.append(pad + "s{0}[{1}, 1] += c{0}[row] * {2}".format(k, inst, weight))
+        elif isinstance(container, Average):
+            lines.append(pad + "_averageFill(s{0}, {1}, c{0}[row], {2})".format(k, inst, weight))
+        elif isinstance(container, Deviate):
+            lines.append(pad + "_deviateFill(s{0}, {1}, c{0}[row], {2})".format(k, inst, weight))
+        elif isinstance(container, Minimize):
+            lines.append(pad + "_minimizeFill(s{0}, {1}, c{0}[row], {2})".format(k, inst, weight))
+        elif isinstance(container, Maximize):
+            lines.append(pad + "_maximizeFill(s{0}, {1}, c{0}[row], {2})".format(k, inst, weight))
+
+        elif isinstance(container, (Bin, IrregularlyBin, SparselyBin)):
+            child = "i{0}".format(node.children[0][0].id)
+            lines.append(pad + "b{0} = c{0}[row]".format(k))
+            lines.append(pad + "if b{0} >= 0:".format(k))
+            lines.append(pad + "    {0} = {1} * k{2} + b{2}".format(child, inst, k))
+            emitChild(0, child, weight, indent + 4)
+            if isinstance(container, Bin):
+                lines.append(pad + "elif b{0} == {1}:".format(k, _UNDERFLOW))
+                emitChild(1, inst, weight, indent + 4)
+                lines.append(pad + "elif b{0} == {1}:".format(k, _OVERFLOW))
+                emitChild(2, inst, weight, indent + 4)
+                lines.append(pad + "else:")
+                emitChild(3, inst, weight, indent + 4)
+            else:
+                lines.append(pad + "else:")
+                emitChild(1, inst, weight, indent + 4)
+
+        elif isinstance(container, Categorize):
+            child = "i{0}".format(node.children[0][0].id)
+            lines.append(pad + "{0} = {1} * k{2} + c{2}[row]".format(child, inst, k))
+            emitChild(0, child, weight, indent)
+
+        elif isinstance(container, Select):
+            lines.append(pad + "w{0} = c{0}[row] * {1}".format(k, weight))
+            lines.append(pad + "if w{0} > 0.0:".format(k))
+            emitChild(0, inst, "w{0}".format(k), indent + 4)
+
+        elif isinstance(container, Fraction):
+            emitChild(1, inst, weight, indent)
+            lines.append(pad + "w{0} = c{0}[row] * {1}".format(k, weight))
+            lines.append(pad + "if w{0} > 0.0:".format(k))
+            emitChild(0, inst, "w{0}".format(k), indent + 4)
+
+        else:
+            for index in range(len(node.children)):
+                emitChild(index, inst, weight, indent)
+
+        if not isinstance(container, (Average, Deviate, Minimize, Maximize)):
+            lines.append(pad + "s{0}[{1}, 0] += {2}".format(k, inst, weight))
+
+    def arguments(self, weights):
+        out = [self.length, weights]
+        for node in self.nodes:
+            storage = np.zeros((node.instances, _widths.get(type(node.container), 1)), dtype=np.float64)
+            if not isinstance(node.container, Sum):
+                # same initial values as zero(); the first fill overwrites them
+                storage[:, 1:] = np.nan
+            node.storage = storage
+            column = node.column if node.column is not None else np.zeros(0, dtype=np.float64)
+            out.extend([column, storage, node.multiplicity])
+        return out
+
+    def writeBack(self, node, container, inst):
+        """Write instance ``inst`` of ``node``'s storage into ``container``, a ``zero()`` copy of its container."""
+        storage = node.storage
+        container.entries = storage[inst, 0]
+
+        if isinstance(container, Sum):
+            container.sum = storage[inst, 1]
+        elif isinstance(container, Average):
+            container.mean = storage[inst, 1]
+        elif isinstance(container, Deviate):
+            container.mean = storage[inst, 1]
+            container.varianceTimesEntries = storage[inst, 2]
+        elif isinstance(container, Minimize):
+            container.min = storage[inst, 1]
+        elif isinstance(container, Maximize):
+            container.max = storage[inst, 1]
+
+        elif isinstance(container, Bin):
+            values, m = node.children[0]
+            for i, v in enumerate(container.values):
+                self.writeBack(values, v, inst * m + i)
+            self.writeBack(node.children[1][0], container.underflow, inst)
+            self.writeBack(node.children[2][0], container.overflow, inst)
+            self.writeBack(node.children[3][0], container.nanflow, inst)
+
+        elif isinstance(container, IrregularlyBin):
+            values, m = node.children[0]
+            for i, (low, v) in enumerate(container.bins):
+                self.writeBack(values, v, inst * m + i)
+            self.writeBack(node.children[1][0], container.nanflow, inst)
+
+        elif isinstance(container, (SparselyBin, Categorize)):
+            values, m = node.children[0]
+            for i, key in enumerate(node.keys):
+                # only keys that were filled for this instance become bins, as with fill
+                if values.storage[inst * m + i, 0] > 0.0:
+                    container.bins[key] = container.value.zero()
+                    self.writeBack(values, container.bins[key], inst * m + i)
+            if isinstance(container, SparselyBin):
+                self.writeBack(node.children[1][0], container.nanflow, inst)
+
+        elif isinstance(container, Select):
+            self.writeBack(node.children[0][0], container.cut, inst)
+
+        elif isinstance(container, Fraction):
+            self.writeBack(node.children[0][0], container.numerator, inst)
+            self.writeBack(node.children[1][0], container.denominator, inst)
+
+        elif isinstance(container, (Label, UntypedLabel)):
+            for (child, _), k in zip(node.children, sorted(container.pairs)):
+                self.writeBack(child, container.pairs[k], inst)
+
+        elif isinstance(container, (Index, Branch)):
+            for (child, _), v in zip(node.children, container.values):
+                self.writeBack(child, v, inst)
+
+
+def _compile(source, jit):
+    global _jittedHelpers
+    key = (source, jit)
+    if key not in _compiled:
+        if jit:
+            try:
+                import numba
+            except ImportError:
+                raise ImportError("fill.numba requires numba (pip install numba); "
+                                  "use jit=False to run the generated row loop in Python")
+            if _jittedHelpers is None:
+                _jittedHelpers = dict((name, numba.njit(f)) for name, f in _helpers.items())
+            namespace = dict(_jittedHelpers)
+        else:
+            namespace = dict(_helpers)
+        exec(compile(source, "<histogrammar row loop>", "exec"), namespace)
+        fcn = namespace["fill"]
+        if jit:
+            fcn = numba.njit(nogil=True)(fcn)
+        _compiled[key] = fcn
+    return _compiled[key]
+
+
+def _length(data, weights):
+    if isinstance(weights, np.ndarray):
+        return len(weights)
+    if isinstance(data, dict):
+        for v in data.values():
+            return len(v)
+        raise ValueError("cannot determine the number of rows of empty data")
+    return len(data)
+
+
+def fillnumba(container, data, weights=1.0, jit=True):
+    """Fill ``container`` with a Numba-compiled row loop over numpy columns.
+
+    Parameters:
+        container (:doc:`Container <histogrammar.defs.Container>`): container to fill (modified in place).
+        data (dict of numpy arrays or pandas DataFrame): input columns, as for ``fill.numpy``.
+        weights (numpy array or float): per-row weights; rows with non-positive weight are skipped.
+        jit (bool): if False, run the generated loop in Python (for debugging; no Numba needed).
+    """
+    container._checkForCrossReferences()
+    length = _length(data, weights)
+    if isinstance(weights, np.ndarray):
+        weights = weights.astype(np.float64)
+    else:
+        weights = np.full(length, float(weights))
+
+    plan = _Plan(container, data, length)
+    fcn = _compile(plan.source(), jit)
+    fcn(*plan.arguments(weights))
+
+    batch = container.zero()
+    plan.writeBack(plan.root, batch, 0)
+    container += batch
@@ -14,27 +14,59 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import ast as pyast
+import copy
+import json
+import threading
+
 import histogrammar.pycparser.c_parser
 import histogrammar.pycparser.c_generator
 import histogrammar.pycparser.c_ast
 
+# Building a CParser loads the (precompiled) lextab/yacctab modules and sets up the PLY lexer and LALR tables, so
+# one parser is shared by the whole process. PLY parsers are not reentrant, hence the lock.
+_parser = None
+_parserLock = threading.RLock()
+
+# parsed expressions, by source string; the code generators modify ASTs in place, so callers get deep copies
+_parsedExpressions = {}
+_parsedExpressionsMaxSize = 1024
+
+
+def cachedParser():
+    """Return the process-wide ``CParser``, creating it on first use."""
+    global _parser
+    if _parser is None:
+        with _parserLock:
+            if _parser is None:
+                _parser = histogrammar.pycparser.c_parser.CParser(
+                    lextab="histogrammar.pycparser.lextab", yacctab="histogrammar.pycparser.yacctab")
+    return _parser
+
 
 class C99SourceToAst(object):
     def __init__(self, wholeFile=False):
         self.wholeFile = wholeFile
-        self.parser = histogrammar.pycparser.c_parser.CParser(
-            lextab="histogrammar.pycparser.lextab", yacctab="histogrammar.pycparser.yacctab")
+        self.parser = cachedParser()
+
+    def _parse(self, src):
+        with _parserLock:
+            return self.parser.parse(src)
 
     def __call__(self, src):
         if self.wholeFile:
-            return self.parser.parse(src)
+            return self._parse(src)
         else:
-            src = "void wrappedAsFcn() {" + src + ";}"
-            ast = self.parser.parse(src).ext[0].body.block_items
-            if len(ast) < 1:
-                raise SyntaxError("empty expression")
-            else:
-                return [x for x in ast if not isinstance(x, histogrammar.pycparser.c_ast.EmptyStatement)]
+            ast = _parsedExpressions.get(src)
+            if ast is None:
+                ast = self._parse("void wrappedAsFcn() {" + src + ";}").ext[0].body.block_items
+                if len(ast) < 1:
+                    raise SyntaxError("empty expression")
+                ast = [x for x in ast if not isinstance(x, histogrammar.pycparser.c_ast.EmptyStatement)]
+                if len(_parsedExpressions) >= _parsedExpressionsMaxSize:
+                    _parsedExpressions.clear()
+                _parsedExpressions[src] = ast
+            return copy.deepcopy(ast)
 
 
 class C99AstToSource(object):
@@ -45,3 +77,225 @@ class C99AstToSource(object):
         if isinstance(ast, (list, tuple)):
             return "; ".join(self.generator.visit(x).strip() for x in ast)
         return self.generator.visit(ast).strip()
+
+
+class C99AstToNumpy(object):
+    """Translate C99 expression ASTs into the source of a vectorized Python function on numpy arrays.
+
+    Supports arithmetic, comparison, logical, bitwise and ternary operators, casts to arithmetic types, C math
+    functions and local declarations (``double r = sqrt(x*x + y*y); r*r``). Where a string is also a Python
+    expression, the translation has its Python meaning, as in ``fill``: ``%`` takes the sign of the divisor and
+    ``/`` is true division. Otherwise (with casts, declarations or C-only operators) it has its C meaning, as in
+    the C backends, which take the data as floating point: casts to integers truncate, ``/`` of two integers
+    truncates and ``%`` of two integers takes the sign of the dividend; ``%`` of a floating-point number is an
+    error. Expressions that C and Python parse differently (chained comparisons like ``0 < x < 3``, and
+    comparisons as operands of ``&``, ``|`` or ``^``) are not translated, nor is anything else that has no
+    vectorized equivalent (pointers, struct members, assignments, unknown functions): these raise
+    ``NotImplementedError``.
+    """
+
+    functions = {"sqrt": "sqrt", "cbrt": "cbrt", "exp": "exp", "exp2": "exp2", "expm1": "expm1", "log": "log",
+                 "log10": "log10", "log2": "log2", "log1p": "log1p", "pow": "power", "hypot": "hypot",
+                 "sin": "sin", "cos": "cos", "tan": "tan", "asin": "arcsin", "acos": "arccos", "atan": "arctan",
+                 "atan2": "arctan2", "sinh": "sinh", "cosh": "cosh", "tanh": "tanh", "asinh": "arcsinh",
+                 "acosh": "arccosh", "atanh": "arctanh", "fabs": "fabs", "abs": "absolute", "floor": "floor",
+                 "ceil": "ceil", "trunc": "trunc", "rint": "rint", "fmod": "fmod", "fmin": "fmin", "fmax": "fmax",
+                 "copysign": "copysign", "isnan": "isnan", "isinf": "isinf", "isfinite": "isfinite",
+                 "signbit": "signbit"}
+
+    constants = {"M_PI": "_np.pi", "M_E": "_np.e", "INFINITY": "_np.inf", "HUGE_VAL": "_np.inf", "NAN": "_np.nan"}
+
+    types = {"double": "float64", "float": "float32", "int": "int64", "long": "int64", "short": "int64",
+             "char": "int64", "unsigned": "uint64", "signed": "int64", "_Bool": "bool_", "bool": "bool_"}
+
+    binaryOperators = {"+": "({0} + {1})", "-": "({0} - {1})", "*": "({0} * {1})", "/": "({0} / {1})",
+                       "%": "_np.remainder({0}, {1})", "<": "({0} < {1})", ">": "({0} > {1})", "<=": "({0} <= {1})",
+                       ">=": "({0} >= {1})", "==": "({0} == {1})", "!=": "({0} != {1})",
+                       "&&": "_np.logical_and({0}, {1})", "||": "_np.logical_or({0}, {1})", "&": "({0} & {1})",
+                       "|": "({0} | {1})", "^": "({0} ^ {1})", "<<": "({0} << {1})", ">>": "({0} >> {1})"}
+
+    unaryOperators = {"-": "(-{0})", "+": "(+{0})", "!": "_np.logical_not({0})", "~": "(~{0})"}
+
+    comparisons = ("<", ">", "<=", ">=", "==", "!=")
+
+    # operators that bind less tightly than comparisons in C, but more tightly in Python
+    bitwiseOperators = ("&", "|", "^")
+
+    # operators whose C result is an integer, whatever the type of their operands
+    integerOperators = comparisons + bitwiseOperators + ("&&", "||", "<<", ">>")
+
+    # the same in C, but different in Python: truncating integer division and remainder
+    integerDivision = {"/": "(({0} - _np.fmod({0}, {1})) // {1})", "%": "_np.fmod({0}, {1})"}
+
+    integerFunctions = ("isnan", "isinf", "isfinite", "signbit")
+
+    def __call__(self, ast, python=True):
+        """Return ``(source, freeVariables)`` for a list of statement ASTs, as produced by ``C99SourceToAst``.
+
+        The source defines ``def _vectorized(_np, <freeVariables>)`` returning the value of the last statement.
+        If ``python`` is True (the expression is also a Python expression), ``/`` and ``%`` have their Python
+        meaning, otherwise their C meaning.
+        """
+        self.python = python
+        # names of the local variables, to whether their type is an integer
+        self.locals = {}
+        self.free = []
+        body = []
+        for statement in ast[:-1]:
+            if not isinstance(statement, histogrammar.pycparser.c_ast.Decl) or statement.init is None:
+                raise NotImplementedError("only declarations may precede the final expression")
+            init = self._dtype(statement.type, self._visit(statement.init))
+            body.append("    {0} = {1}".format(self._local(statement.name), init))
+            self.locals[statement.name] = self._isIntegerType(statement.type)
+        body.append("    return " + self._visit(ast[-1]))
+        return "def _vectorized(" + ", ".join(["_np"] + [self._variable(x) for x in self.free]) + "):\n" + \
+            "\n".join(body) + "\n", list(self.free)
+
+    @staticmethod
+    def _variable(name):
+        return "v_" + name
+
+    @staticmethod
+    def _local(name):
+        return "l_" + name
+
+    def _numpyType(self, typeDecl):
+        c_ast = histogrammar.pycparser.c_ast
+        if not isinstance(typeDecl, c_ast.TypeDecl) or not isinstance(typeDecl.type, c_ast.IdentifierType):
+            raise NotImplementedError("only arithmetic types are supported")
+        names = [x for x in typeDecl.type.names if x not in ("const", "long", "short", "signed")] or \
+            [typeDecl.type.names[-1]]
+        if len(names) != 1 or names[0] not in self.types:
+            raise NotImplementedError("unsupported type: " + " ".join(typeDecl.type.names))
+        return self.types[names[0]]
+
+    def _isIntegerType(self, typeDecl):
+        return self._numpyType(typeDecl) not in ("float64", "float32")
+
+    def _isInteger(self, ast):
+        """Whether a C expression has an integer type, with the free variables (the data) as floating point."""
+        c_ast = histogrammar.pycparser.c_ast
+        if isinstance(ast, c_ast.Constant):
+            return ast.type in ("int", "char")
+        elif isinstance(ast, c_ast.ID):
+            return self.locals.get(ast.name, False)
+        elif isinstance(ast, c_ast.UnaryOp):
+            return ast.op == "!" or self._isInteger(ast.expr)
+        elif isinstance(ast, c_ast.BinaryOp):
+            return ast.op in self.integerOperators or (self._isInteger(ast.left) and self._isInteger(ast.right))
+        elif isinstance(ast, c_ast.TernaryOp):
+            return self._isInteger(ast.iftrue) and self._isInteger(ast.iffalse)
+        elif isinstance(ast, c_ast.Cast):
+            return self._isIntegerType(ast.to_type.type)
+        elif isinstance(ast, c_ast.FuncCall):
+            return isinstance(ast.name, c_ast.ID) and ast.name.name in self.integerFunctions
+        return False
+
+    def _dtype(self, typeDecl, expr):
+        dtype = self._numpyType(typeDecl)
+        if dtype in ("int64", "uint64"):
+            return "_np.trunc({0}).astype(_np.{1})".format(expr, dtype)
+        return "_np.asarray({0}, dtype=_np.{1})".format(expr, dtype)
+
+    def _constant(self, ast):
+        if ast.type == "int":
+            value = ast.value.rstrip("uUlL")
+            if len(value) > 1 and value[0] == "0" and value[1] not in "xXbB":
+                return repr(int(value, 8))
+            return repr(int(value, 0))
+        elif ast.type in ("float", "double"):
+            return repr(float(ast.value.rstrip("fFlL")))
+        elif ast.type == "string":
+            return repr(json.loads(ast.value))
+        raise NotImplementedError("unsupported constant: " + ast.value)
+
+    def _visit(self, ast):
+        c_ast = histogrammar.pycparser.c_ast
+
+        if isinstance(ast, c_ast.ID):
+            if ast.name in self.locals:
+                return self._local(ast.name)
+            if ast.name in self.constants:
+                return self.constants[ast.name]
+            if ast.name not in self.free:
+                self.free.append(ast.name)
+            return self._variable(ast.name)
+
+        elif isinstance(ast, c_ast.Constant):
+            return self._constant(ast)
+
+        elif isinstance(ast, c_ast.UnaryOp) and ast.op in self.unaryOperators:
+            return self.unaryOperators[ast.op].format(self._visit(ast.expr))
+
+        elif isinstance(ast, c_ast.BinaryOp) and ast.op in self.binaryOperators:
+            if ast.op in self.comparisons + self.bitwiseOperators and any(
+                    isinstance(x, c_ast.BinaryOp) and x.op in self.comparisons for x in (ast.left, ast.right)):
+                # C reads "0 < x < 3" as "(0 < x) < 3" and "x & 1 == 0" as "x & (1 == 0)"; Python doesn't
+                raise NotImplementedError("comparison in {0} means different things in C and Python".format(ast.op))
+            if not self.python and ast.op in self.integerDivision:
+                if self._isInteger(ast.left) and self._isInteger(ast.right):
+                    return self.integerDivision[ast.op].format(self._visit(ast.left), self._visit(ast.right))
+                elif ast.op == "%":
+                    raise NotImplementedError("% of a floating-point number is not C")
+            return self.binaryOperators[ast.op].format(self._visit(ast.left), self._visit(ast.right))
+
+        elif isinstance(ast, c_ast.TernaryOp):
+            return "_np.where({0}, {1}, {2})".format(self._visit(ast.cond), self._visit(ast.iftrue),
+                                                     self._visit(ast.iffalse))
+
+        elif isinstance(ast, c_ast.Cast):
+            return self._dtype(ast.to_type.type, self._visit(ast.expr))
+
+        elif isinstance(ast, c_ast.FuncCall) and isinstance(ast.name, c_ast.ID) and \
+                ast.name.name in self.functions:
+            args = [] if ast.args is None else [self._visit(x) for x in ast.args.exprs]
+            return "_np.{0}({1})".format(self.functions[ast.name.name], ", ".join(args))
+
+        raise NotImplementedError("no vectorized translation of " + type(ast).__name__ +
+                                  ("" if not hasattr(ast, "op") else " " + ast.op))
+
+
+class VectorizedExpression(object):
+    """A C99 expression string compiled into a function of numpy arrays.
+
+    Call with a dict of arrays (extra entries are ignored); ``variables`` lists the names it needs.
+    """
+
+    def __init__(self, src):
+        self.src = src
+        try:
+            pyast.parse(src, "<string>", "eval")
+        except SyntaxError:
+            python = False
+        else:
+            python = True
+        self.source, self.variables = C99AstToNumpy()(C99SourceToAst()(src), python)
+        namespace = {}
+        exec(compile(self.source, "<vectorized " + src + ">", "exec"), namespace)
+        self.fcn = namespace["_vectorized"]
+        import numpy
+        self.numpy = numpy
+
+    def __call__(self, columns):
+        return self.fcn(self.numpy, *[columns[x] for x in self.variables])
+
+
+_vectorizedExpressions = {}
+
+
+def vectorizedExpression(src):
+    """Return the ``VectorizedExpression`` for a C99 expression string, or None if it can't be translated.
+
+    Results (including failures) are cached per string.
+    """
+    try:
+        return _vectorizedExpressions[src]
+    except KeyError:
+        try:
+            out = VectorizedExpression(src)
+        except Exception:
+            out = None
+        if len(_vectorizedExpressions) >= _parsedExpressionsMaxSize:
+            _vectorizedExpressions.clear()
+        _vectorizedExpressions[src] = out
+        return out
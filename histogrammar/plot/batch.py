@@ -0,0 +1,214 @@
+# Copyright (c) 2021 ING Wholesale Banking Advanced Analytics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Render many histograms to image files at once, with matplotlib, in parallel worker processes.
+
+The bin arrays of all histograms are extracted first, in the calling process, into plain dicts of numpy arrays
+(containers themselves may not be picklable, e.g. with lambda quantities). The extracted data are then split
+over worker processes, each of which draws on a single figure that it reuses for all of its plots, with one
+artist per histogram (``Axes.stairs``, a ``PolyCollection`` of bars for categories, or ``pcolormesh`` for 2d
+histograms) instead of one rectangle per bin.
+The plots look like the ``plotmatplotlib`` methods of the containers.
+
+Example:
+
+.. code-block:: python
+
+    from histogrammar.plot.batch import plot_many
+
+    hists = df.hg_make_histograms(features=features)
+    files = plot_many(hists, "report/", fmt="png", workers=8)
+"""
+
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from histogrammar.plot.hist_numpy import get_2dgrid
+
+
+def _tick(label):
+    label = str(label)
+    return label[:17] + "..." if len(label) > 20 else label
+
+
+def extract_plot_data(hist, name=None):
+    """Arrays needed to plot a histogram, as by its ``plotmatplotlib`` method.
+
+    :param hist: Bin, SparselyBin, IrregularlyBin, CentrallyBin or Categorize of counts, or a 2d histogram of these
+    :param str name: title of the plot; default is the name of the container
+    :returns: dict with the kind of plot ("steps", "labels" or "grid"), its arrays and title
+    :rtype: dict
+    """
+    title = hist.name if name is None else name
+    if hist.n_dim >= 2:
+        x_labels, y_labels, grid = get_2dgrid(hist)
+        return {"kind": "grid", "title": title, "values": np.asarray(grid, dtype=np.float64),
+                "xlabels": [_tick(lab) for lab in x_labels], "ylabels": [_tick(lab) for lab in y_labels]}
+
+    kind = hist.name
+    if kind in ("Bin", "SparselyBin"):
+        data = {"kind": "steps", "edges": hist.bin_edges(), "values": hist.bin_entries()}
+        if kind == "SparselyBin" and hist.minBin is not None:
+            data["xlim"] = (hist.low, hist.high)
+    elif kind == "IrregularlyBin":
+        data = {"kind": "steps", "edges": hist.bin_edges()[1:-1], "values": hist.bin_entries()[1:-1]}
+    elif kind in ("Categorize", "CentrallyBin"):
+        labels = hist.bin_labels() if kind == "Categorize" else hist.bin_centers()
+        values = hist.bin_entries()
+        if kind == "Categorize" and len(labels) > 0:
+            # sort labels alphabetically
+            order = np.argsort(labels)
+            labels, values = labels[order], values[order]
+        data = {"kind": "labels", "values": values, "labels": [_tick(lab) for lab in labels]}
+    else:
+        raise TypeError("cannot plot {0}; only Bin, SparselyBin, IrregularlyBin, CentrallyBin and Categorize "
+                        "(of counts) are supported".format(kind))
+    data["title"] = title
+    return data
+
+
+def _bars(ax, lefts, width, heights, kwargs):
+    """Bars as a single PolyCollection, built from the arrays of their corners."""
+    from matplotlib.collections import PolyCollection
+    corners = np.empty((len(lefts), 4, 2))
+    corners[:, (0, 1), 0] = lefts[:, None]
+    corners[:, (2, 3), 0] = (lefts + width)[:, None]
+    corners[:, (0, 3), 1] = 0.0
+    corners[:, (1, 2), 1] = heights[:, None]
+    style = dict(kwargs)
+    if not any(k in style for k in ("color", "facecolor", "facecolors")):
+        style["facecolor"] = "C0"
+    bars = PolyCollection(corners, **style)
+    bars.sticky_edges.y.append(0.0)
+    ax.add_collection(bars)
+    ax.autoscale_view()
+
+
+def _draw(fig, ax, data, kwargs):
+    """Draw extracted plot data on an (emptied) axes; returns artists to remove before the next plot."""
+    extra = []
+    if data["kind"] == "steps":
+        if len(data["values"]) > 0:
+            ax.stairs(data["values"], data["edges"], fill=True, **kwargs)
+        if "xlim" in data:
+            ax.set_xlim(*data["xlim"])
+    elif data["kind"] == "labels":
+        n = len(data["values"])
+        if n > 0:
+            _bars(ax, np.arange(n) + 0.1, 0.8, data["values"], kwargs)
+        ax.set_xlim(0.0, float(n))
+        ax.set_xticks(np.arange(n) + 0.5)
+        ax.set_xticklabels(data["labels"], fontsize=12, rotation=90)
+    else:
+        nx, ny = len(data["xlabels"]), len(data["ylabels"])
+        mesh = ax.pcolormesh(np.arange(nx + 1), np.arange(ny + 1), data["values"], shading="auto")
+        extra.append(fig.colorbar(mesh, ax=ax))
+        ax.set_xticks(np.arange(nx) + 0.5)
+        ax.set_yticks(np.arange(ny) + 0.5)
+        ax.set_xlim(0.0, float(nx))
+        ax.set_ylim(0.0, float(ny))
+        ax.set_xticklabels(data["xlabels"], rotation=90)
+        ax.set_yticklabels(data["ylabels"])
+    ax.set_title(data["title"])
+    return extra
+
+
+def render(items, fmt="png", figsize=None, dpi=100, **kwargs):
+    """Render extracted plot data to files, reusing one figure.
+
+    :param list items: pairs of file path and plot data from :func:`extract_plot_data`
+    :param str fmt: image format, e.g. "png", "svg" or "pdf"
+    :param tuple figsize: figure size in inches, default is matplotlib's
+    :param int dpi: resolution of raster images
+    :param kwargs: ``Axes.stairs`` (or ``PolyCollection``, for categories) properties of 1d plots, e.g. ``color``
+    :returns: list of the paths written
+    """
+    # no pyplot: no global figure manager, and no GUI backend in worker processes
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(1, 1, 1)
+    written = []
+    for path, data in items:
+        ax.clear()
+        extra = _draw(fig, ax, data, kwargs)
+        fig.savefig(path, format=fmt, dpi=dpi)
+        for artist in extra:
+            artist.remove()
+        written.append(path)
+    return written
+
+
+def _file_names(names, fmt):
+    """File names from plot names: unsafe characters replaced, duplicates numbered."""
+    out, seen = [], set()
+    for name in names:
+        base = re.sub(r"[^A-Za-z0-9._-]+", "_", str(name)).strip("_") or "hist"
+        candidate, i = base, 1
+        while candidate in seen:
+            candidate = "{0}_{1}".format(base, i)
+            i += 1
+        seen.add(candidate)
+        out.append("{0}.{1}".format(candidate, fmt))
+    return out
+
+
+def plot_many(hists, directory, fmt="png", workers=None, figsize=None, dpi=100, **kwargs):
+    """Plot many histograms to image files, in parallel.
+
+    :param hists: dict of plot name to histogram (e.g. the output of ``make_histograms``), or list of histograms
+    :param str directory: directory to write the images to; created if it doesn't exist
+    :param str fmt: image format, e.g. "png", "svg" or "pdf". Default is "png".
+    :param int workers: number of worker processes; default is the number of cores. With 1, plots are rendered
+        in the calling process.
+    :param tuple figsize: figure size in inches, default is matplotlib's
+    :param int dpi: resolution of raster images, default is 100
+    :param kwargs: ``Axes.stairs`` (or ``PolyCollection``, for categories) properties of 1d plots, e.g. ``color``
+    :returns: dict of plot name (or list index) to the path of its image
+    :rtype: dict
+    """
+    if not isinstance(hists, dict):
+        hists = dict(enumerate(hists))
+    names = list(hists)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+
+    os.makedirs(directory, exist_ok=True)
+    paths = [os.path.join(directory, f) for f in _file_names(names, fmt)]
+    items = [(path, extract_plot_data(hists[name], None if isinstance(name, int) else str(name)))
+             for name, path in zip(names, paths)]
+
+    workers = min(workers, len(items))
+    if workers <= 1:
+        render(items, fmt, figsize, dpi, **kwargs)
+    else:
+        # interleaved chunks, so that large histograms are spread over the workers
+        chunks = [items[i::workers] for i in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(render, chunk, fmt, figsize, dpi, **kwargs) for chunk in chunks]
+            for future in futures:
+                future.result()
+    return dict(zip(names, paths))
@@ -17,7 +17,6 @@
 # "Public" methods; what we want to attach to the Histogram as a mix-in.
 from __future__ import absolute_import
 
-import math
 
 # python 2/3 compatibility fixes
 # from histogrammar.util import *
@@ -37,18 +36,16 @@ class HistogramMethods(object):
         # data
         from bokeh.models import ColumnDataSource
 
-        # Parameters of the histogram
+        import numpy as np
+
+        # Parameters of the histogram, as numpy columns of the data source
         lo = self.low
         hi = self.high
         num = self.num
         bin_width = (hi-lo)/num
-        x = list()
-        center = lo
-        for _ in range(num):
-            x.append(center+bin_width/2)
-            center += bin_width
-        y = self.numericalValues
-        ci = [2.*v for v in self.confidenceIntervalValues()]
+        x = lo + (np.arange(num) + 0.5) * bin_width
+        y = self.bin_entries()
+        ci = 2. * np.sqrt(y)
 
         source = ColumnDataSource(data=dict(x=x, y=y, ci=ci))
 
@@ -118,7 +115,7 @@ class HistogramMethods(object):
                 fill_color=fillColor)
         elif glyphType == "histogram":
             h = y
-            y = [yy/2 for yy in y]
+            y = y / 2
             source = ColumnDataSource(dict(x=x, y=y, h=h))
             glyph = Rect(
                 x='x',
@@ -142,7 +139,11 @@ class HistogramMethods(object):
 
 class SparselyHistogramMethods(object):
     def plotbokeh(self, glyphType="line", glyphSize=1, fillColor="red",
-                  lineColor="black", lineAlpha=1, fillAlpha=0.1, lineDash='solid'):
+                  lineColor="black", lineAlpha=1, fillAlpha=0.1, lineDash='solid', maxPoints=2000):
+        """With more than ``maxPoints`` bins between the first and the last filled one, bins are aggregated into
+        at most ``maxPoints`` buckets, each shown with its highest bin (see ``hist_numpy.downsample_sparse``), so
+        that the data source scales with the plot resolution instead of the number of bins.
+        """
 
         # glyphs
         from bokeh.models.glyphs import Rect, Line
@@ -154,17 +155,13 @@ class SparselyHistogramMethods(object):
         # data
         from bokeh.models import ColumnDataSource
 
-        # Parameters of the histogram
-        lo = self.low
-        hi = self.high
-        num = self.numFilled
-        bin_width = (hi-lo)/num
-        x = list()
-        center = lo
-        for _ in range(num):
-            x.append(center+bin_width/2)
-            center += bin_width
-        y = [v.entries for _, v in sorted(self.bins.items())]
+        import numpy as np
+        from histogrammar.plot.hist_numpy import downsample_sparse
+
+        # Parameters of the histogram: bins, or buckets of bins, from the first to the last filled bin
+        edges, _, _, y = downsample_sparse(self, maxPoints)
+        bin_width = edges[1] - edges[0] if len(edges) > 1 else self.binWidth
+        x = (edges[:-1] + edges[1:]) / 2
 
         source = ColumnDataSource(data=dict(x=x, y=y))
 
@@ -224,7 +221,7 @@ class SparselyHistogramMethods(object):
                 line_color=lineColor,
                 fill_color=fillColor)
         elif glyphType == "errors":
-            ci = [2.*v for v in self.confidenceIntervalValues()]
+            ci = 2. * np.sqrt(y)
             source = ColumnDataSource(data=dict(x=x, y=y, ci=ci))
             glyph = Rect(
                 x='x',
@@ -235,9 +232,7 @@ class SparselyHistogramMethods(object):
                 line_color=lineColor,
                 fill_color=fillColor)
         elif glyphType == "histogram":
-            h = y
-            y = [yy/2 for yy in y]
-            source = ColumnDataSource(dict(x=x, y=y, h=h))
+            source = ColumnDataSource(dict(x=x, y=y / 2, h=y))
             glyph = Rect(
                 x='x',
                 y='y',
@@ -284,19 +279,17 @@ class ProfileMethods(object):
         # data
         from bokeh.models import ColumnDataSource
 
-        # Parameters of the histogram
+        import numpy as np
+
+        # Parameters of the histogram: centers and means of the bins that have a mean
         lo = self.low
         hi = self.high
         num = self.num
         bin_width = (hi-lo)/num
-        x = list()
-        y = list()
-        center = lo
-        for v in self.values:
-            if not math.isnan(v.mean):
-                y.append(v.mean)
-                x.append(center+bin_width/2)
-                center += bin_width
+        means = np.fromiter((v.mean for v in self.values), dtype=np.float64, count=num)
+        filled = ~np.isnan(means)
+        x = (lo + (np.arange(num) + 0.5) * bin_width)[filled]
+        y = means[filled]
 
         source = ColumnDataSource(data=dict(x=x, y=y))
 
@@ -349,7 +342,7 @@ class ProfileMethods(object):
         elif glyphType == "histogram":
             w = [bin_width for _ in x]
             h = y
-            y = [yy/2 for yy in y]
+            y = y / 2
             source = ColumnDataSource(dict(x=x, y=y, w=w, h=h))
             glyph = Rect(
                 x='x',
@@ -389,21 +382,17 @@ class ProfileErrMethods(object):
         # data
         from bokeh.models import ColumnDataSource
 
-        from math import sqrt
+        import numpy as np
 
-        # Parameters of the histogram
+        # Parameters of the histogram: centers and means of the bins that have a mean
         lo = self.low
         hi = self.high
         num = self.num
         bin_width = (hi-lo)/num
-        x = list()
-        y = list()
-        center = lo
-        for v in self.values:
-            if not math.isnan(v.mean):
-                y.append(v.mean)
-                x.append(center+bin_width/2)
-                center += bin_width
+        means = np.fromiter((v.mean for v in self.values), dtype=np.float64, count=num)
+        filled = ~np.isnan(means)
+        x = (lo + (np.arange(num) + 0.5) * bin_width)[filled]
+        y = means[filled]
 
         source = ColumnDataSource(data=dict(x=x, y=y))
 
@@ -454,8 +443,10 @@ class ProfileErrMethods(object):
                 size=glyphSize,
                 line_dash=lineDash)
         elif glyphType == "errors":
-            w = [bin_width for _ in x]
-            h = [sqrt(v.variance/v.entries) if v.entries > 0 else 0.0 for v in self.values]
+            w = np.full(len(x), bin_width)
+            variances = np.fromiter((v.variance for v in self.values), dtype=np.float64, count=num)[filled]
+            entries = np.fromiter((v.entries for v in self.values), dtype=np.float64, count=num)[filled]
+            h = np.sqrt(np.divide(variances, entries, out=np.zeros_like(entries), where=entries > 0))
             source = ColumnDataSource(dict(x=x, y=y, w=w, h=h))
             glyph = Rect(
                 x='x',
@@ -468,7 +459,7 @@ class ProfileErrMethods(object):
         elif glyphType == "histogram":
             w = [bin_width for _ in x]
             h = y
-            y = [yy/2 for yy in y]
+            y = y / 2
             source = ColumnDataSource(dict(x=x, y=y, w=w, h=h))
             glyph = Rect(
                 x='x',
@@ -73,6 +73,8 @@ def set_2dgrid(hist, xkeys, ykeys):
     :return: filled 2d numpy grid
     """
     grid = np.zeros((len(ykeys), len(xkeys)))
+    xindex = _key_index(xkeys)
+    yindex = _key_index(ykeys)
 
     if hist.n_dim < 2:
         warnings.warn(
@@ -86,16 +88,15 @@ def set_2dgrid(hist, xkeys, ykeys):
     if hasattr(hist, "bins"):
         hist_bins = dict(hist.bins)
         for k, h in hist_bins.items():
-            if k not in xkeys:
+            i = xindex.get(k)
+            if i is None:
                 continue
-            i = xkeys.index(k)
             if hasattr(h, "bins"):
                 h_bins = dict(h.bins)
                 for l, g in h_bins.items():
-                    if l not in ykeys:
-                        continue
-                    j = ykeys.index(l)
-                    grid[j, i] = g.entries
+                    j = yindex.get(l)
+                    if j is not None:
+                        grid[j, i] = g.entries
             elif hasattr(h, "values"):
                 for j, g in enumerate(h.values):
                     grid[j, i] = g.entries
@@ -105,10 +106,9 @@ def set_2dgrid(hist, xkeys, ykeys):
             if hasattr(h, "bins"):
                 h_bins = dict(h.bins)
                 for l, g in h_bins.items():
-                    if l not in ykeys:
-                        continue
-                    j = ykeys.index(l)
-                    grid[j, i] = g.entries
+                    j = yindex.get(l)
+                    if j is not None:
+                        grid[j, i] = g.entries
             elif hasattr(h, "values"):
                 for j, g in enumerate(h.values):
                     grid[j, i] = g.entries
@@ -174,8 +174,289 @@ def prepare2Dsparse(sparse):
 
 
 def set2Dsparse(sparse, yminBin, ymaxBin, grid):
-    for i, iindex in enumerate(range(sparse.minBin, sparse.maxBin + 1)):
-        for j, jindex in enumerate(range(yminBin, ymaxBin + 1)):
-            if iindex in sparse.bins and jindex in sparse.bins[iindex].bins:
-                grid[j, i] = sparse.bins[iindex].bins[jindex].entries
+    # only the filled bins are visited, not the whole (x, y) range
+    xminBin = sparse.minBin
+    for iindex, ybins in sparse.bins.items():
+        for jindex, v in ybins.bins.items():
+            if yminBin <= jindex <= ymaxBin:
+                grid[jindex - yminBin, iindex - xminBin] = v.entries
     return grid
+
+
+def _key_index(keys):
+    """Dict from key to its position in the list ``keys``"""
+    return dict((k, i) for i, k in enumerate(keys))
+
+
+def _sorted_keys(keys):
+    try:
+        return sorted(keys)
+    except TypeError:
+        # e.g. Categorize with both bool and str keys
+        return sorted(keys, key=lambda k: (type(k).__name__, str(k)))
+
+
+def _node_bins(node):
+    """Keys and sub-histograms of a binning node: bin indexes for Bin, else the keys of its bins"""
+    if hasattr(node, "bins"):
+        bins = node.bins.items() if isinstance(node.bins, dict) else node.bins
+        return [k for k, _ in bins], [v for _, v in bins]
+    return range(len(node.values)), node.values
+
+
+def _collect(hist, n_dim=None):
+    """Walk the first ``n_dim`` binning levels of ``hist`` once, breadth first.
+
+    :return: tuple of leaf entries (numpy array), per-axis leaf coordinates (numpy int arrays),
+        per-axis sorted keys and per-axis labels (bin centers, or the keys themselves for Categorize)
+    """
+    if n_dim is None:
+        n_dim = hist.n_dim
+    if n_dim < 1 or n_dim > hist.n_dim:
+        raise ValueError("Histogram has {n} dimensions, cannot export {m}.".format(n=hist.n_dim, m=n_dim))
+
+    nodes = [hist]
+    codes = []
+    parents = []
+    axis_keys = []
+    axis_labels = []
+    for _ in range(n_dim):
+        keys = []
+        parent = []
+        children = []
+        representative = None
+        for j, node in enumerate(nodes):
+            node_keys, node_children = _node_bins(node)
+            if representative is None and len(node_children) > 0:
+                representative = node
+            keys.extend(node_keys)
+            parent.extend([j] * len(node_children))
+            children.extend(node_children)
+
+        unique = _sorted_keys(set(keys))
+        index = _key_index(unique)
+        codes.append(np.fromiter((index[k] for k in keys), dtype=np.int64, count=len(keys)))
+        parents.append(np.array(parent, dtype=np.int64))
+        axis_keys.append(np.array(unique))
+        if representative is None:
+            axis_labels.append(np.array(unique))
+        else:
+            axis_labels.append(np.array([representative._center_from_key(k) for k in unique]))
+        nodes = children
+
+    data = np.fromiter((node.entries for node in nodes), dtype=np.float64, count=len(nodes))
+    # follow the parent links from the leaves back to the root, one axis at a time
+    coords = [None] * n_dim
+    position = np.arange(len(nodes))
+    for d in range(n_dim - 1, -1, -1):
+        coords[d] = codes[d][position]
+        position = parents[d][position]
+    return data, coords, axis_keys, axis_labels
+
+
+class NdGrid(object):
+    """Dense N-D numpy array of the entries of a nested histogram, with the keys and labels of each axis.
+
+    Axis ``d`` of ``values`` corresponds to nesting level ``d`` of the histogram (the outermost is axis 0).
+    """
+
+    def __init__(self, values, keys, labels):
+        """Initialize the grid.
+
+        :param values: numpy array of entries
+        :param list keys: per axis, numpy array of the bin keys (Bin indexes, SparselyBin indexes, categories, edges
+            of IrregularlyBin or centers of CentrallyBin)
+        :param list labels: per axis, numpy array of the bin centers (categories for Categorize)
+        """
+        self.values = values
+        self.keys = list(keys)
+        self.labels = list(labels)
+
+    @property
+    def n_dim(self):
+        return self.values.ndim
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def project(self, *axes):
+        """Sum over all axes but the given ones, which are kept in the given order.
+
+        :param int axes: axes to keep
+        :return: NdGrid
+        """
+        others = tuple(d for d in range(self.n_dim) if d not in axes)
+        values = self.values.sum(axis=others)
+        kept = sorted(axes)
+        values = np.transpose(values, [kept.index(d) for d in axes])
+        return NdGrid(values, [self.keys[d] for d in axes], [self.labels[d] for d in axes])
+
+    def select(self, axis, low=None, high=None, keys=None):
+        """Slice one axis, by a label range ``[low, high)`` or by a list of keys.
+
+        :param int axis: axis to slice
+        :param low: lowest label to keep (numeric axes), default is no limit
+        :param high: label above the highest to keep (numeric axes), default is no limit
+        :param list keys: keys to keep, in this order; keys not in the axis are ignored
+        :return: NdGrid
+        """
+        if keys is not None:
+            index = _key_index(self.keys[axis].tolist())
+            positions = np.array([index[k] for k in keys if k in index], dtype=np.int64)
+        else:
+            mask = np.ones(len(self.labels[axis]), dtype=bool)
+            if low is not None:
+                mask &= self.labels[axis] >= low
+            if high is not None:
+                mask &= self.labels[axis] < high
+            positions = np.nonzero(mask)[0]
+        keys = list(self.keys)
+        labels = list(self.labels)
+        keys[axis] = keys[axis][positions]
+        labels[axis] = labels[axis][positions]
+        return NdGrid(np.take(self.values, positions, axis=axis), keys, labels)
+
+    def to_coo(self):
+        """Sparse version of this grid: CooGrid of the non-zero values"""
+        coords = np.nonzero(self.values)
+        return CooGrid(coords, self.values[coords], self.shape, self.keys, self.labels)
+
+
+class CooGrid(object):
+    """Sparse (coordinate format) N-D grid of the entries of a nested histogram: only filled bins are stored.
+
+    ``values[i]`` is at position ``coords[0][i], coords[1][i], ...`` of the dense grid of shape ``shape``.
+    """
+
+    def __init__(self, coords, values, shape, keys, labels):
+        """Initialize the grid.
+
+        :param coords: per axis, numpy int array of positions
+        :param values: numpy array of entries
+        :param tuple shape: shape of the dense grid
+        :param list keys: per axis, numpy array of the bin keys
+        :param list labels: per axis, numpy array of the bin centers (categories for Categorize)
+        """
+        self.coords = tuple(coords)
+        self.values = values
+        self.shape = tuple(shape)
+        self.keys = list(keys)
+        self.labels = list(labels)
+
+    @property
+    def n_dim(self):
+        return len(self.shape)
+
+    def to_dense(self):
+        """Dense version of this grid: NdGrid"""
+        values = np.zeros(self.shape)
+        np.add.at(values, self.coords, self.values)
+        return NdGrid(values, self.keys, self.labels)
+
+    def project(self, *axes):
+        """Sum over all axes but the given ones, which are kept in the given order.
+
+        :param int axes: axes to keep
+        :return: CooGrid
+        """
+        shape = tuple(self.shape[d] for d in axes)
+        if len(self.values) == 0:
+            return CooGrid([c[:0] for c in self.coords[:len(axes)]], self.values, shape,
+                           [self.keys[d] for d in axes], [self.labels[d] for d in axes])
+        flat = np.ravel_multi_index([self.coords[d] for d in axes], shape)
+        unique, inverse = np.unique(flat, return_inverse=True)
+        values = np.bincount(inverse, weights=self.values)
+        return CooGrid(np.unravel_index(unique, shape), values, shape,
+                       [self.keys[d] for d in axes], [self.labels[d] for d in axes])
+
+
+def get_ndgrid(hist, n_dim=None):
+    """Get dense N-D grid of the entries of a nested histogram
+
+    Works for any nesting of Bin, SparselyBin, Categorize, IrregularlyBin and CentrallyBin, in one pass over the
+    bins. Bin under/overflows and nanflows are not included.
+
+    :param hist: input histogrammar histogram
+    :param int n_dim: number of nesting levels to export (default is all of them); deeper levels are summed
+    :return: NdGrid
+    """
+    data, coords, keys, labels = _collect(hist, n_dim)
+    values = np.zeros(tuple(len(k) for k in keys))
+    values[tuple(coords)] = data
+    return NdGrid(values, keys, labels)
+
+
+def get_coogrid(hist, n_dim=None):
+    """Get sparse (COO) N-D grid of the entries of a nested histogram
+
+    Like ``get_ndgrid``, but only the filled bins are stored, so memory scales with them rather than with the
+    product of the axis lengths.
+
+    :param hist: input histogrammar histogram
+    :param int n_dim: number of nesting levels to export (default is all of them); deeper levels are summed
+    :return: CooGrid
+    """
+    data, coords, keys, labels = _collect(hist, n_dim)
+    return CooGrid(coords, data, tuple(len(k) for k in keys), keys, labels)
+
+
+def downsample_sparse(hist, max_points, low=None, high=None):
+    """Aggregate the bins of a 1d SparselyBin into at most ``max_points`` buckets of equal width
+
+    Buckets hold a whole number of consecutive bins. Only the filled bins are visited, so time and memory scale
+    with the filled bins in range and with ``max_points``, not with the number of (empty) bins between them.
+    Bins of infinite and NaN values are not included.
+
+    :param hist: input SparselyBin histogram
+    :param int max_points: maximum number of buckets, e.g. the width of the plot in pixels
+    :param float low: lower edge of the range, default is the low edge of the first filled bin
+    :param float high: upper edge of the range, default is the high edge of the last filled bin
+    :return: bucket edges (one more than buckets), and the sum, minimum and maximum of the bin entries in each
+        bucket (empty bins count as zero)
+    :rtype: tuple of four numpy arrays
+    """
+    from histogrammar.primitives.sparselybin import LONG_MINUSINF, LONG_PLUSINF
+    from histogrammar.util import binIndex
+
+    if max_points < 1:
+        raise ValueError("max_points must be at least 1")
+    index = binIndex(hist)
+    # drop the bins of NaN (LONG_NAN is below LONG_MINUSINF) and infinite values
+    lo = np.searchsorted(index.keys, LONG_MINUSINF, side="right")
+    hi = np.searchsorted(index.keys, LONG_PLUSINF, side="left")
+    keys, entries = index.keys[lo:hi], index.entries[lo:hi]
+    if len(keys) == 0:
+        return np.array([hist.origin]), np.zeros(0), np.zeros(0), np.zeros(0)
+
+    first = int(keys[0]) if low is None else int(np.floor((low - hist.origin) / hist.binWidth))
+    last = int(keys[-1]) if high is None else int(np.ceil((high - hist.origin) / hist.binWidth)) - 1
+    last = max(first, last)
+    num_bins = last - first + 1
+    factor = -(-num_bins // int(max_points))
+    num_buckets = -(-num_bins // factor)
+
+    lo = np.searchsorted(keys, first, side="left")
+    hi = np.searchsorted(keys, last, side="right")
+    keys, entries = keys[lo:hi], entries[lo:hi]
+    bucket = (keys - first) // factor
+
+    sums = np.zeros(num_buckets)
+    mins = np.zeros(num_buckets)
+    maxs = np.zeros(num_buckets)
+    if len(keys) > 0:
+        # keys are sorted, so are their buckets: reduce over runs of equal buckets
+        starts = np.flatnonzero(np.concatenate([[True], bucket[1:] != bucket[:-1]]))
+        filled = bucket[starts]
+        sums[filled] = np.add.reduceat(entries, starts)
+        bins_in_bucket = np.minimum(factor, num_bins - filled * factor)
+        complete = np.diff(np.append(starts, len(keys))) == bins_in_bucket
+        # buckets with empty bins have a zero among their entries
+        lowest = np.minimum.reduceat(entries, starts)
+        highest = np.maximum.reduceat(entries, starts)
+        mins[filled] = np.where(complete, lowest, np.minimum(lowest, 0.0))
+        maxs[filled] = np.where(complete, highest, np.maximum(highest, 0.0))
+
+    edges = hist.origin + hist.binWidth * (first + factor * np.arange(num_buckets + 1, dtype=np.float64))
+    edges[-1] = hist.origin + hist.binWidth * (last + 1)
+    return edges, sums, mins, maxs
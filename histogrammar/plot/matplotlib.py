@@ -18,7 +18,7 @@ from __future__ import absolute_import
 
 # python 2/3 compatibility fixes
 from histogrammar.util import xrange
-from histogrammar.plot.hist_numpy import get_2dgrid, prepare2Dsparse, set2Dsparse
+from histogrammar.plot.hist_numpy import get_2dgrid, prepare2Dsparse, set2Dsparse, downsample_sparse
 
 
 # 1d plotting of counts + generic 2d plotting of counts
@@ -54,10 +54,13 @@ class HistogramMethods(object):
 
 
 class SparselyHistogramMethods(object):
-    def plotmatplotlib(self, name=None, **kwargs):
+    def plotmatplotlib(self, name=None, max_points=None, **kwargs):
         """
             name : title of the plot.
-            kwargs :  `matplotlib.patches.Rectangle` properties.
+            max_points : maximum number of bars. With more bins than that (by default, than the width of the
+                axes in pixels), the bins are aggregated into buckets (see `hist_numpy.downsample_sparse`) and
+                drawn as the outline of their highest bins, which is refined when the x-axis is zoomed.
+            kwargs :  `matplotlib.patches.Rectangle` properties (`matplotlib.patches.StepPatch` when aggregated).
 
             Returns a matplotlib.axes instance
         """
@@ -69,11 +72,27 @@ class SparselyHistogramMethods(object):
         import matplotlib.pyplot as plt
         ax = plt.gca()
 
-        edges = self.bin_edges()
-        entries = self.bin_entries()
-        width = self.bin_width()
+        if max_points is None:
+            max_points = max(1, int(ax.bbox.width))
+        num_bins = 0 if self.minBin is None else self.maxBin - self.minBin + 1
 
-        ax.bar(edges[:-1], entries, width=width, align='edge', **kwargs)
+        if num_bins <= max_points:
+            edges = self.bin_edges()
+            entries = self.bin_entries()
+            width = self.bin_width()
+            ax.bar(edges[:-1], entries, width=width, align='edge', **kwargs)
+        else:
+            # level of detail: bounded by max_points, not by the number of bins
+            edges, _, _, highest = downsample_sparse(self, max_points)
+            steps = ax.stairs(highest, edges, fill=True, **kwargs)
+
+            def refine(axes):
+                low, high = axes.get_xlim()
+                edges, _, _, highest = downsample_sparse(self, max_points, max(low, self.low), min(high, self.high))
+                steps.set_data(highest, edges)
+
+            ax.set_xlim(self.low, self.high)
+            ax.callbacks.connect('xlim_changed', refine)
         ax.set_xlim(self.low, self.high)
 
         if name is not None:
@@ -68,10 +68,15 @@ class JsonObject(dict):
         return "".join(out)
 
     def _index(self, key):
-        for i, (k, v) in enumerate(self._pairs):
-            if k == key:
-                return i
-        return -1
+        # positions of the keys, made on first lookup (the pairs never change)
+        try:
+            positions = self._positions
+        except AttributeError:
+            positions = {}
+            for i, (k, v) in enumerate(self._pairs):
+                positions.setdefault(k, i)
+            self._positions = positions
+        return positions.get(key, -1)
 
     def set(self, *path, **kwds):
         if "to" not in kwds:
@@ -120,10 +125,11 @@ class JsonObject(dict):
                 return JsonObject(*[(k, v.without(*path[1:])) if k == key else (k, v) for k, v in self._pairs])
 
     def overlay(self, other):
-        out = self
-        for k, v in other.items():
-            out = out.set(k, to=v)
-        return out
+        # one pass over both objects, rather than a copy per key of other
+        replacements = dict(other.items())
+        pairs = [(k, replacements[k]) if k in replacements else (k, v) for k, v in self._pairs]
+        pairs.extend((k, v) for k, v in replacements.items() if self._index(k) == -1)
+        return JsonObject(*pairs)
 
     # override built-in dict methods
 
@@ -133,7 +139,7 @@ class JsonObject(dict):
         return cmp(dict(self._pairs), dict(other._pairs))
 
     def __contains__(self, key):
-        return any(k == key for k, v in self._pairs)
+        return self._index(key) != -1
 
     def __delattr_(self, key):
         raise TypeError("JsonObject cannot be changed in-place; no immutable equivalent")
@@ -278,6 +284,9 @@ class JsonObject(dict):
 
 
 class JsonArray(tuple):
+    def __new__(cls, *values):
+        return tuple.__new__(cls, values)
+
     def __init__(self, *values):
         self._values = values
         if any(not (v is None or isinstance(v, (basestring, bool, int, long, float, JsonObject, JsonArray)))
@@ -345,7 +354,7 @@ class JsonArray(tuple):
 
     def __str__(self):
         out = ["["]
-        first = False
+        first = True
         for v in self._values:
             if first:
                 first = False
@@ -67,9 +67,10 @@ def write(vegaSpec, outputFile, format=None):
     tmp = tempfile.NamedTemporaryFile(delete=False)
 
     if isinstance(vegaSpec, dict):
-        vegaSpec = json.dump(tmp, vegaSpec)
-    else:
-        tmp.write(vegaSpec)
+        vegaSpec = json.dumps(vegaSpec)
+    if not isinstance(vegaSpec, bytes):
+        vegaSpec = vegaSpec.encode("utf-8")
+    tmp.write(vegaSpec)
 
     tmp.close()
 
@@ -0,0 +1,165 @@
+# Copyright (c) 2021 ING Wholesale Banking Advanced Analytics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Vega specifications of histograms, for rendering with ``nodejs.write`` or in a browser.
+
+A specification is one of a few constant templates (bars on a linear axis, bars of categories, or a heat map),
+copied and completed with the title, size and data of the histogram. The data are columnar: a single record of
+parallel arrays, taken in one step from the bin arrays of the container (``bin_edges``, ``bin_entries``,
+``get_2dgrid``), which a Vega ``flatten`` transform turns into one row per bin. Building a specification is thus
+linear in the number of bins, with no per-bin Python objects besides the lists given to ``json``.
+
+Example:
+
+.. code-block:: python
+
+    from histogrammar.plot.vega import nodejs
+    from histogrammar.plot.vega.spec import histogramSpec
+
+    nodejs.write(histogramSpec(hist, "x"), "x.svg")
+"""
+
+import copy
+import json
+
+import numpy as np
+
+SCHEMA = "https://vega.github.io/schema/vega/v5.json"
+
+_AXES = [{"orient": "bottom", "scale": "x"}, {"orient": "left", "scale": "y"}]
+
+_TEMPLATES = {
+    # bars between the edges of each bin
+    "steps": {
+        "$schema": SCHEMA,
+        "padding": 5,
+        "data": [{"name": "bins", "transform": [{"type": "flatten", "fields": ["x0", "x1", "y"]}]}],
+        "scales": [
+            {"name": "x", "type": "linear", "range": "width", "zero": False, "nice": False,
+             "domain": {"data": "bins", "fields": ["x0", "x1"]}},
+            {"name": "y", "type": "linear", "range": "height", "zero": True, "nice": True,
+             "domain": {"data": "bins", "field": "y"}},
+        ],
+        "axes": _AXES,
+        "marks": [{"type": "rect", "from": {"data": "bins"}, "encode": {"update": {
+            "x": {"scale": "x", "field": "x0"}, "x2": {"scale": "x", "field": "x1"},
+            "y": {"scale": "y", "field": "y"}, "y2": {"scale": "y", "value": 0}}}}],
+    },
+    # one bar per label, in the order of the data
+    "labels": {
+        "$schema": SCHEMA,
+        "padding": 5,
+        "data": [{"name": "bins", "transform": [{"type": "flatten", "fields": ["x", "y"]}]}],
+        "scales": [
+            {"name": "x", "type": "band", "range": "width", "padding": 0.2,
+             "domain": {"data": "bins", "field": "x"}},
+            {"name": "y", "type": "linear", "range": "height", "zero": True, "nice": True,
+             "domain": {"data": "bins", "field": "y"}},
+        ],
+        "axes": [{"orient": "bottom", "scale": "x", "labelAngle": -90, "labelAlign": "right",
+                  "labelBaseline": "middle"}, {"orient": "left", "scale": "y"}],
+        "marks": [{"type": "rect", "from": {"data": "bins"}, "encode": {"update": {
+            "x": {"scale": "x", "field": "x"}, "width": {"scale": "x", "band": 1},
+            "y": {"scale": "y", "field": "y"}, "y2": {"scale": "y", "value": 0}}}}],
+    },
+    # one cell per pair of x and y labels, colored by entries
+    "grid": {
+        "$schema": SCHEMA,
+        "padding": 5,
+        "data": [{"name": "bins", "transform": [{"type": "flatten", "fields": ["x", "y", "z"]}]}],
+        "scales": [
+            {"name": "x", "type": "band", "range": "width"},
+            {"name": "y", "type": "band", "range": "height", "reverse": True},
+            {"name": "color", "type": "linear", "range": {"scheme": "viridis"}, "zero": True,
+             "domain": {"data": "bins", "field": "z"}},
+        ],
+        "axes": _AXES,
+        "legends": [{"fill": "color", "type": "gradient"}],
+        "marks": [{"type": "rect", "from": {"data": "bins"}, "encode": {"update": {
+            "x": {"scale": "x", "field": "x"}, "width": {"scale": "x", "band": 1},
+            "y": {"scale": "y", "field": "y"}, "height": {"scale": "y", "band": 1},
+            "fill": {"scale": "color", "field": "z"}}}}],
+    },
+}
+
+
+def _columns(hist):
+    """Kind of plot and columns of its data, as lists, from the bin arrays of a container."""
+    if hist.n_dim >= 2:
+        from histogrammar.plot.hist_numpy import get_2dgrid
+        xlabels, ylabels, grid = get_2dgrid(hist)
+        grid = np.asarray(grid, dtype=np.float64)
+        ny, nx = grid.shape
+        # explicit domains keep the order of the labels, and empty rows and columns
+        domains = {"x": list(xlabels), "y": list(ylabels)}
+        xs = np.tile(np.arange(nx), ny)
+        ys = np.repeat(np.arange(ny), nx)
+        columns = {"x": np.asarray(domains["x"], dtype=object)[xs].tolist(),
+                   "y": np.asarray(domains["y"], dtype=object)[ys].tolist(), "z": grid.ravel().tolist()}
+        return "grid", columns, domains
+
+    kind = hist.name
+    if kind in ("Bin", "SparselyBin", "IrregularlyBin"):
+        edges, values = hist.bin_edges(), hist.bin_entries()
+        if kind == "IrregularlyBin":
+            # no bars of infinite width for the under- and overflow bins
+            edges, values = edges[1:-1], values[1:-1]
+        columns = {"x0": edges[:-1][:len(values)].tolist(), "x1": edges[1:][:len(values)].tolist(),
+                   "y": values.tolist()}
+        return "steps", columns, None
+    if kind in ("Categorize", "CentrallyBin"):
+        labels = hist.bin_labels() if kind == "Categorize" else hist.bin_centers()
+        values = hist.bin_entries()
+        if kind == "Categorize" and len(labels) > 0:
+            # sort labels alphabetically, as in the matplotlib plots
+            order = np.argsort(labels)
+            labels, values = labels[order], values[order]
+        return "labels", {"x": labels.tolist(), "y": values.tolist()}, None
+    raise TypeError("cannot make a Vega specification of {0}; only Bin, SparselyBin, IrregularlyBin, CentrallyBin "
+                    "and Categorize (of counts) are supported".format(kind))
+
+
+def histogramSpec(hist, name=None, width=400, height=200, color="steelblue"):
+    """Vega specification of a histogram, as a dict.
+
+    Parameters:
+        hist: Bin, SparselyBin, IrregularlyBin, CentrallyBin or Categorize of counts, or a 2d histogram of these
+        name (string or None): title of the plot; default is the name of the container
+        width (int): width of the plot in pixels
+        height (int): height of the plot in pixels
+        color (string): color of the bars, for 1d histograms
+    """
+    kind, columns, domains = _columns(hist)
+    spec = copy.deepcopy(_TEMPLATES[kind])
+    spec["title"] = hist.name if name is None else name
+    spec["width"] = width
+    spec["height"] = height
+    spec["data"][0]["values"] = [columns]
+    if domains is not None:
+        for scale in spec["scales"]:
+            if scale["name"] in domains:
+                scale["domain"] = domains[scale["name"]]
+    else:
+        spec["marks"][0]["encode"]["update"]["fill"] = {"value": color}
+    return spec
+
+
+def histogramJson(hist, name=None, width=400, height=200, color="steelblue"):
+    """Vega specification of a histogram, as a JSON string; see :func:`histogramSpec` for the parameters."""
+    return json.dumps(histogramSpec(hist, name, width, height, color))
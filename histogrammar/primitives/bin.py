@@ -21,9 +21,9 @@ import struct
 
 from histogrammar.defs import Container, Factory, identity, JsonFormatException, ContainerException
 from histogrammar.util import n_dim, datatype, serializable, inheritdoc, maybeAdd, floatToJson, hasKeys, numeq, \
-    xrange, long, basestring
+    xrange, long, basestring, binIndex, binnedDistribution, invalidateContents
 
-from histogrammar.primitives.count import Count
+from histogrammar.primitives.count import Count, PackedCounts
 
 
 class Bin(Factory, Container):
@@ -259,6 +259,7 @@ class Bin(Factory, Container):
             if len(self.values) == 0:
                 raise ContainerException("cannot add Bins because number of values is zero")
             self.entries += other.entries
+            invalidateContents(self)
             for x, y in zip(self.values, other.values):
                 x += y
             self.underflow += other.underflow
@@ -286,6 +287,20 @@ class Bin(Factory, Container):
     def __rmul__(self, factor):
         return self.__mul__(factor)
 
+    def __getstate__(self):
+        # used by pickling: plain Count bins are packed into one array
+        state = super(Bin, self).__getstate__()
+        packed = PackedCounts.pack(self.values)
+        if packed is not None:
+            state["values"] = packed
+        return state
+
+    def __setstate__(self, dict):
+        # used by unpickling
+        if isinstance(dict["values"], PackedCounts):
+            dict["values"] = dict["values"].unpack()
+        super(Bin, self).__setstate__(dict)
+
     @property
     def num(self):
         """Number of bins."""
@@ -343,6 +358,7 @@ class Bin(Factory, Container):
 
             # no possibility of exception from here on out (for rollback)
             self.entries += weight
+            invalidateContents(self)
 
     def _cppGenerateCode(self, parser, generator, inputFieldNames, inputFieldTypes, derivedFieldTypes,
                          derivedFieldExprs, storageStructs, initCode, initPrefix, initIndent, fillCode, fillPrefix,
@@ -487,6 +503,7 @@ class Bin(Factory, Container):
     def _clingUpdate(self, filler, *extractorPrefix):
         obj = self._clingExpandPrefix(filler, *extractorPrefix)
         self.entries += obj.entries
+        invalidateContents(self)
         for i in xrange(len(self.values)):
             self.values[i]._clingUpdate(obj, ("func", ["getValues", i]))
         self.underflow._clingUpdate(obj, ("var", "underflow"))
@@ -765,6 +782,7 @@ class Bin(Factory, Container):
         format = "<f"
         entries, = struct.unpack(format, data[:struct.calcsize(format)])
         self.entries += entries
+        invalidateContents(self)
         data = data[struct.calcsize(format):]
 
         data = self.underflow._cudaUnpackAndFill(data, bigendian, alignment)
@@ -834,6 +852,7 @@ class Bin(Factory, Container):
 
         # no possibility of exception from here on out (for rollback)
         self.entries += float(newentries)
+        invalidateContents(self)
 
     def _sparksql(self, jvm, converter):
         return converter.Bin(len(self.values), self.low, self.high, self.quantity.asSparkSQL(),
@@ -1027,9 +1046,10 @@ class Bin(Factory, Container):
         :rtype: numpy.array
         """
         import numpy as np
+        entries = binIndex(self).entries
         # trivial case
         if low is None and high is None and len(xvalues) == 0:
-            return np.array([x.entries for x in self.values])
+            return entries.copy()
         # catch weird cases
         elif low is not None and high is not None and len(xvalues) == 0:
             if low > high:
@@ -1042,8 +1062,12 @@ class Bin(Factory, Container):
                 return np.array([])
         # entries at request list of x-values
         elif len(xvalues) > 0:
-            entries = [self.values[self.bin(x)].entries if self.bin(x) in self.indexes else 0.0 for x in xvalues]
-            return np.array(entries)
+            x = np.asarray(xvalues, dtype=np.float64)
+            inRange = (x >= self.low) & (x < self.high)
+            bins = np.floor(self.num * (x[inRange] - self.low) / (self.high - self.low)).astype(np.int64)
+            out = np.zeros(x.shape)
+            out[inRange] = entries[np.minimum(bins, self.num - 1)]
+            return out
         # lowest edge
         if low is None or low < self.low:
             minBin = 0
@@ -1056,7 +1080,7 @@ class Bin(Factory, Container):
             maxBin = self.bin(high)
             if np.isclose(high, self.low + self.bin_width() * maxBin):
                 maxBin -= 1
-        return np.array([self.values[i].entries for i in range(minBin, maxBin + 1)])
+        return entries[minBin:maxBin + 1].copy()
 
     def bin_edges(self, low=None, high=None):
         """
@@ -1156,6 +1180,42 @@ class Bin(Factory, Container):
         bc = bin_centers[max_idx]
         return bc
 
+    def quantile(self, q):
+        """
+        Returns quantiles, interpolated linearly within bins
+
+        Computed from the cumulative bin entries, which are cached until the next fill or addition; after changing
+        the bins in place (or filling them directly), call ``histogrammar.util.invalidateContents`` on the container.
+        Underflow, overflow and nanflow are not included.
+
+        :param q: fraction or array of fractions of the entries, between 0 and 1
+        :returns: value(s) below which these fractions of the entries lie
+        :rtype: float or numpy.array
+        """
+        return binnedDistribution(self).quantile(q)
+
+    def cdf(self, xvalues=None):
+        """
+        Returns cumulative distribution function
+
+        :param xvalues: x-values to evaluate the CDF at, default is None: at the upper edge of each bin
+        :returns: numpy array with fractions of entries below each x-value
+        :rtype: numpy.array
+        """
+        return binnedDistribution(self).cdf(xvalues)
+
+    def pdf(self):
+        """
+        Returns normalized probability density
+
+        :returns: numpy array with bin entries divided by the total entries and by the bin width
+        :rtype: numpy.array
+        """
+        return binnedDistribution(self).pdf()
+
+    def _distribution_bins(self):
+        return self.bin_edges(), self.bin_entries()
+
 
 # extra properties: number of dimensions and datatypes of sub-hists
 Bin.n_dim = n_dim
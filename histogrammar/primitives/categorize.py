@@ -20,8 +20,17 @@ import numpy as np
 
 from histogrammar.defs import Container, Factory, identity, JsonFormatException, ContainerException
 from histogrammar.util import n_dim, datatype, serializable, inheritdoc, maybeAdd, floatToJson, hasKeys, numeq, \
-    basestring
-from histogrammar.primitives.count import Count
+    basestring, evictBins, evictionPlan, _valueNDim, binIndex, invalidateContents
+from histogrammar.primitives.count import Count, PackedCounts
+
+
+def _binKey(x):
+    # numpy unique value to bin key: NaN and None are put in the 'NaN' category
+    if isinstance(x, (basestring, bool)):
+        return x
+    elif x is None or np.isnan(x):
+        return 'NaN'
+    return x
 
 
 class Categorize(Factory, Container):
@@ -65,25 +74,32 @@ class Categorize(Factory, Container):
         return out.specialize()
 
     @staticmethod
-    def ing(quantity, value=Count()):
+    def ing(quantity, value=Count(), maxBins=None):
         """Synonym for ``__init__``."""
-        return Categorize(quantity, value)
+        return Categorize(quantity, value, maxBins)
 
-    def __init__(self, quantity=identity, value=Count()):
+    def __init__(self, quantity=identity, value=Count(), maxBins=None):
         """Create a Categorize that is capable of being filled and added.
 
         Parameters:
             quantity (function returning float): computes the quantity of interest from the data.
             value (:doc:`Container <histogrammar.defs.Container>`): generates sub-aggregators to put in each bin.
+            maxBins (int or None): if not None, the maximum number of categories to keep in memory; beyond it, the
+                categories with the least weight are evicted (see ``evicted``). Not stored in JSON.
 
         Other Parameters:
-            entries (float): the number of entries, initially 0.0.
+            entries (float): the number of entries, initially 0.0; stays exact when categories are evicted.
             bins (dict from str to :doc:`Container <histogrammar.defs.Container>`): the map, probably a hashmap, to
             fill with values when their `entries` become non-zero.
+            evicted (float): the sum of ``entries`` of evicted categories, initially 0.0.
         """
         if value is not None and not isinstance(value, Container):
             raise TypeError("value ({0}) must be None or a Container".format(value))
+        if maxBins is not None and (not isinstance(maxBins, numbers.Integral) or maxBins < 1):
+            raise ValueError("maxBins ({0}) must be None or a positive integer".format(maxBins))
         self.entries = 0.0
+        self.maxBins = maxBins
+        self.evicted = 0.0
         self.quantity = serializable(identity(quantity) if isinstance(quantity, str) else quantity)
         self.value = value
         self.bins = {}
@@ -133,13 +149,14 @@ class Categorize(Factory, Container):
 
     @inheritdoc(Container)
     def zero(self):
-        return Categorize(self.quantity, self.value)
+        return Categorize(self.quantity, self.value, self.maxBins)
 
     @inheritdoc(Container)
     def __add__(self, other):
         if isinstance(other, Categorize):
-            out = Categorize(self.quantity, self.value)
+            out = Categorize(self.quantity, self.value, self.maxBins if self.maxBins is not None else other.maxBins)
             out.entries = self.entries + other.entries
+            out.evicted = self.evicted + other.evicted
             out.bins = {}
             for k in self.keySet.union(other.keySet):
                 if k in self.bins and k in other.bins:
@@ -148,6 +165,7 @@ class Categorize(Factory, Container):
                     out.bins[k] = self.bins[k].copy()
                 else:
                     out.bins[k] = other.bins[k].copy()
+            out._evict()
             return out.specialize()
 
         else:
@@ -157,11 +175,14 @@ class Categorize(Factory, Container):
     def __iadd__(self, other):
         if isinstance(other, Categorize):
             self.entries += other.entries
+            invalidateContents(self)
+            self.evicted += other.evicted
             for k in self.keySet.union(other.keySet):
                 if k in self.bins and k in other.bins:
                     self.bins[k] += other.bins[k]
                 elif k not in self.bins and k in other.bins:
                     self.bins[k] = other.bins[k].copy()
+            self._evict()
             return self
         else:
             raise ContainerException("cannot add {0} and {1}".format(self.name, other.name))
@@ -173,6 +194,7 @@ class Categorize(Factory, Container):
         else:
             out = self.zero()
             out.entries = factor * self.entries
+            out.evicted = factor * self.evicted
             for k, v in self.bins.items():
                 out.bins[k] = v * factor
             return out.specialize()
@@ -181,6 +203,50 @@ class Categorize(Factory, Container):
     def __rmul__(self, factor):
         return self.__mul__(factor)
 
+    def __getstate__(self):
+        # used by pickling: plain Count bins are packed into a key list and an entries array
+        state = super(Categorize, self).__getstate__()
+        packed = PackedCounts.pack(list(self.bins.values()), list(self.bins.keys()))
+        if packed is not None:
+            state["bins"] = packed
+        return state
+
+    def __setstate__(self, dict):
+        # used by unpickling
+        if isinstance(dict["bins"], PackedCounts):
+            dict["bins"] = dict["bins"].unpack()
+        dict.setdefault("maxBins", None)
+        dict.setdefault("evicted", 0.0)
+        super(Categorize, self).__setstate__(dict)
+
+    def _evict(self, incoming=None):
+        """Evict the lightest categories if there are more than ``maxBins`` (see ``util.evictBins``).
+
+        Returns the ``incoming`` keys that must not be filled; their weight is added to ``evicted``.
+        """
+        if self.maxBins is None:
+            return set()
+        evicted, rejected = evictBins(self.bins, self.maxBins, incoming)
+        self.evicted += evicted + sum(incoming[k] for k in rejected)
+        return rejected
+
+    def _evictBatch(self, keys, batchWeights):
+        # plan room for a batch's categories before filling them (the batch's lightest new ones may be rejected),
+        # but evict nothing until the batch is filled, with _applyEviction
+        if self.maxBins is None:
+            return [], set(), 0.0
+        incoming = {}
+        for k, w in zip(keys, batchWeights):
+            incoming[k] = incoming.get(k, 0.0) + float(w)
+        evict, rejected = evictionPlan(self.bins, self.maxBins, incoming)
+        return evict, rejected, sum(incoming[k] for k in rejected)
+
+    def _applyEviction(self, eviction):
+        evict, _, rejectedWeight = eviction
+        for k in evict:
+            self.evicted += self.bins.pop(k).entries
+        self.evicted += rejectedWeight
+
     @inheritdoc(Container)
     def fill(self, datum, weight=1.0):
         self._checkForCrossReferences()
@@ -195,11 +261,14 @@ class Categorize(Factory, Container):
                 raise TypeError("function return value ({0}) must be a string or bool".format(q))
 
             if q not in self.bins:
+                if self.maxBins is not None and len(self.bins) >= self.maxBins:
+                    self._evict({q: float("inf")})
                 self.bins[q] = self.value.zero()
             self.bins[q].fill(datum, weight)
 
             # no possibility of exception from here on out (for rollback)
             self.entries += weight
+            invalidateContents(self)
 
     def _cppGenerateCode(self, parser, generator, inputFieldNames, inputFieldTypes, derivedFieldTypes,
                          derivedFieldExprs, storageStructs, initCode, initPrefix, initIndent, fillCode, fillPrefix,
@@ -268,12 +337,14 @@ class Categorize(Factory, Container):
     def _clingUpdate(self, filler, *extractorPrefix):
         obj = self._clingExpandPrefix(filler, *extractorPrefix)
         self.entries += obj.entries
+        invalidateContents(self)
 
         for i in obj.bins:
             key = i.first
             if key not in self.bins:
                 self.bins[key] = self.value.copy()
             self.bins[key]._clingUpdate(obj, ("func", ["getValues", key]))
+        self._evict()
 
     def _c99StructName(self):
         return "Cz" + self.value._c99StructName()
@@ -297,39 +368,45 @@ class Categorize(Factory, Container):
         subweights = weights.copy()
         subweights[weights < 0.0] = 0.0
 
-        if self.n_dim == 1 and all_weights_one and isinstance(self.value, Count):
+        if _valueNDim(self) == 1 and all_weights_one and isinstance(self.value, Count):
             # special case of filling single array where all weights are 1
             uniques, counts = np.unique(q, return_counts=True)
-
-            for c, x in zip(counts, uniques):
-                if isinstance(x, (basestring, bool)):
-                    pass
-                elif x is None or np.isnan(x):
-                    x = 'NaN'
-                if x not in self.bins:
-                    self.bins[x] = self.value.zero()
-                self.bins[x]._numpy(None, c, [None])
+            keys = [_binKey(x) for x in uniques]
+            eviction = self._evictBatch(keys, counts)
+            rejected = eviction[1]
+
+            for c, x in zip(counts, keys):
+                if x in rejected:
+                    continue
+                bin = self.bins[x] if x in self.bins else self.value.zero()
+                bin._numpy(None, c, [None])
+                self.bins[x] = bin
         else:
             # all other cases ...
             selection = np.empty(q.shape, dtype=bool)
             uniques, inverse = np.unique(q, return_inverse=True)
+            keys = [_binKey(x) for x in uniques]
+            eviction = self._evictBatch(keys, np.bincount(inverse.ravel(), weights=subweights.ravel(),
+                                                          minlength=len(uniques)))
+            rejected = eviction[1]
 
-            # no possibility of exception from here on out (for rollback)
-            for i, x in enumerate(uniques):
-                if isinstance(x, (basestring, bool)):
-                    pass
-                elif x is None or np.isnan(x):
-                    x = 'NaN'
-                if x not in self.bins:
-                    self.bins[x] = self.value.zero()
+            for i, x in enumerate(keys):
+                if x in rejected:
+                    continue
+                # a new category is only added once it is filled
+                bin = self.bins[x] if x in self.bins else self.value.zero()
 
                 # passing on the full array seems faster for one- AND multi-dim histograms
                 np.not_equal(inverse, i, selection)
                 subweights[:] = weights
                 subweights[selection] = 0.0
-                self.bins[x]._numpy(data, subweights, shape)
+                bin._numpy(data, subweights, shape)
+                self.bins[x] = bin
 
+        # no possibility of exception from here on out (for rollback)
+        self._applyEviction(eviction)
         self.entries += float(newentries)
+        invalidateContents(self)
 
     def _sparksql(self, jvm, converter):
         return converter.Categorize(self.quantity.asSparkSQL(), self.value._sparksql(jvm, converter))
@@ -444,9 +521,8 @@ class Categorize(Factory, Container):
         :rtype: numpy.array
         """
         if len(labels) == 0:
-            return np.array([self.bins[i].entries for i in self.bins])
-        entries = [self.bins[lab].entries if lab in self.bins else 0.0 for lab in labels]
-        return np.array(entries)
+            return np.fromiter((v.entries for v in self.bins.values()), dtype=np.float64, count=len(self.bins))
+        return binIndex(self).lookup(labels)
 
     def bin_labels(self, max_length=-1):
         """
@@ -21,7 +21,7 @@ import struct
 
 from histogrammar.defs import Container, Factory, identity, JsonFormatException, ContainerException
 from histogrammar.util import n_dim, datatype, serializable, inheritdoc, maybeAdd, floatToJson, hasKeys, numeq, \
-    floatToC99, basestring, xrange
+    floatToC99, basestring, xrange, binnedDistribution, invalidateContents
 from histogrammar.primitives.count import Count
 
 
@@ -305,6 +305,42 @@ class CentrallyBin(Factory, Container):
         bc = self.centers[max_idx]
         return bc
 
+    def quantile(self, q):
+        """
+        Returns quantiles, interpolated linearly within bins
+
+        Computed from the cumulative bin entries, which are cached until the next fill or addition; after changing
+        the bins in place (or filling them directly), call ``histogrammar.util.invalidateContents`` on the container.
+        The outer bins extend to infinity: their entries are put at their finite edge. Nanflow is not included.
+
+        :param q: fraction or array of fractions of the entries, between 0 and 1
+        :returns: value(s) below which these fractions of the entries lie
+        :rtype: float or numpy.array
+        """
+        return binnedDistribution(self).quantile(q)
+
+    def cdf(self, xvalues=None):
+        """
+        Returns cumulative distribution function
+
+        :param xvalues: x-values to evaluate the CDF at, default is None: at the upper edge of each bin
+        :returns: numpy array with fractions of entries below each x-value
+        :rtype: numpy.array
+        """
+        return binnedDistribution(self).cdf(xvalues)
+
+    def pdf(self):
+        """
+        Returns normalized probability density
+
+        :returns: numpy array with bin entries divided by the total entries and by the bin width
+        :rtype: numpy.array
+        """
+        return binnedDistribution(self).pdf()
+
+    def _distribution_bins(self):
+        return self.bin_edges(), self.bin_entries()
+
     @inheritdoc(Container)
     def zero(self):
         return CentrallyBin([c for c, v in self.bins], self.quantity, self.value, self.nanflow.zero())
@@ -330,6 +366,7 @@ class CentrallyBin(Factory, Container):
                 "cannot add CentrallyBin because centers are different:\n    {0}\nvs\n    {1}".format(
                     self.centers, other.centers))
         self.entries += other.entries
+        invalidateContents(self)
         for (c1, v1), (_, v2) in zip(self.bins, other.bins):
             v1 += v2
         self.nanflow += other.nanflow
@@ -366,6 +403,7 @@ class CentrallyBin(Factory, Container):
 
             # no possibility of exception from here on out (for rollback)
             self.entries += weight
+            invalidateContents(self)
 
     def _cppGenerateCode(self, parser, generator, inputFieldNames, inputFieldTypes, derivedFieldTypes,
                          derivedFieldExprs, storageStructs, initCode, initPrefix, initIndent, fillCode, fillPrefix,
@@ -471,6 +509,7 @@ class CentrallyBin(Factory, Container):
     def _clingUpdate(self, filler, *extractorPrefix):
         obj = self._clingExpandPrefix(filler, *extractorPrefix)
         self.entries += obj.entries
+        invalidateContents(self)
         for i in xrange(len(self.values)):
             self.bins[i][1]._clingUpdate(obj, ("func", ["getValues", i]))
         self.nanflow._clingUpdate(obj, ("var", "nanflow"))
@@ -661,6 +700,7 @@ class CentrallyBin(Factory, Container):
         format = "<f"
         entries, = struct.unpack(format, data[:struct.calcsize(format)])
         self.entries += entries
+        invalidateContents(self)
         data = data[struct.calcsize(format):]
 
         data = self.nanflow._cudaUnpackAndFill(data, bigendian, alignment)
@@ -728,6 +768,7 @@ class CentrallyBin(Factory, Container):
 
         # no possibility of exception from here on out (for rollback)
         self.entries += float(newentries)
+        invalidateContents(self)
 
     def _sparksql(self, jvm, converter):
         return converter.CentrallyBin([c for c, v in self.bins], self.quantity.asSparkSQL(
@@ -16,6 +16,7 @@
 
 import math
 import numbers
+import pickle
 import struct
 
 from histogrammar.defs import Container, Factory, identity, JsonFormatException, ContainerException
@@ -111,6 +112,10 @@ class Count(Factory, Container):
     def __rmul__(self, factor):
         return self.__mul__(factor)
 
+    def __setstate__(self, dict):
+        # used by unpickling. like Count.ed, skip the specialized fill and plot methods (slow, not needed).
+        self.__dict__ = dict
+
     @inheritdoc(Container)
     def fill(self, datum, weight=1.0):
         self._checkForCrossReferences()
@@ -274,6 +279,67 @@ class Count(Factory, Container):
         return hash((self.entries, self.transform))
 
 
+class PackedCounts(object):
+    """Pickle-time stand-in for the plain Counts in a list or dict of bins.
+
+    Used by the ``__getstate__`` methods of Bin, SparselyBin and Categorize: the entries pickle as a single raw
+    buffer instead of one object per bin, and unpickle without recreating each Count through its constructor.
+    The buffer is out-of-band with pickle protocol 5 and a ``buffer_callback`` (Python 3.8+, where
+    ``pickle.PickleBuffer`` exists), and in-band bytes otherwise.
+    """
+
+    __slots__ = ("keys", "entries")
+
+    def __init__(self, keys, entries):
+        self.keys = keys
+        self.entries = entries
+
+    @staticmethod
+    def pack(counts, keys=None):
+        """Pack a sequence of Counts, or return ``None`` if any of them is not a plain, identity-transform Count.
+
+        Parameters:
+            counts (list of :doc:`Container <histogrammar.defs.Container>`): the bin values.
+            keys (None, numpy array or list): the bin keys to restore a dict from, if any.
+        """
+        import numpy
+        for v in counts:
+            if v.__class__ is not Count or v.transform != identity or not _plainCountState.issuperset(v.__dict__):
+                return None
+        entries = numpy.fromiter((v.entries for v in counts), dtype=numpy.float64, count=len(counts))
+        return PackedCounts(keys, entries)
+
+    def unpack(self):
+        """Recreate the list of Counts (if ``keys`` is ``None``) or the dict from keys to Counts."""
+        counts = []
+        for entries in self.entries.tolist():
+            out = Count.__new__(Count)
+            out.__dict__ = {"entries": entries, "transform": identity, "_checkedForCrossReferences": False}
+            counts.append(out)
+        if self.keys is None:
+            return counts
+        keys = self.keys.tolist() if hasattr(self.keys, "tolist") else self.keys
+        return dict(zip(keys, counts))
+
+    def __reduce_ex__(self, protocol):
+        import numpy
+        entries = numpy.ascontiguousarray(self.entries, dtype=numpy.float64)
+        if protocol >= 5 and _PickleBuffer is not None:
+            return _unpackEntries, (self.keys, _PickleBuffer(entries))
+        return _unpackEntries, (self.keys, entries.tobytes())
+
+
+def _unpackEntries(keys, buffer):
+    import numpy
+    return PackedCounts(keys, numpy.frombuffer(buffer, dtype=numpy.float64))
+
+
+# out-of-band pickle buffers (protocol 5) are new in Python 3.8
+_PickleBuffer = getattr(pickle, "PickleBuffer", None)
+
+
+_plainCountState = frozenset(["entries", "transform", "_checkedForCrossReferences"])
+
 # extra properties: number of dimensions and datatypes of sub-hists
 Count.n_dim = n_dim
 Count.datatype = datatype
@@ -22,7 +22,7 @@ import bisect
 
 from histogrammar.defs import Container, Factory, identity, JsonFormatException, ContainerException
 from histogrammar.util import n_dim, datatype, serializable, inheritdoc, maybeAdd, floatToJson, hasKeys, numeq, \
-    floatToC99, basestring, xrange
+    floatToC99, basestring, xrange, binnedDistribution, invalidateContents
 from histogrammar.primitives.count import Count
 
 
@@ -243,8 +243,10 @@ class IrregularlyBin(Factory, Container):
         return np.diff(edges)
 
     def _center_from_key(self, edge):
-        idx = self.edges.index(edge)
-        return self.bin_centers()[idx]
+        edges = self.edges
+        idx = bisect.bisect_left(edges, edge)
+        high = edges[idx + 1] if idx + 1 < len(edges) else float("inf")
+        return (edge + high) / 2
 
     @property
     def mpv(self):
@@ -257,6 +259,42 @@ class IrregularlyBin(Factory, Container):
         bc = bin_centers[max_idx]
         return bc
 
+    def quantile(self, q):
+        """
+        Returns quantiles, interpolated linearly within bins
+
+        Computed from the cumulative bin entries, which are cached until the next fill or addition; after changing
+        the bins in place (or filling them directly), call ``histogrammar.util.invalidateContents`` on the container.
+        The outer bins extend to infinity: their entries are put at their finite edge. Nanflow is not included.
+
+        :param q: fraction or array of fractions of the entries, between 0 and 1
+        :returns: value(s) below which these fractions of the entries lie
+        :rtype: float or numpy.array
+        """
+        return binnedDistribution(self).quantile(q)
+
+    def cdf(self, xvalues=None):
+        """
+        Returns cumulative distribution function
+
+        :param xvalues: x-values to evaluate the CDF at, default is None: at the upper edge of each bin
+        :returns: numpy array with fractions of entries below each x-value
+        :rtype: numpy.array
+        """
+        return binnedDistribution(self).cdf(xvalues)
+
+    def pdf(self):
+        """
+        Returns normalized probability density
+
+        :returns: numpy array with bin entries divided by the total entries and by the bin width
+        :rtype: numpy.array
+        """
+        return binnedDistribution(self).pdf()
+
+    def _distribution_bins(self):
+        return self.bin_edges(), self.bin_entries()
+
     @inheritdoc(Container)
     def zero(self):
         return IrregularlyBin([(c, v.zero()) for c, v in self.bins], self.quantity, None, self.nanflow.zero())
@@ -281,6 +319,7 @@ class IrregularlyBin(Factory, Container):
             if self.thresholds != other.thresholds:
                 raise ContainerException("cannot add IrregularlyBin because cut thresholds differ")
             self.entries += other.entries
+            invalidateContents(self)
             for ((k1, v1), (k2, v2)) in zip(self.bins, other.bins):
                 v1 += v2
             self.nanflow += other.nanflow
@@ -321,6 +360,7 @@ class IrregularlyBin(Factory, Container):
                         break
             # no possibility of exception from here on out (for rollback)
             self.entries += weight
+            invalidateContents(self)
 
     def _cppGenerateCode(self, parser, generator, inputFieldNames, inputFieldTypes, derivedFieldTypes,
                          derivedFieldExprs, storageStructs, initCode, initPrefix, initIndent, fillCode, fillPrefix,
@@ -424,6 +464,7 @@ class IrregularlyBin(Factory, Container):
     def _clingUpdate(self, filler, *extractorPrefix):
         obj = self._clingExpandPrefix(filler, *extractorPrefix)
         self.entries += obj.entries
+        invalidateContents(self)
         for i in xrange(len(self.values)):
             self.bins[i][1]._clingUpdate(obj, ("func", ["getValues", i]))
         self.nanflow._clingUpdate(obj, ("var", "nanflow"))
@@ -615,6 +656,7 @@ class IrregularlyBin(Factory, Container):
         format = "<f"
         entries, = struct.unpack(format, data[:struct.calcsize(format)])
         self.entries += entries
+        invalidateContents(self)
         data = data[struct.calcsize(format):]
 
         data = self.nanflow._cudaUnpackAndFill(data, bigendian, alignment)
@@ -665,6 +707,7 @@ class IrregularlyBin(Factory, Container):
 
         # no possibility of exception from here on out (for rollback)
         self.entries += float(newentries)
+        invalidateContents(self)
 
     def _sparksql(self, jvm, converter):
         return converter.IrregularlyBin([e for e, v in self.bins[1:]], self.quantity.asSparkSQL(
@@ -20,8 +20,8 @@ import numbers
 
 from histogrammar.defs import Container, Factory, identity, JsonFormatException, ContainerException
 from histogrammar.util import n_dim, datatype, serializable, inheritdoc, maybeAdd, floatToJson, hasKeys, numeq, \
-    basestring, long
-from histogrammar.primitives.count import Count
+    basestring, long, evictBins, evictionPlan, invalidateMetadata, _valueNDim, binIndex, binnedDistribution, invalidateContents
+from histogrammar.primitives.count import Count, PackedCounts
 
 LONG_NAN = -9223372036854775808
 LONG_MINUSINF = -9223372036854775807
@@ -82,11 +82,12 @@ class SparselyBin(Factory, Container):
         return out.specialize()
 
     @staticmethod
-    def ing(binWidth, quantity, value=Count(), nanflow=Count(), origin=0.0):
+    def ing(binWidth, quantity, value=Count(), nanflow=Count(), origin=0.0, maxBins=None, coarsenAbove=None):
         """Synonym for ``__init__``."""
-        return SparselyBin(binWidth, quantity, value, nanflow, origin)
+        return SparselyBin(binWidth, quantity, value, nanflow, origin, maxBins, coarsenAbove)
 
-    def __init__(self, binWidth, quantity=identity, value=Count(), nanflow=Count(), origin=0.0):
+    def __init__(self, binWidth, quantity=identity, value=Count(), nanflow=Count(), origin=0.0, maxBins=None,
+                 coarsenAbove=None):
         """Create a SparselyBin that is capable of being filled and added.
 
         Parameters:
@@ -96,11 +97,16 @@ class SparselyBin(Factory, Container):
             nanflow (:doc:`Container <histogrammar.defs.Container>`): a sub-aggregator to use for data whose quantity
                 is NaN.
             origin (float): the left edge of the bin whose index is 0.
+            maxBins (int or None): if not None, the maximum number of bins to keep in memory; beyond it, the bins
+                with the least weight are evicted (see ``evicted``). Not stored in JSON.
+            coarsenAbove (int or None): if not None, whenever there are more bins than this after a fill or an
+                addition, ``binWidth`` is doubled (see ``coarsen``) until there are not. Not stored in JSON.
 
         Other parameters:
-            entries (float): the number of entries, initially 0.0.
+            entries (float): the number of entries, initially 0.0; stays exact when bins are evicted.
             bins (dict from int to :doc:`Container <histogrammar.defs.Container>`): the map, probably a hashmap, to
                 fill with values when their `entries` become non-zero.
+            evicted (float): the sum of ``entries`` of evicted bins, initially 0.0.
         """
         if not isinstance(binWidth, numbers.Real):
             raise TypeError("binWidth ({0}) must be a number".format(binWidth))
@@ -112,6 +118,10 @@ class SparselyBin(Factory, Container):
             raise TypeError("origin ({0}) must be a number".format(origin))
         if binWidth <= 0.0:
             raise ValueError("binWidth ({0}) must be greater than zero".format(binWidth))
+        if maxBins is not None and (not isinstance(maxBins, numbers.Integral) or maxBins < 1):
+            raise ValueError("maxBins ({0}) must be None or a positive integer".format(maxBins))
+        if coarsenAbove is not None and (not isinstance(coarsenAbove, numbers.Integral) or coarsenAbove < 1):
+            raise ValueError("coarsenAbove ({0}) must be None or a positive integer".format(coarsenAbove))
 
         self.binWidth = float(binWidth)
         self.entries = 0.0
@@ -124,13 +134,18 @@ class SparselyBin(Factory, Container):
         self.bins = {}
         self.nanflow = nanflow.copy()
         self.origin = float(origin)
+        self.maxBins = maxBins
+        self.coarsenAbove = coarsenAbove
+        self.evicted = 0.0
         super(SparselyBin, self).__init__()
         self.specialize()
 
     def histogram(self):
         """Return a plain histogram by converting all sub-aggregator values into Counts"""
-        out = SparselyBin(self.binWidth, self.quantity, Count(), self.nanflow.copy(), self.origin)
+        out = SparselyBin(self.binWidth, self.quantity, Count(), self.nanflow.copy(), self.origin, self.maxBins,
+                          self.coarsenAbove)
         out.entries = float(self.entries)
+        out.evicted = self.evicted
         out.contentType = "Count"
         for i, v in self.bins.items():
             out.bins[i] = Count.ed(v.entries)
@@ -138,11 +153,80 @@ class SparselyBin(Factory, Container):
 
     @inheritdoc(Container)
     def zero(self):
-        return SparselyBin(self.binWidth, self.quantity, self.value, self.nanflow.zero(), self.origin)
+        return SparselyBin(self.binWidth, self.quantity, self.value, self.nanflow.zero(), self.origin, self.maxBins,
+                           self.coarsenAbove)
+
+    def coarsen(self, factor):
+        """Merge every ``factor`` adjacent bins into one, in place, and return this SparselyBin.
+
+        ``binWidth`` is multiplied by ``factor`` and ``origin`` is unchanged, so the new bin ``i // factor`` is exactly
+        the union of the old bins ``i``; their sub-aggregators are added with ``+``. This costs one pass over the
+        bins, not over the data. The underflow and overflow bins (infinite quantities) are kept as they are.
+
+        Parameters:
+            factor (int): positive integer by which to multiply ``binWidth``.
+        """
+        if not isinstance(factor, numbers.Real) or factor < 1 or factor != int(factor):
+            raise ValueError("factor ({0}) must be a positive integer".format(factor))
+        factor = int(factor)
+        if factor == 1:
+            return self
+
+        bins = {}
+        for i, v in self.bins.items():
+            if i != LONG_MINUSINF and i != LONG_PLUSINF:
+                i //= factor
+            if i in bins:
+                bins[i] = bins[i] + v
+            else:
+                bins[i] = v
+        self.bins = bins
+        self.binWidth *= factor
+        invalidateMetadata()
+        return self
+
+    def _coarsenFactor(self, indexes):
+        # smallest power of two that merges the bins with these indexes into at most coarsenAbove bins, or as far as
+        # coarsening can go (finite bins -1 and 0, which never merge)
+        special = (indexes == LONG_MINUSINF) | (indexes == LONG_PLUSINF)
+        numSpecial = len(np.unique(indexes[special]))
+        finite = np.unique(indexes[~special])
+        factor = 1
+        while len(finite) + numSpecial > self.coarsenAbove and len(finite) > 0 and (finite[0] < -1 or finite[-1] > 0):
+            finite = np.unique(finite // 2)
+            factor *= 2
+        return factor
+
+    def _autoCoarsen(self):
+        if self.coarsenAbove is not None and len(self.bins) > self.coarsenAbove:
+            self.coarsen(self._coarsenFactor(np.fromiter(self.bins.keys(), dtype=np.int64, count=len(self.bins))))
+
+    def _sameBinWidth(self, other, inplace):
+        """Coarsen the finer of ``self`` and ``other`` to the other's ``binWidth``, if either coarsens automatically.
+
+        ``self`` is coarsened in place if ``inplace``, else a copy of it; ``other`` is never modified. Returns the
+        pair, or raises ContainerException if the binnings can't be matched.
+        """
+        if self.binWidth != other.binWidth and (self.coarsenAbove is not None or other.coarsenAbove is not None):
+            ratio = max(self.binWidth, other.binWidth) / min(self.binWidth, other.binWidth)
+            if abs(ratio - round(ratio)) <= 1e-9 * ratio:
+                if self.binWidth < other.binWidth:
+                    self = (self if inplace else self.copy()).coarsen(round(ratio))
+                    self.binWidth = other.binWidth
+                else:
+                    other = other.copy().coarsen(round(ratio))
+                    other.binWidth = self.binWidth
+        if self.binWidth != other.binWidth:
+            raise ContainerException(
+                "cannot add SparselyBins because binWidth differs ({0} vs {1})".format(
+                    self.binWidth, other.binWidth))
+        return self, other
 
     @inheritdoc(Container)
     def __add__(self, other):
         if isinstance(other, SparselyBin):
+            if self.origin == other.origin:
+                self, other = self._sameBinWidth(other, False)
             if self.binWidth != other.binWidth:
                 raise ContainerException(
                     "cannot add SparselyBins because binWidth differs ({0} vs {1})".format(
@@ -157,14 +241,19 @@ class SparselyBin(Factory, Container):
                 self.quantity,
                 self.value.copy() if self.value is not None else None,
                 self.nanflow + other.nanflow,
-                self.origin)
+                self.origin,
+                self.maxBins if self.maxBins is not None else other.maxBins,
+                self.coarsenAbove if self.coarsenAbove is not None else other.coarsenAbove)
             out.entries = self.entries + other.entries
+            out.evicted = self.evicted + other.evicted
             out.bins = self.bins.copy()
             for i, v in other.bins.items():
                 if i in out.bins:
                     out.bins[i] = out.bins[i] + v
                 else:
                     out.bins[i] = v
+            out._autoCoarsen()
+            out._evict()
             return out.specialize()
 
         else:
@@ -173,6 +262,8 @@ class SparselyBin(Factory, Container):
     @inheritdoc(Container)
     def __iadd__(self, other):
         if isinstance(other, SparselyBin):
+            if self.origin == other.origin:
+                _, other = self._sameBinWidth(other, True)
             if self.binWidth != other.binWidth:
                 raise ContainerException(
                     "cannot add SparselyBins because binWidth differs ({0} vs {1})".format(
@@ -182,12 +273,16 @@ class SparselyBin(Factory, Container):
                     "cannot add SparselyBins because origin differs ({0} vs {1})".format(
                         self.origin, other.origin))
             self.entries += other.entries
+            invalidateContents(self)
+            self.evicted += other.evicted
             for i, v in other.bins.items():
                 if i in self.bins:
                     self.bins[i] += v
                 else:
                     self.bins[i] = v.copy()
             self.nanflow += other.nanflow
+            self._autoCoarsen()
+            self._evict()
             return self
         else:
             raise ContainerException("cannot add {0} and {1}".format(self.name, other.name))
@@ -199,6 +294,7 @@ class SparselyBin(Factory, Container):
         else:
             out = self.zero()
             out.entries = factor * self.entries
+            out.evicted = factor * self.evicted
             out.bins = dict((c, v * factor) for (c, v) in self.bins.items())
             out.value = self.value.copy() if self.value is not None else None
             out.nanflow = self.nanflow * factor
@@ -208,6 +304,35 @@ class SparselyBin(Factory, Container):
     def __rmul__(self, factor):
         return self.__mul__(factor)
 
+    def __getstate__(self):
+        # used by pickling: plain Count bins are packed into a key and an entries array
+        state = super(SparselyBin, self).__getstate__()
+        packed = PackedCounts.pack(list(self.bins.values()),
+                                   np.fromiter(self.bins.keys(), dtype=np.int64, count=len(self.bins)))
+        if packed is not None:
+            state["bins"] = packed
+        return state
+
+    def __setstate__(self, dict):
+        # used by unpickling
+        if isinstance(dict["bins"], PackedCounts):
+            dict["bins"] = dict["bins"].unpack()
+        dict.setdefault("maxBins", None)
+        dict.setdefault("coarsenAbove", None)
+        dict.setdefault("evicted", 0.0)
+        super(SparselyBin, self).__setstate__(dict)
+
+    def _evict(self, incoming=None):
+        """Evict the lightest bins if there are more than ``maxBins`` (see ``util.evictBins``).
+
+        Returns the ``incoming`` keys that must not be filled; their weight is added to ``evicted``.
+        """
+        if self.maxBins is None:
+            return set()
+        evicted, rejected = evictBins(self.bins, self.maxBins, incoming)
+        self.evicted += evicted + sum(incoming[k] for k in rejected)
+        return rejected
+
     @property
     def numFilled(self):
         """The number of non-empty bins."""
@@ -227,7 +352,7 @@ class SparselyBin(Factory, Container):
         if len(self.bins) == 0:
             return None
         else:
-            return min(self.bins.keys())
+            return int(binIndex(self).keys[0])
 
     @property
     def maxBin(self):
@@ -235,7 +360,7 @@ class SparselyBin(Factory, Container):
         if len(self.bins) == 0:
             return None
         else:
-            return max(self.bins.keys())
+            return int(binIndex(self).keys[-1])
 
     @property
     def low(self):
@@ -326,10 +451,14 @@ class SparselyBin(Factory, Container):
             else:
                 b = self.bin(q)
                 if b not in self.bins:
+                    if self.maxBins is not None and len(self.bins) >= self.maxBins:
+                        self._evict({b: float("inf")})
                     self.bins[b] = self.value.copy()
                 self.bins[b].fill(datum, weight)
+                self._autoCoarsen()
             # no possibility of exception from here on out (for rollback)
             self.entries += weight
+            invalidateContents(self)
 
     def _cppGenerateCode(self, parser, generator, inputFieldNames, inputFieldTypes, derivedFieldTypes,
                          derivedFieldExprs, storageStructs, initCode, initPrefix, initIndent, fillCode, fillPrefix,
@@ -443,6 +572,7 @@ class SparselyBin(Factory, Container):
     def _clingUpdate(self, filler, *extractorPrefix):
         obj = self._clingExpandPrefix(filler, *extractorPrefix)
         self.entries += obj.entries
+        invalidateContents(self)
 
         for i in obj.bins:
             key = i.first
@@ -451,6 +581,8 @@ class SparselyBin(Factory, Container):
             self.bins[key]._clingUpdate(obj, ("func", ["getValues", key]))
 
         self.nanflow._clingUpdate(obj, ("var", "nanflow"))
+        self._autoCoarsen()
+        self._evict()
 
     def _c99StructName(self):
         return "Sb" + self.value._c99StructName() + self.nanflow._c99StructName()
@@ -492,45 +624,78 @@ class SparselyBin(Factory, Container):
         q[neginfs] = LONG_MINUSINF
         q[posinfs] = LONG_PLUSINF
 
+        if self.coarsenAbove is not None:
+            # coarsen before filling, so that a batch with many distinct bins never allocates them all
+            filled = q[(weights > 0.0) & (q != LONG_NAN)]
+            factor = self._coarsenFactor(
+                np.concatenate([np.fromiter(self.bins.keys(), dtype=np.int64, count=len(self.bins)), filled]))
+            if factor > 1:
+                self.coarsen(factor)
+                special = (q == LONG_NAN) | (q == LONG_MINUSINF) | (q == LONG_PLUSINF)
+                q = np.where(special, q, q // factor)
+
         selected = q[weights > 0.0]
 
         # used below. bit expensive, so do here once
-        n_dim = self.n_dim
+        n_dim = _valueNDim(self)
 
         if n_dim == 1 and all_weights_one and isinstance(self.value, Count):
             # special case: filling single array where all weights are 1
             # (use fast np.unique that returns counts)
             uniques, counts = np.unique(selected, return_counts=True)
+            eviction = self._evictBatch(uniques, counts)
+            rejected = eviction[1]
             for c, index in zip(counts, uniques):
-                if index != LONG_NAN:
+                if index != LONG_NAN and index not in rejected:
                     bin = self.bins.get(index)
                     if bin is None:
                         bin = self.value.zero()
-                        self.bins[index] = bin
                     # pass counts directly to Count object
-                    self.bins[index]._numpy(None, c, [None])
+                    bin._numpy(None, c, [None])
+                    self.bins[index] = bin
         else:
             # all other cases ...
             selection = np.empty(q.shape, dtype=bool)
-            for index in np.unique(selected):
-                if index != LONG_NAN:
+            uniques, inverse = np.unique(selected, return_inverse=True)
+            eviction = self._evictBatch(uniques, np.bincount(inverse, weights=weights[weights > 0.0]))
+            rejected = eviction[1]
+            for index in uniques:
+                if index != LONG_NAN and index not in rejected:
+                    # a new bin is only added once it is filled
                     bin = self.bins.get(index)
                     if bin is None:
                         bin = self.value.zero()
-                        self.bins[index] = bin
                     if n_dim == 1:
                         # passing on the full array is faster for one-dim histograms
                         np.not_equal(q, index, selection)
                         subweights[:] = weights
                         subweights[selection] = 0.0
-                        self.bins[index]._numpy(data, subweights, shape)
+                        bin._numpy(data, subweights, shape)
                     else:
                         # in practice passing on sliced arrays is faster for multi-dim histograms
                         np.equal(q, index, selection)
-                        self.bins[index]._numpy(data[selection], subweights[selection], [np.sum(selection)])
+                        bin._numpy(data[selection], subweights[selection], [np.sum(selection)])
+                    self.bins[index] = bin
 
         # no possibility of exception from here on out (for rollback)
+        self._applyEviction(eviction)
         self.entries += float(newentries)
+        invalidateContents(self)
+
+    def _evictBatch(self, uniques, batchWeights):
+        # plan room for a batch's bins before filling them (the batch's lightest new bins may be rejected), but
+        # evict nothing until the batch is filled, with _applyEviction
+        if self.maxBins is None:
+            return [], set(), 0.0
+        incoming = dict((index, float(w)) for index, w in zip(uniques.tolist(), batchWeights) if index != LONG_NAN)
+        evict, rejected = evictionPlan(self.bins, self.maxBins, incoming)
+        return evict, rejected, sum(incoming[k] for k in rejected)
+
+    def _applyEviction(self, eviction):
+        evict, _, rejectedWeight = eviction
+        for k in evict:
+            self.evicted += self.bins.pop(k).entries
+        self.evicted += rejectedWeight
 
     def _sparksql(self, jvm, converter):
         return converter.SparselyBin(self.binWidth, self.quantity.asSparkSQL(), self.value._sparksql(
@@ -770,32 +935,67 @@ class SparselyBin(Factory, Container):
         # sparse hist not filled
         if self.minBin is None or self.maxBin is None:
             return np.array([])
+        index = binIndex(self)
         # trivial cases first
         if low is None and high is None and len(xvalues) == 0:
-            entries = [self.bins[i].entries if i in self.bins else 0.0 for i in range(self.minBin, self.maxBin + 1)]
-            return np.array(entries)
+            return index.dense(self.minBin, self.maxBin)
         # catch weird cases
         elif low is not None and high is not None and len(xvalues) == 0:
             if low > high:
                 raise RuntimeError('low {low} greater than high {high}'.format(low=low, high=high))
         # entries at request list of x-values
         elif len(xvalues) > 0:
-            entries = [self.bins[self.bin(x)].entries if self.bin(x) in self.bins else 0.0 for x in xvalues]
-            return np.array(entries)
-        # lowest edge
+            return index.lookup(self.bins_of(xvalues))
+        minBin, maxBin = self._bin_range(low, high)
+        return index.dense(minBin, maxBin)
+
+    def bin_cumulative_entries(self, low=None, high=None):
+        """
+        Returns cumulative bin values: for each bin, the sum of entries of all bins up to and including it
+
+        Possible to set range with low and high params, like bin_entries
+
+        :param low: lower edge of range, default is None
+        :param high: higher edge of range, default is None
+        :returns: numpy array with cumulative numbers of entries for selected bins
+        :rtype: numpy.array
+        """
+        if self.minBin is None or self.maxBin is None:
+            return np.array([])
+        if low is not None and high is not None and low > high:
+            raise RuntimeError('low {low} greater than high {high}'.format(low=low, high=high))
+        minBin, maxBin = self._bin_range(low, high)
+        return binIndex(self).below(np.arange(minBin, maxBin + 1))
+
+    def bins_of(self, xvalues):
+        """
+        Returns bin indexes of x-values, vectorized version of ``bin``
+
+        :param xvalues: array of x-values
+        :returns: numpy array of bin indexes (int64)
+        :rtype: numpy.array
+        """
+        softbins = (np.asarray(xvalues, dtype=np.float64) - self.origin) / self.binWidth
+        out = np.full(softbins.shape, LONG_NAN, dtype=np.int64)
+        finite = np.isfinite(softbins) & (softbins > LONG_MINUSINF) & (softbins < LONG_PLUSINF)
+        out[finite] = np.floor(softbins[finite])
+        out[softbins <= LONG_MINUSINF] = LONG_MINUSINF
+        out[softbins >= LONG_PLUSINF] = LONG_PLUSINF
+        return out
+
+    def _bin_range(self, low, high):
+        # first and last bin index of the range [low, high), as in bin_entries
         if low is None:
             minBin = self.minBin
         else:
             minBin = self.bin(low)
-        # highest case
         if high is None:
             maxBin = self.maxBin
         else:
             maxBin = self.bin(high)
             if np.isclose(high, self.origin + self.bin_width() * maxBin):
                 maxBin -= 1
-        entries = [self.bins[i].entries if i in self.bins else 0.0 for i in range(minBin, maxBin + 1)]
-        return np.array(entries)
+        return minBin, maxBin
 
     def bin_centers(self, low=None, high=None):
         """
@@ -823,6 +1023,44 @@ class SparselyBin(Factory, Container):
         bc = bin_centers[max_idx]
         return bc
 
+    def quantile(self, q):
+        """
+        Returns quantiles, interpolated linearly within bins
+
+        Computed from the cumulative bin entries, which are cached until the next fill or addition; after changing
+        the bins in place (or filling them directly), call ``histogrammar.util.invalidateContents`` on the container.
+        Nanflow is not included.
+
+        :param q: fraction or array of fractions of the entries, between 0 and 1
+        :returns: value(s) below which these fractions of the entries lie
+        :rtype: float or numpy.array
+        """
+        return binnedDistribution(self).quantile(q)
+
+    def cdf(self, xvalues=None):
+        """
+        Returns cumulative distribution function
+
+        :param xvalues: x-values to evaluate the CDF at, default is None: at the upper edge of each bin
+        :returns: numpy array with fractions of entries below each x-value
+        :rtype: numpy.array
+        """
+        return binnedDistribution(self).cdf(xvalues)
+
+    def pdf(self):
+        """
+        Returns normalized probability density
+
+        :returns: numpy array with bin entries divided by the total entries and by the bin width
+        :rtype: numpy.array
+        """
+        return binnedDistribution(self).pdf()
+
+    def _distribution_bins(self):
+        if self.minBin is None or self.maxBin is None:
+            return np.array([self.origin]), np.array([])
+        return self.bin_edges(), self.bin_entries()
+
     def _center_from_key(self, bin_key):
         xc = (bin_key + 0.5) * self.binWidth + self.origin
         return xc
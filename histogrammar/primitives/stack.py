@@ -21,7 +21,7 @@ import struct
 
 from histogrammar.defs import Container, Factory, identity, JsonFormatException, ContainerException
 from histogrammar.util import n_dim, datatype, serializable, inheritdoc, maybeAdd, floatToJson, hasKeys, numeq, \
-    basestring, xrange, floatToC99
+    basestring, xrange, floatToC99, binnedDistribution, invalidateContents
 from histogrammar.primitives.count import Count
 
 
@@ -163,6 +163,7 @@ class Stack(Factory, Container):
             if self.thresholds != other.thresholds:
                 raise ContainerException("cannot add Stack because cut thresholds differ")
             self.entries += other.entries
+            invalidateContents(self)
             for ((k1, v1), (k2, v2)) in zip(self.bins, other.bins):
                 v1 += v2
             self.nanflow += other.nanflow
@@ -203,6 +204,7 @@ class Stack(Factory, Container):
 
             # no possibility of exception from here on out (for rollback)
             self.entries += weight
+            invalidateContents(self)
 
     def _cppGenerateCode(self, parser, generator, inputFieldNames, inputFieldTypes, derivedFieldTypes,
                          derivedFieldExprs, storageStructs, initCode, initPrefix, initIndent, fillCode, fillPrefix,
@@ -305,6 +307,7 @@ class Stack(Factory, Container):
     def _clingUpdate(self, filler, *extractorPrefix):
         obj = self._clingExpandPrefix(filler, *extractorPrefix)
         self.entries += obj.entries
+        invalidateContents(self)
         for i in xrange(len(self.values)):
             self.bins[i][1]._clingUpdate(obj, ("func", ["getValues", i]))
         self.nanflow._clingUpdate(obj, ("var", "nanflow"))
@@ -496,6 +499,7 @@ class Stack(Factory, Container):
         format = "<f"
         entries, = struct.unpack(format, data[:struct.calcsize(format)])
         self.entries += entries
+        invalidateContents(self)
         data = data[struct.calcsize(format):]
 
         data = self.nanflow._cudaUnpackAndFill(data, bigendian, alignment)
@@ -537,6 +541,7 @@ class Stack(Factory, Container):
 
         # no possibility of exception from here on out (for rollback)
         self.entries += float(newentries)
+        invalidateContents(self)
 
     def _sparksql(self, jvm, converter):
         return converter.Stack([e for e, v in self.bins[1:]], self.quantity.asSparkSQL(),
@@ -651,6 +656,47 @@ class Stack(Factory, Container):
         import numpy as np
         return np.array([v.entries for v in self.values])
 
+    def quantile(self, q):
+        """
+        Returns quantiles, interpolated linearly within bins
+
+        Computed from the cumulative bin entries, which are cached until the next fill or addition; after changing
+        the bins in place (or filling them directly), call ``histogrammar.util.invalidateContents`` on the container.
+        The entries between consecutive thresholds (the differences of the stacked entries) are taken as
+        bins; the first and the last extend to infinity, their entries are put at their finite edge.
+        Nanflow is not included.
+
+        :param q: fraction or array of fractions of the entries, between 0 and 1
+        :returns: value(s) below which these fractions of the entries lie
+        :rtype: float or numpy.array
+        """
+        return binnedDistribution(self).quantile(q)
+
+    def cdf(self, xvalues=None):
+        """
+        Returns cumulative distribution function
+
+        :param xvalues: x-values to evaluate the CDF at, default is None: at the upper edge of each bin
+        :returns: numpy array with fractions of entries below each x-value
+        :rtype: numpy.array
+        """
+        return binnedDistribution(self).cdf(xvalues)
+
+    def pdf(self):
+        """
+        Returns normalized probability density
+
+        :returns: numpy array with bin entries divided by the total entries and by the bin width
+        :rtype: numpy.array
+        """
+        return binnedDistribution(self).pdf()
+
+    def _distribution_bins(self):
+        import numpy as np
+        edges = np.array(self.thresholds + [float("inf")])
+        stacked = self.bin_entries()
+        return edges, stacked - np.append(stacked[1:], 0.0)
+
 
 # extra properties: number of dimensions and datatypes of sub-hists
 Stack.n_dim = n_dim
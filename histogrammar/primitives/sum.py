@@ -142,7 +142,8 @@ class Sum(Factory, Container):
             None)
         fillCode.append(" " * fillIndent + self._c99ExpandPrefix(*fillPrefix) +
                         ".entries += " + weightVarStack[-1] + ";")
-        fillCode.append(" " * fillIndent + self._c99ExpandPrefix(*fillPrefix) + ".sum += " + normexpr + ";")
+        fillCode.append(" " * fillIndent + self._c99ExpandPrefix(*fillPrefix) + ".sum += (" + normexpr + ") * " +
+                        weightVarStack[-1] + ";")
 
         storageStructs[self._c99StructName()] = """
   typedef struct {{
@@ -183,8 +184,10 @@ class Sum(Factory, Container):
             self._c99ExpandPrefix(
                 *
                 fillPrefix) +
-            ".sum, " +
+            ".sum, (" +
             normexpr +
+            ") * " +
+            weightVarStack[-1] +
             ");")
 
         combineCode.append(
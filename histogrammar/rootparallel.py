@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+# Copyright 2016 DIANA-HEP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Parallel ``fillroot``: fills copies of a container over entry ranges of a TTree or TChain in worker processes.
+
+Each worker reopens the tree's files (ROOT objects can't be sent between processes), fills an empty copy of the
+container with ``fillroot(ttree, start, end)`` and sends it back as JSON; the results are added to the container with
+``+=``, in entry order. Cling classes are cached by a hash of the generated code, so each worker process compiles the
+filler once and reuses it for all of its ranges.
+"""
+
+import concurrent.futures
+import multiprocessing
+import os
+import sys
+import time
+
+from histogrammar.defs import Factory
+
+
+def treeSource(ttree):
+    """Return ``(treeName, fileNames)`` with which a worker process can rebuild ``ttree`` as a TChain."""
+    if ttree.InheritsFrom("TChain"):
+        return ttree.GetName(), [x.GetTitle() for x in ttree.GetListOfFiles()]
+
+    tfile = ttree.GetCurrentFile()
+    if not tfile:
+        raise ValueError("TTree {0} is not attached to a file, so worker processes can't read it".format(
+            ttree.GetName()))
+    directory = ttree.GetDirectory().GetPath().split(":", 1)[-1].strip("/")
+    return (directory + "/" if directory != "" else "") + ttree.GetName(), [tfile.GetName()]
+
+
+def entryBoundaries(ttree, start, end):
+    """Entries in ``[start, end)`` at which it is cheap to split: cluster starts for a TTree, file starts for a TChain."""
+    out = []
+    if ttree.InheritsFrom("TChain"):
+        ttree.GetEntries()                        # fills the tree offsets
+        offsets = ttree.GetTreeOffset()
+        out = [offsets[i] for i in range(ttree.GetNtrees())]
+    else:
+        clusters = ttree.GetClusterIterator(start)
+        entry = clusters()
+        while entry < end:
+            out.append(entry)
+            entry = clusters()
+    return [x for x in out if start < x < end]
+
+
+def splitRanges(start, end, numRanges, boundaries=()):
+    """Split ``[start, end)`` into ``numRanges`` contiguous ranges of about the same size.
+
+    Each cut is moved to the nearest of the given ``boundaries`` (cluster or file starts) if one lies within half a
+    range of it, so that ranges don't share baskets or files. Returns a list of ``(start, end)`` pairs.
+    """
+    if end <= start:
+        return []
+    numRanges = max(1, min(numRanges, end - start))
+    width = float(end - start) / numRanges
+    boundaries = sorted(boundaries)
+
+    cuts = [start]
+    for i in range(1, numRanges):
+        ideal = start + i * width
+        nearest = min(boundaries, key=lambda x: abs(x - ideal)) if len(boundaries) > 0 else None
+        cut = nearest if nearest is not None and abs(nearest - ideal) <= width / 2.0 else int(round(ideal))
+        if cuts[-1] < cut < end:
+            cuts.append(cut)
+    cuts.append(end)
+
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+def printProgress(entriesDone, entriesTotal, seconds):
+    """Default progress report: one line per finished range on standard error."""
+    rate = entriesDone / seconds if seconds > 0 else float("inf")
+    remaining = (entriesTotal - entriesDone) / rate if rate > 0 else float("inf")
+    sys.stderr.write("histogrammar: {0}/{1} entries ({2:.1f}%), {3:.3g} entries/s, {4:.1f} s elapsed, "
+                     "{5:.1f} s remaining\n".format(entriesDone, entriesTotal,
+                                                    100.0 * entriesDone / max(entriesTotal, 1), rate, seconds,
+                                                    remaining))
+    sys.stderr.flush()
+
+
+def _fillRange(container, treeName, fileNames, start, end, debug, debugOnError, exprs):
+    import ROOT
+    chain = ROOT.TChain(treeName)
+    for fileName in fileNames:
+        chain.Add(fileName)
+    chain.LoadTree(start)                         # so that fillroot can see the branches
+    container.fillroot(chain, start, end, debug=debug, debugOnError=debugOnError, **exprs)
+    return container.toJson()
+
+
+def fillrootparallel(container, ttree, start=-1, end=-1, numWorkers=None, numRanges=None, alignRanges=True,
+                     progress=False, startMethod="spawn", debug=False, debugOnError=True, **exprs):
+    """Fill ``container`` from ``ttree`` with ``fillroot`` on entry ranges, in parallel worker processes.
+
+    Parameters:
+        container (:doc:`Container <histogrammar.defs.Container>`): container to fill (modified in place).
+        ttree (ROOT TTree or TChain): input; must be readable from files by the worker processes.
+        start, end (int): entry range, as in ``fillroot`` (-1 for the first/last entry).
+        numWorkers (int or None): number of processes; if None, ``os.cpu_count()``.
+        numRanges (int or None): number of entry ranges; if None, four per worker to balance the load.
+        alignRanges (bool): if True, split at cluster (TTree) or file (TChain) boundaries where possible.
+        progress (bool or callable): if True, print progress to standard error; if callable, call it as
+            ``progress(entriesDone, entriesTotal, seconds)`` after each range.
+        startMethod (str): multiprocessing start method; "spawn" avoids forking an initialized ROOT.
+        debug, debugOnError, exprs: passed to ``fillroot``.
+    """
+    container._checkForCrossReferences()
+    treeName, fileNames = treeSource(ttree)
+
+    if start < 0:
+        start = 0
+    if end < 0:
+        end = ttree.GetEntries()
+    if numWorkers is None:
+        numWorkers = os.cpu_count() or 1
+    if numRanges is None:
+        numRanges = 4 * numWorkers
+    boundaries = entryBoundaries(ttree, start, end) if alignRanges else ()
+    ranges = splitRanges(start, end, numRanges, boundaries)
+
+    if progress is True:
+        progress = printProgress
+
+    results = [None] * len(ranges)
+    entriesDone = 0
+    startTime = time.time()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=numWorkers,
+                                                mp_context=multiprocessing.get_context(startMethod)) as executor:
+        futures = dict((executor.submit(_fillRange, container.zero(), treeName, fileNames, first, last, debug,
+                                        debugOnError, exprs), i) for i, (first, last) in enumerate(ranges))
+        for future in concurrent.futures.as_completed(futures):
+            i = futures[future]
+            results[i] = Factory.fromJson(future.result())
+            entriesDone += ranges[i][1] - ranges[i][0]
+            if progress:
+                progress(entriesDone, end - start, time.time() - startTime)
+
+    for result in results:
+        container += result
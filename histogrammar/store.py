@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+
+# Copyright 2016 DIANA-HEP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Memory-mapped on-disk store of many histogrammar containers.
+
+File layout (all integers little-endian):
+
+.. code-block:: text
+
+    header   : magic (8 bytes) | index offset (uint64) | index length (uint64)
+    records  : per container, its JSON document followed by 8-byte aligned bin arrays
+    index    : JSON document mapping (name, feature) to the byte ranges of its record
+
+Opening a store only reads the fixed-size header. The index is parsed on first lookup, and a container's
+JSON document or bin arrays are only touched when that container is requested. Bin arrays are returned
+as read-only numpy views on the memory map, so no copy is made until the caller modifies them.
+
+Appending writes the new records and a new index after the current end of the file, then rewrites the
+header. Existing records are never moved, so readers of the old header keep seeing a consistent store.
+"""
+
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from histogrammar.defs import Container, Factory
+
+_MAGIC = b"HGSTORE1"
+_HEADER = struct.Struct("<8sQQ")
+_ALIGN = 8
+
+
+class HistogramStore(object):
+    """Memory-mapped store of histogrammar containers, indexed by name and feature.
+
+    Example:
+
+    .. code-block:: python
+
+        hists = df.hg_make_histograms()
+        with HistogramStore("hists.hgs", mode="a") as store:
+            store.append("2022-06-01", hists)
+
+        store = HistogramStore("hists.hgs")
+        age = store.get("2022-06-01", "age")           # parses only this container
+        entries = store.bin_entries("2022-06-01", "age")   # zero-copy view, no JSON parsing
+    """
+
+    def __init__(self, path, mode="r"):
+        """Open or create a histogram store.
+
+        :param str path: path of the store file.
+        :param str mode: "r" to read an existing store, "a" to read and append (the file is created
+            when it does not exist), "w" to create a new, empty store (overwriting an existing file).
+        """
+        if mode not in ("r", "a", "w"):
+            raise ValueError('mode ({0}) must be one of "r", "a" or "w"'.format(mode))
+        self.path = path
+        self.mode = mode
+
+        if mode == "w" or (mode == "a" and not os.path.exists(path)):
+            with open(path, "wb") as f:
+                index = json.dumps({"records": []}).encode("utf-8")
+                f.write(_HEADER.pack(_MAGIC, _HEADER.size, len(index)))
+                f.write(index)
+
+        self._file = None
+        self._mmap = None
+        self._index = None
+        self._open()
+
+    def _open(self):
+        self._file = open(self.path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._index_offset, self._index_length = _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC:
+            self.close()
+            raise IOError("{0} is not a histogrammar store".format(self.path))
+        self._index = None
+
+    def close(self):
+        """Release the memory map and the underlying file."""
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # arrays returned by bin_entries() etc. still reference the map; it is released along with them
+                pass
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def index(self):
+        """Dict from (name, feature) to record locations; parsed lazily on first access."""
+        if self._index is None:
+            raw = self._mmap[self._index_offset:self._index_offset + self._index_length]
+            self._index = dict(((name, feature), record) for name, feature, record in json.loads(raw)["records"])
+        return self._index
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __getitem__(self, key):
+        name, feature = key
+        return self.get(name, feature)
+
+    def keys(self):
+        """List of (name, feature) pairs in the store."""
+        return list(self.index.keys())
+
+    def names(self):
+        """Sorted list of names (e.g. time slices) in the store."""
+        return sorted(set(name for name, _ in self.index))
+
+    def features(self, name=None):
+        """Sorted list of features, optionally only those stored under ``name``."""
+        return sorted(set(feature for n, feature in self.index if name is None or n == name))
+
+    def _record(self, name, feature):
+        try:
+            return self.index[(name, feature)]
+        except KeyError:
+            raise KeyError("no container for name {0!r} and feature {1!r} in {2}".format(name, feature, self.path))
+
+    def get(self, name, feature):
+        """Reconstruct one container; only its own JSON document is read and parsed.
+
+        :param str name: name (e.g. time slice) the container was appended under.
+        :param str feature: feature of the container, e.g. "age" or "date:age".
+        :returns: histogrammar container
+        """
+        offset, length = self._record(name, feature)["json"]
+        return Factory.fromJsonString(self._mmap[offset:offset + length].decode("utf-8"))
+
+    def _array(self, name, feature, key):
+        segments = self._record(name, feature)["arrays"]
+        if key not in segments:
+            raise KeyError("no {0} stored for name {1!r} and feature {2!r}".format(key, name, feature))
+        dtype, offset, count = segments[key]
+        if dtype == "json":
+            return np.array(json.loads(self._mmap[offset:offset + count].decode("utf-8")))
+        return np.frombuffer(self._mmap, dtype=np.dtype(dtype), count=count, offset=offset)
+
+    def bin_entries(self, name, feature):
+        """Bin entries of the container's first dimension, as a read-only view on the memory map.
+
+        :param str name: name (e.g. time slice) the container was appended under.
+        :param str feature: feature of the container.
+        :returns: numpy array with bin entries
+        :rtype: numpy.array
+        """
+        return self._array(name, feature, "entries")
+
+    def bin_edges(self, name, feature):
+        """Bin edges of a numeric container's first dimension, as a read-only view on the memory map."""
+        return self._array(name, feature, "edges")
+
+    def bin_labels(self, name, feature):
+        """Bin labels of a categorical container's first dimension."""
+        return self._array(name, feature, "labels")
+
+    def append(self, name, hists):
+        """Append containers to the store, replacing any stored earlier under the same name and feature.
+
+        :param str name: name to store the containers under, e.g. the time slice they were filled from.
+        :param dict hists: dict from feature to histogrammar container, e.g. the output of ``make_histograms``.
+        """
+        if self.mode == "r":
+            raise IOError("store {0} is opened read-only".format(self.path))
+        if not isinstance(name, str):
+            raise TypeError("name ({0}) must be a string".format(name))
+        if not isinstance(hists, dict) or not all(isinstance(h, Container) for h in hists.values()):
+            raise TypeError("hists must be a dict from feature to Container")
+
+        records = [[n, f, r] for (n, f), r in self.index.items() if not (n == name and f in hists)]
+        with open(self.path, "r+b") as f:
+            f.seek(0, os.SEEK_END)
+            for feature, hist in hists.items():
+                records.append([name, feature, self._write_record(f, hist)])
+            index = json.dumps({"records": records}).encode("utf-8")
+            index_offset = f.tell()
+            f.write(index)
+            f.flush()
+            os.fsync(f.fileno())
+            # the header is only rewritten once the new records and index are safely on disk
+            f.seek(0)
+            f.write(_HEADER.pack(_MAGIC, index_offset, len(index)))
+
+        self.close()
+        self._open()
+
+    @staticmethod
+    def _write_record(f, hist):
+        record = {}
+        document = json.dumps(hist.toJson()).encode("utf-8")
+        record["json"] = [f.tell(), len(document)]
+        f.write(document)
+
+        arrays = {}
+        if hasattr(hist, "bin_entries"):
+            arrays["entries"] = np.asarray(hist.bin_entries(), dtype="<f8")
+        if hasattr(hist, "bin_edges"):
+            arrays["edges"] = np.asarray(hist.bin_edges(), dtype="<f8")
+        if hasattr(hist, "bin_labels"):
+            arrays["labels"] = hist.bin_labels().tolist()
+
+        record["arrays"] = {}
+        for key, arr in arrays.items():
+            if isinstance(arr, list):
+                raw = json.dumps(arr).encode("utf-8")
+                record["arrays"][key] = ["json", f.tell(), len(raw)]
+                f.write(raw)
+            else:
+                f.write(b"\0" * (-f.tell() % _ALIGN))
+                record["arrays"][key] = [arr.dtype.str, f.tell(), len(arr)]
+                f.write(arr.tobytes())
+        return record
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+
+# Copyright 2016 DIANA-HEP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Time-windowed aggregation of streams of micro-batches.
+
+Rows are filled once, with ``fill.numpy``, into *panes*: consecutive time slices as long as the window slide.
+A window is the sum of the ``window / slide`` panes it covers, merged with ``+=`` when it is requested, so
+sliding windows cost no extra filling and tumbling windows (slide equal to the window) are single panes.
+Panes are kept in a ring ordered by time and expire as the stream's watermark (its latest timestamp) advances.
+"""
+
+import numbers
+from collections import deque
+
+import numpy as np
+
+
+def _as_number(value):
+    """Timestamps and durations as numbers: numpy datetime64/timedelta64 (and pandas equivalents) in nanoseconds."""
+    if isinstance(value, (np.datetime64, np.timedelta64)):
+        return value.astype("<m8[ns]" if isinstance(value, np.timedelta64) else "<M8[ns]").astype(np.int64)
+    if hasattr(value, "to_timedelta64"):
+        return _as_number(value.to_timedelta64())
+    if hasattr(value, "to_datetime64"):
+        return _as_number(value.to_datetime64())
+    return value
+
+
+def _as_numbers(values):
+    values = np.asarray(values)
+    if values.dtype.kind == "M":
+        return values.astype("<M8[ns]").astype(np.int64)
+    if values.dtype.kind == "m":
+        return values.astype("<m8[ns]").astype(np.int64)
+    return values
+
+
+def _select(data, mask):
+    """Rows of a batch (dict of arrays or DataFrame) selected by a boolean mask."""
+    if isinstance(data, dict):
+        return dict((k, np.asarray(v)[mask]) for k, v in data.items())
+    return data[mask]
+
+
+class WindowedAggregator(object):
+    """Fill copies of a container per time window, for tumbling or sliding windows over a stream.
+
+    Example:
+
+    .. code-block:: python
+
+        agg = WindowedAggregator(hg.Bin(100, 0, 10, "x"), window=60, slide=10, time_column="t")
+        for batch in stream:
+            agg.fill(batch)
+            h = agg.current()      # histogram of the last 60 seconds, merged from 6 panes
+    """
+
+    def __init__(self, template, window, slide=None, history=1, time_column=None, origin=0):
+        """Create a windowed aggregator.
+
+        :param template: container to fill in each pane; it is not modified (panes are its ``zero()`` copies).
+        :param window: window length, in the units of the timestamps (a timedelta for datetime64 timestamps).
+        :param slide: distance between consecutive window starts; window must be an integer multiple of it.
+            Default is the window length (tumbling windows).
+        :param int history: number of most recent windows (ending at the watermark) to keep available.
+        :param str time_column: name of the timestamp column in the batches, if timestamps are not passed to fill.
+        :param origin: a window boundary (timestamp); windows are aligned to ``origin + k * slide``.
+        """
+        self.template = template.zero()
+        self.window = _as_number(window)
+        self.slide = self.window if slide is None else _as_number(slide)
+        if self.window <= 0 or self.slide <= 0:
+            raise ValueError("window ({0}) and slide ({1}) must be positive".format(window, slide))
+        panes = self.window / self.slide
+        if abs(panes - round(panes)) > 1e-9:
+            raise ValueError("window ({0}) must be an integer multiple of slide ({1})".format(window, slide))
+        self.panes_per_window = int(round(panes))
+        if history < 1:
+            raise ValueError("history ({0}) must be at least 1".format(history))
+        self.history = history
+        self.time_column = time_column
+        self.origin = _as_number(origin)
+
+        self._panes = deque()           # (pane index, container), in increasing pane index
+        self.watermark = None
+        self.late_entries = 0.0         # weight of rows older than the oldest kept pane, which are dropped
+
+    def _pane_indexes(self, times, ceil=False):
+        """Pane index of each of ``times`` (or of the next pane boundary, if ``ceil``), as int64.
+
+        Integer (and datetime64) timestamps are divided exactly: nanoseconds since the epoch don't fit in a float.
+        """
+        offsets = np.asarray(times) - self.origin
+        if offsets.dtype.kind in "iu" and isinstance(self.slide, (numbers.Integral, np.integer)):
+            offsets = offsets.astype(np.int64)
+            return -(-offsets // self.slide) if ceil else offsets // self.slide
+        return (np.ceil if ceil else np.floor)(offsets / self.slide).astype(np.int64)
+
+    def _pane_index(self, time, ceil=False):
+        return int(self._pane_indexes(time, ceil))
+
+    def pane_start(self, index):
+        """Start time of pane ``index``."""
+        return self.origin + index * self.slide
+
+    @property
+    def _max_panes(self):
+        return self.history * self.panes_per_window
+
+    def _pane(self, index):
+        """Container of pane ``index``, created in its place in the ring if needed."""
+        for i in range(len(self._panes) - 1, -1, -1):
+            if self._panes[i][0] == index:
+                return self._panes[i][1]
+            if self._panes[i][0] < index:
+                break
+        else:
+            i = -1
+        container = self.template.zero()
+        self._panes.insert(i + 1, (index, container))
+        return container
+
+    def fill(self, data, timestamps=None, weights=1.0):
+        """Fill a micro-batch into its panes.
+
+        :param data: dict of numpy arrays or pandas DataFrame, as for ``fill.numpy``.
+        :param timestamps: per-row timestamps (numbers or datetime64); default is ``data[time_column]``.
+        :param weights: per-row weights (numpy array) or a single weight.
+        """
+        if timestamps is None:
+            if self.time_column is None:
+                raise ValueError("timestamps are required when time_column is not set")
+            timestamps = data[self.time_column]
+        times = _as_numbers(timestamps)
+        if len(times) == 0:
+            return
+        weights_array = weights if isinstance(weights, np.ndarray) else np.full(len(times), float(weights))
+
+        panes = self._pane_indexes(times)
+        newest = int(panes.max())
+        if self.watermark is not None:
+            newest = max(newest, self._pane_index(self.watermark))
+        oldest_kept = newest - self._max_panes + 1
+
+        for index in np.unique(panes):
+            mask = panes == index
+            if index < oldest_kept:
+                self.late_entries += float(weights_array[mask].sum())
+                continue
+            subweights = weights_array[mask] if isinstance(weights, np.ndarray) else weights
+            self._pane(int(index)).fill.numpy(_select(data, mask), subweights)
+
+        latest_time = times.max()
+        if self.watermark is None or latest_time > self.watermark:
+            self.watermark = latest_time
+        self.expire()
+
+    def expire(self, time=None):
+        """Drop panes that no kept window covers, given the watermark (or ``time``, if later)."""
+        if time is not None:
+            time = _as_number(time)
+            if self.watermark is None or time > self.watermark:
+                self.watermark = time
+        if self.watermark is None:
+            return
+        oldest_kept = self._pane_index(self.watermark) - self._max_panes + 1
+        while len(self._panes) > 0 and self._panes[0][0] < oldest_kept:
+            self._panes.popleft()
+
+    def merged(self, start, end):
+        """Sum of the panes that lie within ``[start, end)``, merged with ``+=``; the panes are not modified."""
+        first = self._pane_index(_as_number(start), ceil=True)
+        last = self._pane_index(_as_number(end))
+        return self._merged(first, last)
+
+    def _merged(self, first, last):
+        out = self.template.zero()
+        for index, container in self._panes:
+            if first <= index < last:
+                out += container
+        return out
+
+    def current(self):
+        """Container for the window ending with the pane that contains the watermark."""
+        if self.watermark is None:
+            return self.template.zero()
+        last = self._pane_index(self.watermark) + 1
+        return self._merged(last - self.panes_per_window, last)
+
+    def windows(self):
+        """List of ``(start, end, container)`` for the kept windows, oldest first (the last is ``current()``)."""
+        if self.watermark is None:
+            return []
+        last = self._pane_index(self.watermark) + 1
+        out = []
+        for k in range(self.history - 1, -1, -1):
+            end = last - k * self.panes_per_window
+            first = end - self.panes_per_window
+            out.append((self.pane_start(first), self.pane_start(end), self._merged(first, end)))
+        return out
+
+    def consume(self, stream, weights_column=None):
+        """Fill every micro-batch of an iterable stream (e.g. a :class:`LocalStream`); returns the batch count.
+
+        :param stream: iterable of batches (dict of arrays or DataFrame).
+        :param str weights_column: name of a per-row weight column in the batches, if any.
+        """
+        n = 0
+        for batch in stream:
+            self.fill(batch, weights=1.0 if weights_column is None else np.asarray(batch[weights_column]))
+            n += 1
+        return n
+
+
+class LocalStream(object):
+    """In-process stand-in for a message stream: a FIFO of micro-batches.
+
+    Iterating consumes the batches produced so far, like one poll loop over a topic.
+    """
+
+    def __init__(self, batches=()):
+        """:param batches: initial micro-batches."""
+        self._queue = deque(batches)
+
+    def produce(self, batch):
+        """Append a micro-batch to the stream."""
+        self._queue.append(batch)
+
+    def __len__(self):
+        return len(self._queue)
+
+    def __iter__(self):
+        while len(self._queue) > 0:
+            yield self._queue.popleft()
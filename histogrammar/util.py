@@ -14,13 +14,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import ast
 import marshal
 import math
 import types
 import sys
 
-import histogrammar.pycparser.c_ast
-
 # Definitions for python 2/3 compatability
 if sys.version_info[0] > 2:
     basestring = str
@@ -43,8 +42,12 @@ class FillMethod(object):
         self.container = container
         self.fill = fill
         self.root = container.fillroot
+        self.rootparallel = container.fillrootparallel
         self.pycuda = container.fillpycuda
+        self.native = container.fillnative
+        self.openmp = container.fillopenmp
         self.numpy = container.fillnumpy
+        self.numba = container.fillnumba
         self.sparksql = container.fillsparksql
 
     def __call__(self, *args, **kwds):
@@ -217,9 +220,110 @@ def rangeToJson(x):
     else:
         return floatToJson(x)
 
+
+def evictBins(bins, maxBins, incoming=None):
+    """Keep a dict of bins within ``maxBins`` by evicting the bins with the least weight.
+
+    When ``bins`` plus the new keys of ``incoming`` would exceed ``maxBins``, the lightest bins are evicted down to
+    ``maxBins - maxBins // 10``, so that the search for them is amortized over many new bins. A bin's weight is its
+    ``entries`` plus its weight in ``incoming``.
+
+    Parameters:
+        bins (dict): the bins, from key to :doc:`Container <histogrammar.defs.Container>`; modified in place.
+        maxBins (int): maximum number of bins.
+        incoming (dict or None): weights of the keys about to be filled (new or not); give a new key infinite
+            weight to make sure it is kept.
+
+    Returns:
+        (float, set): the sum of ``entries`` of the evicted bins, and the ``incoming`` keys that must not be filled.
+    """
+    evict, rejected = evictionPlan(bins, maxBins, incoming)
+    return sum(bins.pop(k).entries for k in evict), rejected
+
+
+def evictionPlan(bins, maxBins, incoming=None):
+    """The bins that ``evictBins`` would evict, without changing ``bins``.
+
+    Returns:
+        (list, set): the keys of the bins to evict, and the ``incoming`` keys that must not be filled.
+    """
+    if incoming is None:
+        incoming = {}
+    newKeys = [k for k in incoming if k not in bins]
+    if len(bins) + len(newKeys) <= maxBins:
+        return [], set()
+
+    keys = list(bins) + newKeys
+    weight = [(bins[k].entries if k in bins else 0.0) + incoming.get(k, 0.0) for k in keys]
+    order = sorted(range(len(keys)), key=weight.__getitem__)
+    keep = max(1, maxBins - maxBins // 10)
+
+    evict = []
+    rejected = set()
+    for i in order[:len(keys) - keep]:
+        k = keys[i]
+        if k in bins:
+            evict.append(k)
+        if k in incoming:
+            rejected.add(k)
+    return evict, rejected
+
 # function tools
 
 
+class _DataFrameColumns(dict):
+    """The columns of a DataFrame as numpy arrays, extracted when they are first looked up"""
+
+    def __init__(self, dataframe):
+        self.dataframe = dataframe
+
+    def __missing__(self, name):
+        out = self[name] = self.dataframe[name].values
+        return out
+
+
+def _numpyColumns(datum, numpy, pandas):
+    """Columns of a batch of numpy data as a dict of arrays (or the array itself if unstructured), else None.
+
+    For a DataFrame, only the columns that are looked up are extracted.
+    """
+    if numpy is None:
+        return None
+    if isinstance(datum, dict):
+        for x in datum.values():
+            if isinstance(x, numpy.ndarray) and x.ndim > 0:
+                return datum
+    elif isinstance(datum, numpy.ndarray):
+        if datum.dtype.names is not None:
+            return dict((n, datum[n]) for n in datum.dtype.names)
+        elif datum.ndim == 1:
+            return datum
+    elif pandas is not None and isinstance(datum, pandas.core.frame.DataFrame):
+        return _DataFrameColumns(datum)
+    return None
+
+
+class _ElementwiseComparisons(ast.NodeTransformer):
+    """Rewrite chained comparisons ``a < b < c`` as ``(a < b) & (b < c)``, which numpy arrays can evaluate."""
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if len(node.ops) == 1:
+            return node
+        operands = [node.left] + node.comparators
+        out = None
+        for op, left, right in zip(node.ops, operands[:-1], operands[1:]):
+            comparison = ast.Compare(left=left, ops=[op], comparators=[right])
+            out = comparison if out is None else ast.BinOp(left=out, op=ast.BitAnd(), right=comparison)
+        return ast.copy_location(out, node)
+
+
+def _compileElementwise(expr):
+    """Compile a Python expression string for batches of numpy data."""
+    tree = _ElementwiseComparisons().visit(ast.parse(expr, "<string>", "eval"))
+    return compile(ast.fix_missing_locations(tree), "<string>", "eval")
+
+
 class UserFcn(object):
     """Base trait for user functions.
 
@@ -232,6 +336,14 @@ class UserFcn(object):
     code; backends targeting GPUs and FPGAs can interpret them as CUDA/OpenCL or pin-out names. As usual with
     Histogrammar, the only platform-specific part is the user functions.
 
+    With ``fill.numpy``, a string is first interpreted as a C99 expression and translated into one vectorized numpy
+    function (cached per string; see histogrammar.parsing.vectorizedExpression), so that the same string works with
+    ``fillroot``, ``fillpycuda`` and ``fill.numpy``. Strings that are also Python keep their Python meaning (``%``
+    and ``/`` follow Python), so that ``fill.numpy`` gives the same result as ``fill``, and strings that are only C
+    keep their C meaning (``/`` and ``%`` of integers truncate). Strings that can't be translated, including those
+    that C and Python parse differently, are evaluated as Python, with chained comparisons like ``0 < x < 3`` taken
+    elementwise.
+
     UserFcns have a ``name`` parameter that may not be set. The user would ordinarily use the histogrammar.util.named
     function to give a function a name. Similarly, histogrammar.util.cached adds caching. (Naming and caching
     commute: they can be applied in either order.)
@@ -288,7 +400,10 @@ class UserFcn(object):
                 self.fcn = self.expr
 
             elif isinstance(self.expr, basestring):
-                c = compile(self.expr, "<string>", "eval")
+                # compiled as Python when first needed (C99-only expressions never are): for single data and
+                # for batches of numpy data, in which chained comparisons are elementwise
+                compiled = []
+                compiledBatch = []
 
                 # close over this state
                 varname = [None]
@@ -302,7 +417,38 @@ class UserFcn(object):
                 except ImportError:
                     pandas = None
 
+                # C99 translation for batches of numpy data, looked up on first use
+                expr = self.expr
+                vectorized = []
+
                 def function(datum):
+                    columns = _numpyColumns(datum, numpy, pandas)
+                    if columns is not None:
+                        if len(vectorized) == 0:
+                            from histogrammar.parsing import vectorizedExpression
+                            vectorized.append(vectorizedExpression(expr))
+                        v, = vectorized
+                        if v is not None:
+                            if not isinstance(columns, dict):
+                                if len(v.variables) == 1:
+                                    return v.fcn(numpy, columns)
+                            else:
+                                try:
+                                    args = [columns[x] for x in v.variables]
+                                except KeyError:
+                                    pass
+                                else:
+                                    return v.fcn(numpy, *args)
+
+                    if columns is None:
+                        if len(compiled) == 0:
+                            compiled.append(compile(expr, "<string>", "eval"))
+                        c, = compiled
+                    else:
+                        if len(compiledBatch) == 0:
+                            compiledBatch.append(_compileElementwise(expr))
+                        c, = compiledBatch
+
                     context = dict(globals())
 
                     # fill the namespace with math.* functions
@@ -414,11 +560,14 @@ class CachedFcn(UserFcn):
         f(4.56)   # computes the function again at a new point
     """
 
-    try:
-        import numpy
-        np = numpy
-    except ImportError:
-        np = None
+    @property
+    def np(self):
+        # imported on first call rather than at class definition, to keep "import histogrammar" fast
+        try:
+            import numpy
+            return numpy
+        except ImportError:
+            return None
 
     def __call__(self, *args, **kwds):
         if hasattr(self, "lastArgs") and \
@@ -441,21 +590,53 @@ class CachedFcn(UserFcn):
         return "CachedFcn({0}, {1})".format(self.expr, self.name)
 
 
+# UserFcns rebuilt by unpickling, so that workers receiving many containers with the same functions
+# unmarshal (and, for strings, compile) each of them only once
+_deserializedFcns = {}
+_deserializedFcnsMaxSize = 1024
+
+
+def _cachedFcn(key, build):
+    try:
+        out = _deserializedFcns.get(key)
+    except TypeError:
+        # unhashable parts (e.g. a list referenced as a global): don't cache
+        return build()
+    if out is None:
+        out = build()
+        if len(_deserializedFcns) >= _deserializedFcnsMaxSize:
+            _deserializedFcns.clear()
+        _deserializedFcns[key] = out
+    return out
+
+
 def deserializeString(cls, expr, name):
     """Used by Pickle to reconstruct a string-based histogrammar.util.UserFcn from Pickle data."""
-    out = cls.__new__(cls)
-    out.expr = expr
-    out.name = name
-    return out
+    def build():
+        out = cls.__new__(cls)
+        out.expr = expr
+        out.name = name
+        return out
+
+    if cls is CachedFcn:
+        # CachedFcns carry state from their last call; don't share them
+        return build()
+    return _cachedFcn((cls, expr, name), build)
 
 
 def deserializeFunction(cls, __code__, __name__, __defaults__, __closure__, refs, name):
     """Used by Pickle to reconstruct a function-based histogrammar.util.UserFcn from Pickle data."""
-    out = cls.__new__(cls)
-    g = dict(globals(), **refs)
-    out.expr = types.FunctionType(marshal.loads(__code__), g, __name__, __defaults__, __closure__)
-    out.name = name
-    return out
+    def build():
+        out = cls.__new__(cls)
+        g = dict(globals(), **refs)
+        out.expr = types.FunctionType(marshal.loads(__code__), g, __name__, __defaults__, __closure__)
+        out.name = name
+        return out
+
+    if cls is CachedFcn or __closure__ is not None:
+        # closures may refer to mutable state; CachedFcns carry state from their last call
+        return build()
+    return _cachedFcn((cls, __code__, __name__, __defaults__, tuple(sorted(refs.items())), name), build)
 
 
 def serializable(fcn):
@@ -514,12 +695,304 @@ def named(name, fcn):
         return UserFcn(fcn, name)
 
 
+# structural metadata of containers (n_dim, datatype, bin specs) is cached on them; see _cachedMetadata
+_metadataVersion = 0
+
+
+def invalidateMetadata():
+    """Invalidate the structural metadata (``n_dim``, ``datatype``, bin specs) cached on all containers.
+
+    Needed after changing the structure of a container in place, e.g. assigning another ``value`` or ``bins``
+    of a different type. Histogrammar calls it itself where it does so, e.g. in ``SparselyBin.coarsen``.
+    """
+    global _metadataVersion
+    _metadataVersion += 1
+
+
+def _metadataCacheOf(hist):
+    cache = hist.__dict__.get("_metadataCache")
+    if cache is None or cache["version"] != _metadataVersion:
+        cache = hist.__dict__["_metadataCache"] = {"version": _metadataVersion, "known": False}
+    return cache
+
+
+def _structureKnown(hist):
+    """False if some level of ``hist`` has neither filled bins nor a template to get its sub-aggregator from
+
+    (e.g. an empty container read from JSON), so that its structure may still change when it is added to.
+    A True result is cached, so new containers made from a template only check their own level.
+    """
+    import histogrammar
+    if not isinstance(hist, histogrammar.Container) or isinstance(hist, histogrammar.Count):
+        return True
+    cache = _metadataCacheOf(hist)
+    if cache["known"]:
+        return True
+    if isinstance(hist, (histogrammar.Categorize, histogrammar.SparselyBin, histogrammar.CentrallyBin)):
+        if not hist.bins and hist.value is None:
+            return False
+    elif isinstance(hist, (histogrammar.IrregularlyBin, histogrammar.Stack)):
+        if not hist.bins:
+            return False
+    elif isinstance(hist, histogrammar.Fraction):
+        if hist.denominator is None:
+            return False
+    elif isinstance(hist, histogrammar.Select):
+        if hist.cut is None:
+            return False
+    cache["known"] = _structureKnown(_get_sub_hist(hist))
+    return cache["known"]
+
+
+def _cachedMetadata(hist, name, compute, contentKey=None):
+    """``compute(hist)``, cached on ``hist`` under ``name``.
+
+    The cached value is used until ``invalidateMetadata`` is called or, if a ``contentKey`` is given (for metadata
+    that depends on the contents, like ``datatype``), until it changes; ``datatype`` is also dropped by
+    ``invalidateContents``, like the bin index. Nothing is cached for Count (there's
+    nothing to walk) or while the structure of ``hist`` is not fully known.
+    """
+    import histogrammar
+    if not isinstance(hist, histogrammar.Container) or isinstance(hist, histogrammar.Count):
+        return compute(hist)
+    cache = _metadataCacheOf(hist)
+    entry = cache.get(name)
+    if entry is not None and entry[0] == contentKey:
+        return entry[1]
+    value = compute(hist)
+    if _structureKnown(hist):
+        cache[name] = (contentKey, value)
+    return value
+
+
+def _get_sub_n_dim(hist):
+    return get_n_dim(hist, 1)
+
+
+def _valueNDim(hist):
+    """``hist.n_dim`` of a SparselyBin or Categorize that has a ``value`` template, for filling.
+
+    Cached on the template, which all of its bins and all containers made with ``zero()`` share; so a new
+    sub-aggregator being filled doesn't walk (or cache anything on) itself.
+    """
+    return 1 + _cachedMetadata(hist.value, "sub_n_dim", _get_sub_n_dim)
+
+
+def _keyKind(keyType):
+    # key types that numpy can sort together: Python and numpy numbers mix, bools and strings don't
+    import numbers
+    import numpy
+    if issubclass(keyType, (bool, numpy.bool_)):
+        return bool
+    if issubclass(keyType, numbers.Number):
+        return numbers.Number
+    return keyType
+
+
+class SortedBinIndex(object):
+    """Sorted bin keys and their entries as numpy arrays, for range and point queries with ``numpy.searchsorted``.
+
+    Used by the ``bin_entries``-style methods of Bin, SparselyBin and Categorize; see ``binIndex``.
+    """
+
+    def __init__(self, keys, entries, positions=None):
+        """Create an index.
+
+        Parameters:
+            keys (numpy array): bin keys, sorted (unless ``positions`` is given).
+            entries (numpy array of float): entries of each bin.
+            positions (dict or None): position of each key, to look keys up by hash instead of by bisection.
+        """
+        import numpy
+        self.keys = keys
+        self.entries = entries
+        self.cumulative = numpy.cumsum(entries)
+        self._positions = positions
+
+    @staticmethod
+    def fromBins(bins):
+        """Index a dict of bins from key to :doc:`Container <histogrammar.defs.Container>`.
+
+        Keys of mixed types (e.g. bool and str categories) can't be sorted together; they are kept in insertion
+        order and looked up through a dict.
+        """
+        import numpy
+        entries = numpy.fromiter((v.entries for v in bins.values()), dtype=numpy.float64, count=len(bins))
+        if len(set(_keyKind(t) for t in set(map(type, bins)))) > 1:
+            return SortedBinIndex(numpy.array(list(bins), dtype=object), entries,
+                                  dict((k, i) for i, k in enumerate(bins)))
+        keys = numpy.array(list(bins))
+        order = numpy.argsort(keys, kind="stable")
+        return SortedBinIndex(keys[order], entries[order])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def positions(self, keys):
+        """Positions of ``keys`` in the index (an array), and a mask of which of them are there."""
+        import numpy
+        if self._positions is not None and not isinstance(keys, numpy.ndarray):
+            # don't let numpy turn mixed keys into strings
+            return self._lookupPositions(list(keys))
+        keys = numpy.asarray(keys)
+        if len(self.keys) == 0:
+            return numpy.zeros(keys.shape, dtype=numpy.int64), numpy.zeros(keys.shape, dtype=bool)
+        kinds = (keys.dtype.kind, self.keys.dtype.kind)
+        if self._positions is not None or (kinds[0] != kinds[1] and not set(kinds).issubset("iuf")):
+            if self._positions is None:
+                self._positions = dict((k, i) for i, k in enumerate(self.keys.tolist()))
+            pos, found = self._lookupPositions(keys.ravel().tolist())
+            return pos.reshape(keys.shape), found.reshape(keys.shape)
+        pos = numpy.searchsorted(self.keys, keys)
+        numpy.minimum(pos, len(self.keys) - 1, out=pos)
+        return pos, self.keys[pos] == keys
+
+    def _lookupPositions(self, keys):
+        import numpy
+        pos = numpy.array([self._positions.get(k, -1) for k in keys], dtype=numpy.int64)
+        return numpy.maximum(pos, 0), pos >= 0
+
+    def lookup(self, keys):
+        """Entries at each of ``keys``, zero where there is no bin."""
+        import numpy
+        pos, found = self.positions(keys)
+        return numpy.where(found, self.entries[pos] if len(self.entries) > 0 else 0.0, 0.0)
+
+    def dense(self, first, last):
+        """Entries of every integer key from ``first`` to ``last`` (inclusive), zero where there is no bin."""
+        import numpy
+        out = numpy.zeros(max(0, last - first + 1))
+        lo = numpy.searchsorted(self.keys, first, side="left")
+        hi = numpy.searchsorted(self.keys, last, side="right")
+        out[self.keys[lo:hi] - first] = self.entries[lo:hi]
+        return out
+
+    def below(self, keys):
+        """Sum of the entries of all bins with a key less than or equal to each of ``keys``."""
+        import numpy
+        pos = numpy.searchsorted(self.keys, keys, side="right")
+        return numpy.concatenate([[0.0], self.cumulative])[pos]
+
+
+def _contentsCached(hist, attribute, compute):
+    """Value of ``compute(bins)`` for a container's bins, cached on it in ``attribute``.
+
+    The cached value is dropped by ``invalidateContents``, which the binned containers call whenever they are filled
+    or added to. As a safeguard, it is also recomputed when the container's ``entries`` or number of bins change, or
+    after ``invalidateMetadata``.
+    """
+    bins = hist.bins if hasattr(hist, "bins") else hist.values
+    key = (_metadataVersion, hist.entries, len(bins))
+    cached = hist.__dict__.get(attribute)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    value = compute(bins)
+    hist.__dict__[attribute] = (key, value)
+    return value
+
+
+def invalidateContents(hist):
+    """Drop the bin index, distribution (quantiles, CDF, PDF) and ``datatype`` cached on a container, see ``binIndex``.
+
+    Histogrammar calls it itself when it fills or adds to a container. It is needed after changing the ``bins`` or
+    ``values`` of a container in place without going through these, e.g. assigning a bin or filling it directly.
+    """
+    hist.__dict__.pop("_binIndexCache", None)
+    hist.__dict__.pop("_distributionCache", None)
+    metadata = hist.__dict__.get("_metadataCache")
+    if metadata is not None:
+        metadata.pop("datatype", None)
+
+
+def _makeBinIndex(bins):
+    import numpy
+    if isinstance(bins, dict):
+        return SortedBinIndex.fromBins(bins)
+    return SortedBinIndex(numpy.arange(len(bins)),
+                          numpy.fromiter((v.entries for v in bins), dtype=numpy.float64, count=len(bins)))
+
+
+def binIndex(hist):
+    """SortedBinIndex of a container's bins (a dict, or the ``values`` of a Bin), cached on it until it is filled.
+
+    The cache is not refreshed by changing the bins in place; call ``invalidateContents`` after doing so.
+    """
+    return _contentsCached(hist, "_binIndexCache", _makeBinIndex)
+
+
+class BinnedDistribution(object):
+    """Normalized distribution of a one-dimensional histogram, for quantile, CDF and PDF queries.
+
+    Entries are taken to be uniformly distributed within each bin; bins with an infinite edge hold their
+    entries at their finite edge.
+    """
+
+    def __init__(self, edges, entries):
+        """Create a distribution.
+
+        Parameters:
+            edges (numpy array of float): increasing bin edges, one more than bins; the outer edges may be infinite.
+            entries (numpy array of float): entries of each bin.
+        """
+        import numpy
+        self.edges = numpy.asarray(edges, dtype=numpy.float64)
+        self.entries = numpy.asarray(entries, dtype=numpy.float64)
+        self.total = float(self.entries.sum())
+        self.cumulative = numpy.concatenate([[0.0], numpy.cumsum(self.entries)])
+        # finite edges for interpolation: an infinite edge is moved onto the other edge of its bin
+        self._points = self.edges.copy()
+        if len(self._points) > 1:
+            if numpy.isinf(self._points[0]):
+                self._points[0] = self._points[1]
+            if numpy.isinf(self._points[-1]):
+                self._points[-1] = self._points[-2]
+
+    def quantile(self, q):
+        """Values below which a fraction ``q`` of the entries lie (a number or an array of numbers in [0, 1])."""
+        import numpy
+        q = numpy.asarray(q, dtype=numpy.float64)
+        if numpy.any((q < 0.0) | (q > 1.0)):
+            raise ValueError("quantiles must be between 0 and 1")
+        if self.total <= 0.0:
+            return numpy.full(q.shape, numpy.nan)[()]
+        target = q * self.total
+        # the bin in which the cumulative entries reach the target; q == 0 starts at the first non-empty bin
+        i = numpy.where(target > 0.0, numpy.searchsorted(self.cumulative[1:], target, side="left"),
+                        numpy.searchsorted(self.cumulative[1:], 0.0, side="right"))
+        numpy.minimum(i, len(self.entries) - 1, out=i)
+        fraction = numpy.clip((target - self.cumulative[i]) / self.entries[i], 0.0, 1.0)
+        low, high = self._points[i], self._points[i + 1]
+        return (low + fraction * (high - low))[()]
+
+    def cdf(self, xvalues=None):
+        """Fraction of the entries below each of ``xvalues``, or at the upper edge of each bin if None."""
+        import numpy
+        if self.total <= 0.0:
+            return numpy.full(len(self.entries) if xvalues is None else numpy.shape(xvalues), numpy.nan)
+        if xvalues is None:
+            return self.cumulative[1:] / self.total
+        return numpy.interp(xvalues, self._points, self.cumulative / self.total)
+
+    def pdf(self):
+        """Probability density in each bin: its fraction of the entries divided by its width (zero if infinite)."""
+        import numpy
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            density = self.entries / (self.total * numpy.diff(self.edges))
+        return numpy.where(numpy.isinf(numpy.diff(self.edges)), 0.0, density)
+
+
+def binnedDistribution(hist):
+    """BinnedDistribution of a container with a ``_distribution_bins()`` method, cached like ``binIndex``."""
+    return _contentsCached(hist, "_distributionCache", lambda bins: BinnedDistribution(*hist._distribution_bins()))
+
+
 def get_n_dim(hist, itr=0):
     """Histogram dimension
 
     :returns: dimension of the histogram
     :rtype: int
     """
+    import histogrammar
     # no sub-histogram possible for these:
     if not isinstance(hist, histogrammar.Container):
         return 0
@@ -530,9 +1003,10 @@ def get_n_dim(hist, itr=0):
     elif isinstance(hist, (histogrammar.Maximize, histogrammar.Minimize, histogrammar.Average,
                            histogrammar.Deviate, histogrammar.Sum)):
         return 1 if itr == 0 else 0
-    # histogram has a sub-histogram. Extract it and recurse dimension
+    # histogram has a sub-histogram. Extract it and recurse dimension (cached on it: sub-histograms made from the
+    # same template share it, so a new container doesn't walk the whole tree again)
     sub_hist = _get_sub_hist(hist)
-    return 1 + get_n_dim(sub_hist, itr + 1)
+    return 1 + _cachedMetadata(sub_hist, "sub_n_dim", _get_sub_n_dim)
 
 
 def get_datatype(hist, itr=0):
@@ -544,6 +1018,7 @@ def get_datatype(hist, itr=0):
     :returns: list with datatypes of all dimenensions of the histogram
     :rtype: list
     """
+    import histogrammar
     import numpy as np
     # no sub-histogram possible for these:
     if not isinstance(hist, histogrammar.Container):
@@ -623,10 +1098,11 @@ def _get_sub_hist(hist):
     :param hist: input histogram
     :return: sub-histogram, else None
     """
+    import histogrammar
     # if histogram has a sub-histogram, extract and return it
     # sub hists are only possible for the following hists
     if isinstance(hist, histogrammar.Categorize):
-        sub_hist = hist.values[0] if hist.values else hist.value
+        sub_hist = next(iter(hist.bins.values())) if hist.bins else hist.value
     elif isinstance(hist, histogrammar.Bin):
         if hist.entries > 0:
             # pick first sub-hist found that is filled
@@ -634,10 +1110,12 @@ def _get_sub_hist(hist):
             sub_hist = hist.values[idx]
         else:
             sub_hist = hist.values[0] if hist.values else histogrammar.Count()
-    elif isinstance(hist, (histogrammar.SparselyBin, histogrammar.CentrallyBin)):
-        sub_hist = list(dict(hist.bins).values())[0] if hist.bins else hist.value
+    elif isinstance(hist, histogrammar.SparselyBin):
+        sub_hist = next(iter(hist.bins.values())) if hist.bins else hist.value
+    elif isinstance(hist, histogrammar.CentrallyBin):
+        sub_hist = hist.bins[0][1] if hist.bins else hist.value
     elif isinstance(hist, (histogrammar.IrregularlyBin, histogrammar.Stack)):
-        sub_hist = list(dict(hist.bins).values())[0] if hist.bins else histogrammar.Count()
+        sub_hist = hist.bins[0][1] if hist.bins else histogrammar.Count()
     elif isinstance(hist, histogrammar.Fraction):
         sub_hist = hist.denominator if hist.denominator else histogrammar.Count()
     elif isinstance(hist, histogrammar.Select):
@@ -673,7 +1151,7 @@ def n_dim(self):  # noqa
     :returns: dimension of the histogram
     :rtype: int
     """
-    return get_n_dim(self)
+    return _cachedMetadata(self, "n_dim", get_n_dim)
 
 
 @property
@@ -687,12 +1165,11 @@ def datatype(self):  # noqa
     :rtype: type or list(type)
     """
     # making an educated guess to determine data-type categories
-    datatype = get_datatype(self)
-    if isinstance(datatype, list):
-        if len(datatype) == 1:
-            return datatype[0]
-        elif len(datatype) == 0:
-            return type(None)
+    datatype = list(_cachedMetadata(self, "datatype", get_datatype, self.entries))
+    if len(datatype) == 1:
+        return datatype[0]
+    elif len(datatype) == 0:
+        return type(None)
     return datatype
 
 
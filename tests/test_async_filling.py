@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from histogrammar.dfinterface.async_filling import AsyncFillPipeline
+from histogrammar.dfinterface.pandas_histogrammar import PandasHistogrammar
+
+
+FEATURES = ["age", "eyeColor", "latitude", ["isActive", "age"]]
+
+
+def _batches(n=5):
+    df = pytest.test_df
+    edges = np.linspace(0, len(df), n + 1).astype(int)
+    return [df.iloc[start:end] for start, end in zip(edges[:-1], edges[1:])]
+
+
+def test_async_pipeline_matches_sequential_filling():
+    # sequential: one filler over all batches (auto-binning is fixed by the first batch)
+    sequential = PandasHistogrammar(features=FEATURES, binning="auto")
+    for batch in _batches():
+        sequential.get_histograms(batch)
+
+    def slow_reader(batch):
+        time.sleep(0.01)  # network storage
+        return batch
+
+    pipeline = AsyncFillPipeline(PandasHistogrammar(features=FEATURES, binning="auto"), reader=slow_reader,
+                                 prefetch=2, workers=2)
+    hists = pipeline.fill(_batches())
+
+    assert sorted(hists) == sorted(sequential._hists)
+    for name, hist in hists.items():
+        assert hist.toJson() == sequential._hists[name].toJson()
+
+    monitor = pipeline.monitor
+    assert monitor.batches == 5
+    assert monitor.rows == len(pytest.test_df)
+    assert monitor.max_queue_size <= 2
+    assert monitor.read_seconds >= 0.05
+    assert monitor.bottleneck in ("reading", "filling")
+    assert "rows/s" in monitor.summary()
+
+
+def test_async_pipeline_async_source_and_errors():
+    async def source():
+        for batch in _batches(3):
+            await asyncio.sleep(0)
+            yield batch
+
+    pipeline = AsyncFillPipeline(PandasHistogrammar(features=["age"], bin_specs={"age": {"binWidth": 5}}))
+    hists = pipeline.fill(source())
+    assert hists["age"].entries == len(pytest.test_df)
+
+    assert AsyncFillPipeline(PandasHistogrammar(features=["age"])).fill([]) == {}
+
+    def failing_reader(item):
+        raise IOError("unreachable storage")
+
+    with pytest.raises(IOError):
+        AsyncFillPipeline(PandasHistogrammar(features=["age"]), reader=failing_reader).fill(["a", "b"])
+    # a failing fill worker stops the reader instead of leaving it blocked on the full queue
+    batches = _batches(6)
+    batches[3] = batches[3].drop(columns=["age"])
+    with pytest.raises(KeyError):
+        AsyncFillPipeline(PandasHistogrammar(features=["age"]), prefetch=1).fill(batches)
+    with pytest.raises(ValueError):
+        AsyncFillPipeline(PandasHistogrammar(), prefetch=0)
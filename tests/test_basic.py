@@ -19,7 +19,7 @@ import pickle
 import sys
 import unittest
 
-from histogrammar.defs import Factory
+from histogrammar.defs import Factory, identity
 from histogrammar.primitives.average import Average
 from histogrammar.primitives.bag import Bag
 from histogrammar.primitives.bin import Bin
@@ -187,6 +187,7 @@ class TestBasic(unittest.TestCase):
         self.testIndex()
         self.testIndexDifferentCuts()
         self.testBranch()
+        self.testPickleOutOfBand()
         # self.testAggregate()
 
     # Count
@@ -1230,3 +1231,40 @@ class TestBasic(unittest.TestCase):
         self.checkJson(branching)
         self.checkPickle(branching)
         self.checkName(branching)
+
+    # Pickling
+
+    def _pickleFilled(self):
+        binning = Bin(5, -3.0, 7.0, lambda x: x)
+        sparse = SparselyBin(1.0, lambda x: x)
+        categorizing = Categorize(lambda x: x.string)
+        for _ in self.simple:
+            binning.fill(_)
+            sparse.fill(_)
+        for _ in self.struct:
+            categorizing.fill(_)
+        return binning, sparse, categorizing
+
+    def testPickleInBand(self):
+        for protocol in range(2, pickle.HIGHEST_PROTOCOL + 1):
+            for x in self._pickleFilled():
+                y = pickle.loads(pickle.dumps(x, protocol=protocol))
+                self.assertEqual(y, x)
+                self.assertTrue(all(v.transform is identity for v in y.values))
+
+        # rebuilt functions are shared between unpickled containers
+        binning = self._pickleFilled()[0]
+        one = pickle.loads(pickle.dumps(binning))
+        two = pickle.loads(pickle.dumps(binning))
+        self.assertIs(one.quantity, two.quantity)
+
+    @unittest.skipIf(pickle.HIGHEST_PROTOCOL < 5, "out-of-band pickle buffers need Python 3.8+")
+    def testPickleOutOfBand(self):
+        for x in self._pickleFilled():
+            buffers = []
+            data = pickle.dumps(x, protocol=5, buffer_callback=buffers.append)
+            self.assertGreater(len(buffers), 0)
+            y = pickle.loads(data, buffers=buffers)
+            self.assertEqual(y, x)
+            self.assertTrue(all(v.transform is identity for v in y.values))
+            self.checkPickle(x)
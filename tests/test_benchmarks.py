@@ -0,0 +1,42 @@
+import copy
+import importlib.machinery
+import importlib.util
+import os
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fill_throughput.py")
+
+
+def _load():
+    loader = importlib.machinery.SourceFileLoader("fill_throughput", SCRIPT)
+    module = importlib.util.module_from_spec(importlib.util.spec_from_loader("fill_throughput", loader))
+    loader.exec_module(module)
+    return module
+
+
+def test_generated_data():
+    bench = _load()
+    data = bench.generate_data(1000, seed=1)
+    assert len(data) == 1000
+    assert data["x"].isnull().any()
+    assert data["cat"].nunique() <= 10
+    assert data["hicard"].nunique() > 100
+    assert str(data["ts"].dtype) == "datetime64[ns]"
+    assert (data["ts_ns"] == data["ts"].astype("int64")).all()
+
+
+def test_run_and_compare():
+    bench = _load()
+    assert len(bench.cases(["fill", "numpy", "pandas"])) == 2 * (len(bench.PRIMITIVES) + len(bench.NESTINGS)) + \
+        len(bench.FEATURES)
+    results = bench.run(rows=500, fill_rows=50, repeat=1, modes=["fill", "numpy", "pandas"],
+                        pattern="^(Bin:Bin|Categorize|Index|numeric)$")
+    assert [(r["mode"], r["case"]) for r in results["results"]][:4] == [
+        ("fill", "Categorize"), ("fill", "Index"), ("fill", "Bin:Bin"), ("numpy", "Categorize")]
+    assert all(r["rows_per_sec"] > 0 and r["peak_rss_mb"] > 0 for r in results["results"])
+    assert results["meta"]["rows"] == 500
+
+    assert not any(row["slower"] or row["larger"] for row in bench.compare(results, results))
+    slower = copy.deepcopy(results)
+    slower["results"][0]["rows_per_sec"] *= 0.5
+    rows = bench.compare(results, slower, tolerance=0.1)
+    assert [row["slower"] for row in rows] == [True] + [False] * (len(rows) - 1)
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+import histogrammar as hg
+from histogrammar.util import SortedBinIndex, binIndex, invalidateContents
+
+
+def _x():
+    rng = np.random.default_rng(11)
+    return rng.normal(size=20000) * 10
+
+
+def _old_sparse_entries(h, low=None, high=None, xvalues=()):
+    # the former list-based implementation of SparselyBin.bin_entries
+    if len(xvalues) > 0:
+        return np.array([h.bins[h.bin(x)].entries if h.bin(x) in h.bins else 0.0 for x in xvalues])
+    minBin = min(h.bins) if low is None else h.bin(low)
+    if high is None:
+        maxBin = max(h.bins)
+    else:
+        maxBin = h.bin(high)
+        if np.isclose(high, h.origin + h.bin_width() * maxBin):
+            maxBin -= 1
+    return np.array([h.bins[i].entries if i in h.bins else 0.0 for i in range(minBin, maxBin + 1)])
+
+
+def test_sparselybin_queries():
+    h = hg.SparselyBin(0.5, "x")
+    h.fill.numpy({"x": _x()})
+    xvalues = np.array([-100.0, -3.3, 0.0, 0.25, 7.5, np.nan, np.inf, -np.inf])
+    assert np.array_equal(h.bin_entries(), _old_sparse_entries(h))
+    assert np.array_equal(h.bin_entries(-3.2, 7.0), _old_sparse_entries(h, -3.2, 7.0))
+    assert np.array_equal(h.bin_entries(xvalues=xvalues), _old_sparse_entries(h, xvalues=xvalues))
+    assert list(h.bins_of(xvalues)) == [h.bin(x) for x in xvalues]
+    assert (h.minBin, h.maxBin) == (min(h.bins), max(h.bins))
+
+    cumulative = h.bin_cumulative_entries()
+    assert np.allclose(cumulative, np.cumsum(h.bin_entries()))
+    assert cumulative[-1] == h.entries
+    partial = h.bin_cumulative_entries(-3.2, 7.0)
+    assert len(partial) == len(h.bin_entries(-3.2, 7.0))
+    assert partial[-1] == sum(v.entries for i, v in h.bins.items() if i <= h.bin(6.99))
+
+
+def test_bin_queries():
+    h = hg.Bin(40, -20, 20, "x")
+    h.fill.numpy({"x": _x()})
+    xvalues = np.array([-25.0, -20.0, -0.5, 0.0, 19.999, 20.0, np.nan])
+    expected = [h.values[h.bin(x)].entries if h.bin(x) >= 0 else 0.0 for x in xvalues]
+    assert np.array_equal(h.bin_entries(xvalues=xvalues), expected)
+    assert np.array_equal(h.bin_entries(), [v.entries for v in h.values])
+    assert np.array_equal(h.bin_entries(-5, 5), [v.entries for v in h.values[15:25]])
+
+
+def test_categorize_queries():
+    h = hg.Categorize("c")
+    h.fill.numpy(pd.DataFrame({"c": ["b", "a", "b", "c", "a", "b"]}))
+    assert list(h.bin_entries()) == [v.entries for v in h.bins.values()]
+    assert list(h.bin_entries(["a", "d", "b"])) == [2.0, 0.0, 3.0]
+
+    mixed = hg.Categorize("c")
+    for c in [True, "x", "x"]:
+        mixed.fill({"c": c})
+    assert list(mixed.bin_entries(["x", True, False])) == [2.0, 1.0, 0.0]
+
+
+def test_index_cached_until_filled():
+    h = hg.SparselyBin(1.0, "x")
+    h.fill.numpy({"x": np.array([1.0, 2.0, 2.5])})
+    index = binIndex(h)
+    assert binIndex(h) is index
+    assert list(index.keys) == [1, 2] and list(index.entries) == [1.0, 2.0]
+    h.fill({"x": 5.0})
+    assert binIndex(h) is not index
+    assert list(h.bin_entries()) == [1.0, 2.0, 0.0, 0.0, 1.0]
+
+
+def test_index_refreshed_without_change_of_entries():
+    # same entries and number of bins before and after, but different contents
+    h = hg.SparselyBin(1.0, "x")
+    h.fill.numpy({"x": np.array([1.0, 2.0, 2.5])})
+    assert list(h.bin_entries()) == [1.0, 2.0]
+    index = binIndex(h)
+    h += h.zero()
+    assert binIndex(h) is not index
+
+    h.bins[1], h.bins[2] = h.bins[2], h.bins[1]
+    invalidateContents(h)
+    assert list(h.bin_entries()) == [2.0, 1.0]
+    assert h.quantile(0.5) == 1.75
+
+    empty = SortedBinIndex.fromBins({})
+    assert len(empty) == 0 and list(empty.lookup([1, 2])) == [0.0, 0.0]
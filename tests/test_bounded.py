@@ -0,0 +1,173 @@
+import pickle
+
+import numpy as np
+import pytest
+
+import histogrammar as hg
+from histogrammar.defs import ContainerException
+
+
+def _data():
+    rng = np.random.default_rng(7)
+    # a narrow peak on top of a wide, high-cardinality background
+    return np.concatenate([rng.normal(0.0, 1.0, 20000), rng.uniform(-1e6, 1e6, 3000), [np.nan] * 10])
+
+
+def _accounted(h):
+    return sum(v.entries for v in h.bins.values()) + h.evicted
+
+
+def test_sparselybin_numpy_keeps_heavy_bins():
+    x = _data()
+    bounded = hg.SparselyBin(0.1, "x", maxBins=100)
+    for chunk in np.array_split(x, 10):
+        bounded.fill.numpy({"x": chunk})
+    full = hg.SparselyBin(0.1, "x")
+    full.fill.numpy({"x": x})
+
+    assert len(bounded.bins) <= 100
+    assert bounded.entries == full.entries
+    assert bounded.nanflow.entries == 10
+    assert _accounted(bounded) + bounded.nanflow.entries == bounded.entries
+    heaviest = sorted(full.bins.items(), key=lambda kv: -kv[1].entries)[:30]
+    for index, v in heaviest:
+        assert bounded.bins[index].entries == v.entries
+
+
+def test_sparselybin_fill_and_weights():
+    x = _data()[:5000]
+    bounded = hg.SparselyBin(0.1, "x", hg.Average("x"), maxBins=20)
+    for xi in x:
+        bounded.fill({"x": xi}, 2.0)
+    assert len(bounded.bins) <= 20
+    assert bounded.entries == 2.0 * len(x)
+    assert _accounted(bounded) + bounded.nanflow.entries == bounded.entries
+
+    unbounded = hg.SparselyBin(0.1, "x", hg.Average("x"))
+    unbounded.fill.numpy({"x": x})
+    assert unbounded.maxBins is None and unbounded.evicted == 0.0
+
+
+def test_categorize():
+    cats = np.array(["a"] * 1000 + ["b"] * 500 + [str(i) for i in range(3000)])
+    bounded = hg.Categorize("c", maxBins=20)
+    bounded.fill.numpy({"c": cats[:2000]})
+    bounded.fill.numpy({"c": cats[2000:]})
+    for c in cats[:100]:
+        bounded.fill({"c": c})
+    assert len(bounded.bins) <= 20
+    assert bounded.bins["a"].entries == 1100
+    assert bounded.bins["b"].entries == 500
+    assert _accounted(bounded) == bounded.entries == len(cats) + 100
+
+    weighted = hg.Categorize("c", hg.Count(), maxBins=20)
+    weighted.fill.numpy({"c": cats}, weights=np.full(len(cats), 0.5))
+    assert _accounted(weighted) == weighted.entries == 0.5 * len(cats)
+
+
+def test_combine_and_serialize():
+    x = _data()
+    one = hg.SparselyBin(0.1, "x", maxBins=50)
+    one.fill.numpy({"x": x[::2]})
+    two = hg.SparselyBin(0.1, "x")
+    two.fill.numpy({"x": x[1::2]})
+
+    total = one + two
+    assert total.maxBins == 50 and len(total.bins) <= 50
+    assert total.entries == one.entries + two.entries
+    assert _accounted(total) + total.nanflow.entries == total.entries
+    one += two
+    assert one == total and one.evicted == total.evicted
+    assert (total * 2.0).evicted == 2.0 * total.evicted
+
+    # normal JSON format: the cap and the evicted weight are not part of it
+    assert hg.Factory.fromJson(total.toJson()).toJson() == total.toJson()
+    assert "maxBins" not in str(total.toJson())
+
+    unpickled = pickle.loads(pickle.dumps(total))
+    assert unpickled == total
+    assert (unpickled.maxBins, unpickled.evicted) == (total.maxBins, total.evicted)
+
+
+def _failing(data):
+    if data["fail"].any():
+        raise ValueError("bad data")
+    return data["y"]
+
+
+@pytest.mark.parametrize("make", [
+    lambda: hg.SparselyBin(1.0, "x", hg.Sum(_failing), maxBins=2),
+    lambda: hg.Categorize("c", hg.Sum(_failing), maxBins=2),
+])
+def test_failed_batch_evicts_nothing(make):
+    h = make()
+    h.fill.numpy({"x": np.array([0.5, 1.5]), "c": np.array(["a", "b"]), "y": np.ones(2), "fail": np.zeros(2, bool)})
+    before = h.toJson()
+    with pytest.raises(ValueError):
+        h.fill.numpy({"x": np.array([5.5] * 3), "c": np.array(["z"] * 3), "y": np.ones(3), "fail": np.ones(3, bool)})
+    assert h.toJson() == before and h.evicted == 0.0
+
+
+def test_invalid_max_bins():
+    with pytest.raises(ValueError):
+        hg.SparselyBin(1.0, "x", maxBins=0)
+    with pytest.raises(ValueError):
+        hg.Categorize("x", maxBins=2.5)
+
+
+def test_coarsen_matches_refilling():
+    x = _data()
+    fine = hg.SparselyBin(0.1, "x", hg.Deviate("x"), origin=0.05)
+    fine.fill.numpy({"x": x})
+    coarse = hg.SparselyBin(0.4, "x", hg.Deviate("x"), origin=0.05)
+    coarse.fill.numpy({"x": x})
+
+    assert fine.coarsen(4) is fine
+    assert fine.binWidth == 0.4 and fine.origin == 0.05
+    assert fine.keySet == coarse.keySet
+    for i, v in coarse.bins.items():
+        assert fine.bins[i].entries == v.entries
+        assert fine.bins[i].mean == pytest.approx(v.mean)
+    assert fine.entries == coarse.entries
+
+    with pytest.raises(ValueError):
+        fine.coarsen(1.5)
+
+
+def test_automatic_coarsening():
+    x = _data()[:20000]
+    auto = hg.SparselyBin(0.01, "x", coarsenAbove=64)
+    for chunk in np.array_split(x, 4):
+        auto.fill.numpy({"x": chunk})
+    assert len(auto.bins) <= 64
+    reference = hg.SparselyBin(auto.binWidth, "x")
+    reference.fill.numpy({"x": x})
+    assert auto.bins == reference.bins
+
+    scalar = hg.SparselyBin(0.01, "x", coarsenAbove=64)
+    for xi in x[:2000]:
+        scalar.fill({"x": xi})
+    assert len(scalar.bins) <= 64 and scalar.entries == 2000
+
+    # infinite quantities and the bins -1 and 0 can't be merged further
+    edge = hg.SparselyBin(1.0, "x", coarsenAbove=1)
+    edge.fill.numpy({"x": np.array([-np.inf, np.inf, -5.0, 7.0])})
+    assert len(edge.bins) == 4
+
+
+def test_add_coarsens_finer_operand():
+    x = _data()[:20000]
+    auto = hg.SparselyBin(0.01, "x", coarsenAbove=64)
+    auto.fill.numpy({"x": x})
+    few = hg.SparselyBin(0.01, "x", coarsenAbove=64)
+    few.fill.numpy({"x": x[:10]})
+    assert few.binWidth < auto.binWidth
+
+    total = few + auto
+    assert total.binWidth == auto.binWidth and total.entries == 20010
+    assert few.binWidth == 0.01
+    few += auto
+    assert few == total
+
+    with pytest.raises(ContainerException):
+        hg.SparselyBin(0.01, "x") + hg.SparselyBin(0.02, "x")
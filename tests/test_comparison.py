@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import histogrammar as hg
+from histogrammar.comparison import align, compare, compare_many
+
+
+def _pair(shift=0.0):
+    rng = np.random.default_rng(5)
+    h1 = hg.SparselyBin(0.5, "x")
+    h1.fill.numpy({"x": rng.normal(size=5000)})
+    h2 = hg.SparselyBin(0.5, "x")
+    h2.fill.numpy({"x": rng.normal(loc=shift, size=2000)})
+    return h1, h2
+
+
+def _loop_statistics(h1, h2, epsilon=1e-4):
+    # reference: align with dicts and compute every statistic bin by bin
+    keys = sorted(set(h1.bins) | set(h2.bins))
+    n1 = [h1.bins[k].entries if k in h1.bins else 0.0 for k in keys]
+    n2 = [h2.bins[k].entries if k in h2.bins else 0.0 for k in keys]
+    t1, t2 = sum(n1), sum(n2)
+    chi2 = sum((t2 * a - t1 * b) ** 2 / (t1 * t2 * (a + b)) for a, b in zip(n1, n2) if a + b > 0)
+    ks, c1, c2, psi, js = 0.0, 0.0, 0.0, 0.0, 0.0
+    for a, b in zip(n1, n2):
+        c1, c2 = c1 + a / t1, c2 + b / t2
+        ks = max(ks, abs(c1 - c2))
+        p, q = max(a / t1, epsilon), max(b / t2, epsilon)
+        psi += (p - q) * np.log(p / q)
+        m = 0.5 * (a / t1 + b / t2)
+        js += sum(0.5 * r * np.log2(r / m) for r in (a / t1, b / t2) if r > 0)
+    return {"chi2": chi2, "ndof": len(keys) - 1, "ks": ks, "psi": psi, "js": js}
+
+
+def test_compare_matches_loop():
+    h1, h2 = _pair(shift=0.3)
+    result = compare(h1, h2)
+    expected = _loop_statistics(h1, h2)
+    assert set(result) == set(expected)
+    for name, value in expected.items():
+        assert result[name] == pytest.approx(value)
+
+    same = compare(h1, h1)
+    assert same["chi2"] == 0.0 and same["ks"] == 0.0 and same["psi"] == 0.0 and same["js"] == 0.0
+
+
+def test_compare_many_matches_single():
+    pairs = [_pair(shift) for shift in (0.0, 0.2, 1.0)]
+    pairs.append((hg.SparselyBin(0.5, "x"), pairs[0][1]))
+    batch = compare_many(pairs)
+    for i, (h1, h2) in enumerate(pairs[:3]):
+        single = compare(h1, h2)
+        for name, value in single.items():
+            assert batch[name][i] == pytest.approx(value)
+    assert batch["psi"][1] < batch["psi"][2]
+    assert np.isnan(batch["chi2"][3]) and np.isnan(batch["js"][3])
+    assert set(compare_many(pairs, statistics=["ks"])) == {"ks"}
+
+
+def test_alignment():
+    h1 = hg.Categorize("c")
+    h1.fill.numpy(pd.DataFrame({"c": ["a", "b", "b"]}))
+    h2 = hg.Categorize("c")
+    h2.fill.numpy(pd.DataFrame({"c": ["c", "b"]}))
+    keys, e1, e2 = align(h1, h2)
+    assert list(keys) == ["a", "b", "c"]
+    assert list(e1) == [1.0, 2.0, 0.0] and list(e2) == [0.0, 1.0, 1.0]
+
+    b1, b2 = hg.Bin(4, 0, 1, "x"), hg.Bin(4, 0, 1, "x")
+    b1.fill.numpy({"x": np.array([0.1, 0.6])})
+    assert list(align(b1, b2)[1]) == [1.0, 0.0, 1.0, 0.0]
+    with pytest.raises(ValueError):
+        align(b1, hg.Bin(5, 0, 1, "x"))
+    with pytest.raises(ValueError):
+        compare(b1, b2, statistics=["t-test"])
+    with pytest.raises(TypeError):
+        align(hg.Count(), hg.Count())
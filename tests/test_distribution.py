@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+import histogrammar as hg
+from histogrammar.util import binnedDistribution
+
+EDGES = list(np.linspace(-5, 5, 201))
+
+
+def _x():
+    return np.random.default_rng(2).normal(size=50000)
+
+
+@pytest.mark.parametrize("hist", [
+    hg.Bin(200, -5, 5, "x"), hg.SparselyBin(0.05, "x"), hg.IrregularlyBin(EDGES, "x"), hg.CentrallyBin(EDGES, "x"),
+    hg.Stack(EDGES, "x")], ids=lambda h: h.name)
+def test_quantiles_match_data(hist):
+    x = _x()
+    hist.fill.numpy({"x": x})
+    q = np.array([0.01, 0.1, 0.5, 0.9, 0.99])
+    assert np.allclose(hist.quantile(q), np.quantile(x, q), atol=0.02)
+    assert np.isscalar(hist.quantile(0.5))
+    assert hist.cdf([0.0]) == pytest.approx(np.mean(x < 0.0), abs=0.01)
+    cdf = hist.cdf()
+    assert np.all(np.diff(cdf) >= 0) and cdf[-1] == pytest.approx(1.0)
+    assert hist.pdf().max() == pytest.approx(1 / np.sqrt(2 * np.pi), rel=0.05)
+    with pytest.raises(ValueError):
+        hist.quantile(1.5)
+
+
+def test_quantile_interpolation():
+    h = hg.Bin(4, 0, 4, "x")
+    h.fill.numpy({"x": np.array([0.5, 2.5, 2.5, 3.5])})
+    # entries [1, 0, 2, 1]: the empty bin is skipped
+    assert list(h.quantile([0.0, 0.25, 0.5, 0.75, 1.0])) == [0.0, 1.0, 2.5, 3.0, 4.0]
+    assert list(h.cdf()) == [0.25, 0.25, 0.75, 1.0]
+    assert list(h.cdf([-1.0, 0.5, 2.5, 10.0])) == [0.0, 0.125, 0.5, 1.0]
+    assert list(h.pdf()) == [0.25, 0.0, 0.5, 0.25]
+
+    irregular = hg.IrregularlyBin([0.0, 1.0], "x")
+    irregular.fill.numpy({"x": np.array([-10.0, 0.5, 20.0])})
+    # entries in the infinite outer bins are put at their finite edge
+    assert list(irregular.quantile([0.0, 0.5, 1.0])) == [0.0, 0.5, 1.0]
+    assert list(irregular.pdf()) == [0.0, 1 / 3, 0.0]
+
+    empty = hg.SparselyBin(1.0, "x")
+    assert np.isnan(empty.quantile(0.5)) and len(empty.cdf()) == 0 and len(empty.pdf()) == 0
+
+
+def test_distribution_cached_until_filled():
+    h = hg.SparselyBin(1.0, "x")
+    h.fill.numpy({"x": np.arange(10.0)})
+    distribution = binnedDistribution(h)
+    assert binnedDistribution(h) is distribution
+    assert h.quantile(1.0) == 10.0
+    h.fill({"x": 19.5})
+    assert binnedDistribution(h) is not distribution
+    assert h.quantile(1.0) == 20.0
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+import histogrammar as hg
+from histogrammar.plot.hist_numpy import downsample_sparse
+
+
+def _hist(special=False):
+    rng = np.random.default_rng(4)
+    h = hg.SparselyBin(0.5, "x", origin=0.25)
+    h.fill.numpy({"x": rng.exponential(20.0, 5000)})
+    if special:
+        h.fill.numpy({"x": np.array([np.nan, np.inf, -np.inf])})
+    return h
+
+
+@pytest.mark.parametrize("max_points,low,high", [(7, None, None), (100, None, None), (10000, None, None),
+                                                 (13, 5.0, 40.0), (3, 100.0, 110.0)])
+def test_downsample_matches_dense_rebinning(max_points, low, high):
+    h = _hist()
+    edges, sums, mins, maxs = downsample_sparse(h, max_points, low, high)
+    assert len(sums) <= max_points and len(edges) == len(sums) + 1
+
+    # reference: dense entries of all bins in the range, grouped into buckets
+    first, last = h.bin(edges[0] + 0.1 * h.binWidth), h.bin(edges[-1] - 0.1 * h.binWidth)
+    dense = np.array([h.bins[i].entries if i in h.bins else 0.0 for i in range(first, last + 1)])
+    factor = int(round((edges[1] - edges[0]) / h.binWidth))
+    groups = [dense[i:i + factor] for i in range(0, len(dense), factor)]
+    assert np.array_equal(sums, [g.sum() for g in groups])
+    assert np.array_equal(mins, [g.min() for g in groups])
+    assert np.array_equal(maxs, [g.max() for g in groups])
+    if low is None:
+        assert (edges[0], edges[-1]) == (h.low, h.high)
+        assert sums.sum() == h.entries
+
+
+def test_downsample_skips_infinite_and_nan():
+    h, special = _hist(), _hist(special=True)
+    for a, b in zip(downsample_sparse(h, 50), downsample_sparse(special, 50)):
+        assert np.array_equal(a, b)
+
+
+def test_downsample_empty():
+    edges, sums, _, _ = downsample_sparse(hg.SparselyBin(1.0, "x"), 10)
+    assert len(edges) == 1 and len(sums) == 0
+    with pytest.raises(ValueError):
+        downsample_sparse(_hist(), 0)
+
+
+def test_matplotlib_level_of_detail():
+    pytest.importorskip("matplotlib")
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    rng = np.random.default_rng(0)
+    h = hg.SparselyHistogram(1.0, "t")
+    h.fill.numpy({"t": rng.integers(0, 10 ** 9, 10000).astype(float)})
+    ax = h.plot.matplotlib("timestamps", max_points=200)
+    steps = ax.patches[0]
+    assert len(steps.get_data().values) <= 200
+    ax.set_xlim(1e8, 1e8 + 150)
+    # zoomed in far enough: the bins themselves
+    assert np.array_equal(steps.get_data().edges, np.arange(1e8, 1e8 + 151))
+    plt.close("all")
+
+    small = hg.SparselyHistogram(1.0, "t")
+    small.fill.numpy({"t": np.arange(10.0)})
+    assert len(small.plot.matplotlib(max_points=200).patches) == 10
+    plt.close("all")
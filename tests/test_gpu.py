@@ -73,6 +73,8 @@ class TestGPU(unittest.TestCase):
         self.testUntypedLabel()
         self.testIndex()
         self.testBranch()
+        self.testDeterministicSource()
+        self.testOtherContext()
 
     SIZE = 10000
     HOLES = 100
@@ -435,3 +437,32 @@ class TestGPU(unittest.TestCase):
                 Bin(100, -3.0, 3.0, named("withholes", lambda x: x)), Bin(50, -3.0, 3.0, named("withholes", lambda x: x))), self.withholes)
             self.compare("BranchBin deeply different structs holes", Branch(Bin(100, -3.0, 3.0, "withholes"), Bin(100, -3.0, 3.0, "withholes", Sum("withholes"))), Branch(
                 Bin(100, -3.0, 3.0, named("withholes", lambda x: x)), Bin(100, -3.0, 3.0, named("withholes", lambda x: x), Sum(named("withholes", lambda x: x)))), self.withholes)
+
+    def testDeterministicSource(self):
+        # fillpycuda caches compiled modules by source, so identical aggregators must generate identical source
+        def source(aggregator):
+            return aggregator.cuda(namespace=False, namespaceName="HistogrammarCUDA", writeSize=True,
+                                   testData=[0.0] * 10, timestamp=False)
+        one = Branch(Bin(10, 0.0, 1.0, "x"), Average("y"))
+        two = Branch(Bin(10, 0.0, 1.0, "x"), Average("y"))
+        self.assertEqual(source(one), source(two))
+        self.assertNotEqual(source(one), source(Branch(Bin(20, 0.0, 1.0, "x"), Average("y"))))
+        self.assertNotIn("Auto-generated on", source(one))
+        self.assertIn("Auto-generated on", one.cuda())
+
+    def testOtherContext(self):
+        # compiled modules are cached per context: a second context must compile and load its own
+        if self.numpy is not None:
+            import pycuda.driver
+            expected = Sum("x")
+            for x in xrange(10):
+                expected.fill(x)
+            Sum("x").fill.pycuda(x=self.numpy.array(range(10)))
+            context = pycuda.driver.Context.get_device().make_context()
+            try:
+                aggregator = Sum("x")
+                aggregator.fill.pycuda(x=self.numpy.array(range(10)))
+                self.assertEqual(aggregator, expected)
+            finally:
+                context.pop()
+                context.detach()
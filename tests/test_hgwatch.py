@@ -0,0 +1,76 @@
+import importlib.machinery
+import importlib.util
+import io
+import json
+import os
+
+import histogrammar as hg
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "hgwatch")
+
+
+def _load():
+    loader = importlib.machinery.SourceFileLoader("hgwatch", SCRIPT)
+    module = importlib.util.module_from_spec(importlib.util.spec_from_loader("hgwatch", loader))
+    loader.exec_module(module)
+    return module
+
+
+def _watch(lines, deltas=False, fps=0.0):
+    hgwatch = _load()
+    seen = []
+    hgwatch.record = seen.append
+    watcher = hgwatch.Watcher()
+    watcher.daemon = True
+    watcher.start(io.StringIO("".join(line + "\n" for line in lines)), "record(hg.entries)", deltas, fps)
+    watcher.redraw()
+    return hgwatch, seen
+
+
+def _filled(n):
+    h = hg.Bin(10, 0, 1, "x")
+    for i in range(n):
+        h.fill({"x": i / 10.0})
+    return h
+
+
+def test_deltas_are_merged():
+    lines = [json.dumps(_filled(3).toJson())]
+    lines += [json.dumps({"delta": _filled(2).toJson()}) for _ in range(5)]
+    hgwatch, seen = _watch(lines)
+    assert hgwatch.hg.entries == 13
+    assert hgwatch.hg.toJson() == (_filled(3) + _filled(2) * 5).toJson()
+    assert seen[-1] == 13
+    assert hgwatch.hgerr is None
+
+    hgwatch, seen = _watch([json.dumps(_filled(2).toJson())] * 4, deltas=True)
+    assert hgwatch.hg.entries == 8
+
+
+def test_snapshot_replaces_and_errors_are_kept():
+    lines = [json.dumps(_filled(3).toJson()), "not json", json.dumps(_filled(7).toJson())]
+    hgwatch, seen = _watch(lines)
+    assert hgwatch.hg.entries == 7
+    assert isinstance(hgwatch.hgerr, ValueError)
+
+
+def test_every_document_by_default():
+    lines = [json.dumps(_filled(n).toJson()) for n in (3, 5, 2)] + [json.dumps({"delta": _filled(1).toJson()})] * 2
+    hgwatch = _load()
+    seen = []
+    hgwatch.record = seen.append
+    watcher = hgwatch.Watcher()
+    watcher.daemon = True
+    watcher.start(io.StringIO("".join(line + "\n" for line in lines)),
+                  "record((hg.entries, hgin == json.dumps(hg.toJson()) + '\\n'))")
+    watcher.redraw()
+    assert seen == [(3, True), (5, True), (2, True), (3, False), (4, False)]
+    assert hgwatch.hgin == lines[-1] + "\n"
+
+
+def test_redraws_are_throttled():
+    lines = [json.dumps({"delta": _filled(1).toJson()}) for _ in range(200)]
+    hgwatch, seen = _watch(lines, fps=5.0)
+    # all deltas are applied, with fewer runs of the commands than documents
+    assert hgwatch.hg.entries == 200
+    assert seen[-1] == 200 and len(seen) < 200
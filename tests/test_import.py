@@ -0,0 +1,41 @@
+import subprocess
+import sys
+
+
+def _run(code):
+    return subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout.split()
+
+
+def test_import_is_lazy():
+    loaded = _run(
+        "import sys, histogrammar; "
+        "print(*[m for m in ('matplotlib', 'bokeh', 'histogrammar.pycparser', 'histogrammar.plot') "
+        "if m in sys.modules])"
+    )
+    assert loaded == []
+
+
+def test_dataframe_methods():
+    # added on import, whether pandas is imported before or after histogrammar
+    assert _run("import pandas, histogrammar; print(hasattr(pandas.DataFrame, 'hg_make_histograms'))") == ["True"]
+    assert _run("import histogrammar, pandas; print(hasattr(pandas.DataFrame, 'hg_make_histograms'))") == ["True"]
+
+
+def test_import_system_unchanged():
+    # pandas is imported first: its dependencies may add their own finders
+    assert _run("import sys, pandas; finders = list(sys.meta_path); import histogrammar; "
+                "print(sys.meta_path == finders)") == ["True"]
+
+
+def test_lazy_attributes():
+    import histogrammar as hg
+
+    assert hg.HistogramStore.__module__ == "histogrammar.store"
+    assert hg.dfinterface.__name__ == "histogrammar.dfinterface"
+    assert "HistogramStore" in dir(hg)
+    try:
+        hg.DoesNotExist
+    except AttributeError:
+        pass
+    else:
+        assert False, "expected AttributeError"
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+import histogrammar as hg
+from histogrammar import util
+from histogrammar.dfinterface.make_histograms import get_bin_specs
+
+
+def _count_calls(monkeypatch, name):
+    calls = []
+    original = getattr(util, name)
+
+    def counting(*args):
+        calls.append(args)
+        return original(*args)
+    monkeypatch.setattr(util, name, counting)
+    return calls
+
+
+def test_n_dim_computed_once(monkeypatch):
+    h = hg.Categorize("a", hg.SparselyBin(1.0, "b", hg.Bin(5, 0, 1, "c")))
+    h.fill.numpy(pd.DataFrame({"a": ["x", "y"], "b": [1.0, 2.0], "c": [0.5, 0.5]}))
+    calls = _count_calls(monkeypatch, "get_n_dim")
+    assert h.n_dim == 3
+    assert len(calls) > 0
+    del calls[:]
+    assert h.n_dim == 3
+    assert len(calls) == 0
+
+
+def test_datatype_follows_contents():
+    h = hg.Categorize("a")
+    assert h.datatype is str
+    h.fill.numpy({"a": np.array([True, False])})
+    assert h.datatype is np.bool_
+
+    # new keys without new entries
+    h = hg.Categorize("a")
+    assert h.datatype is str
+    h += hg.Categorize.ed(0.0, "Count", {True: hg.Count.ed(0.0)})
+    assert h.datatype is np.bool_
+
+
+def test_unknown_structure_is_not_cached():
+    # empty containers read from JSON have no template for their bins: their structure is known once they are filled
+    empty = hg.Factory.fromJson(hg.SparselyBin(1.0, "x", hg.Bin(5, 0, 1, "y")).toJson())
+    assert empty.n_dim == 1
+    filled = hg.SparselyBin(1.0, "x", hg.Bin(5, 0, 1, "y"))
+    filled.fill({"x": 1.5, "y": 0.5})
+    empty += filled
+    assert empty.n_dim == 2
+
+
+def test_coarsen_invalidates_bin_specs():
+    h = hg.SparselyBin(1.0, "x", origin=0.5)
+    h.fill.numpy({"x": np.arange(10.0)})
+    assert get_bin_specs(h) == {"binWidth": 1.0, "origin": 0.5}
+    get_bin_specs(h)["binWidth"] = 5.0
+    assert get_bin_specs(h)["binWidth"] == 1.0
+    h.coarsen(2)
+    assert get_bin_specs(h) == {"binWidth": 2.0, "origin": 0.5}
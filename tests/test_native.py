@@ -0,0 +1,76 @@
+import shutil
+
+import numpy as np
+import pytest
+
+import histogrammar as hg
+from histogrammar import native, util
+
+pytestmark = pytest.mark.skipif(shutil.which(native.compiler) is None, reason="no C++ compiler")
+
+
+class Datum(dict):
+    __getattr__ = dict.__getitem__
+
+
+def _make():
+    return hg.Branch(
+        hg.Bin(20, -3.0, 3.0, "x", hg.Deviate("y")),
+        hg.IrregularlyBin([0.0, 1.0], "x"),
+        hg.Select("x > 0", hg.Sum("y")),
+        hg.Fraction("x > 0.5", hg.Count()),
+        hg.Stack([0.0, 1.0], "x"),
+        hg.CentrallyBin([0.0, 1.0, 2.0], "x"),
+        hg.Minimize("x"),
+        hg.Maximize("y"),
+        hg.Label(a=hg.Average("x + y"), b=hg.Average("z")),
+    )
+
+
+def test_fill_native(tmp_path):
+    rng = np.random.default_rng(1)
+    x = rng.normal(size=1000)
+    y = rng.normal(size=1000)
+    x[::97] = np.nan
+    w = rng.uniform(-0.5, 1.0, size=1000)
+
+    h = _make()
+    h.fill.native(x=x, y=y, z="x * y", weights=w, cacheDir=str(tmp_path))
+    expected = _make()
+    for xi, yi, wi in zip(x.tolist(), y.tolist(), w.tolist()):
+        expected.fill(Datum(x=xi, y=yi, z=xi * yi), wi)
+    assert h == expected
+
+    # filling again accumulates, and reuses the compiled library
+    h.fill.native(x=x, y=y, z="x * y", weights=w, cacheDir=str(tmp_path))
+    assert h == expected + expected
+    assert len(list(tmp_path.glob("*.so"))) == 1
+
+
+def test_fill_native_errors(tmp_path):
+    # unknown identifiers are left to the compiler (they may be C functions or constants)
+    with pytest.raises(SyntaxError):
+        hg.Bin(10, 0.0, 1.0, "x").fill.native(y=np.zeros(3), cacheDir=str(tmp_path))
+    with pytest.raises(ValueError):
+        hg.Bin(10, 0.0, 1.0, "x").fill.native(x=np.zeros(3), weights=np.ones(2), cacheDir=str(tmp_path))
+    with pytest.raises(NotImplementedError):
+        hg.SparselyBin(1.0, "x").fill.native(x=np.zeros(3), cacheDir=str(tmp_path))
+
+
+def test_fill_openmp(tmp_path, monkeypatch):
+    # single precision, as on the GPU
+    monkeypatch.setattr(util, "relativeTolerance", 1e-4)
+    monkeypatch.setattr(util, "absoluteTolerance", 1e-4)
+    rng = np.random.default_rng(2)
+    x = rng.normal(size=1000).astype(np.float32)
+    y = rng.normal(size=1000).astype(np.float32)
+
+    h = _make()
+    h.fill.openmp(x=x, y=y, z="x * y", numThreads=3, cacheDir=str(tmp_path))
+    expected = _make()
+    for xi, yi in zip(x.tolist(), y.tolist()):
+        expected.fill(Datum(x=xi, y=yi, z=xi * yi))
+    assert h == expected
+
+    with pytest.raises(ValueError):
+        hg.Bin(10, 0.0, 1.0, "x").fill.openmp(y=np.zeros(3), cacheDir=str(tmp_path))
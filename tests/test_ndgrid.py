@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import histogrammar as hg
+from histogrammar.plot.hist_numpy import get_2dgrid, get_coogrid, get_ndgrid
+
+
+def _data(n=5000):
+    rng = np.random.default_rng(3)
+    return pd.DataFrame({"x": rng.normal(size=n), "y": rng.normal(size=n), "z": rng.normal(size=n),
+                         "c": rng.choice(["a", "b", "c"], n)})
+
+
+def _hist():
+    h = hg.Bin(10, -3, 3, "x", hg.SparselyBin(0.5, "y", hg.Categorize("c", hg.IrregularlyBin([-1, 0, 1], "z"))))
+    h.fill.numpy(_data())
+    return h
+
+
+def test_dense_grid_matches_bins():
+    h = _hist()
+    grid = get_ndgrid(h)
+    assert grid.n_dim == 4
+    assert grid.values.sum() == h.entries - h.underflow.entries - h.overflow.entries - h.nanflow.entries
+    assert list(grid.keys[0]) == list(range(10))
+    assert list(grid.labels[2]) == ["a", "b", "c"]
+    assert list(grid.labels[3]) == [-np.inf, -0.5, 0.5, np.inf]
+    assert grid.labels[1][0] == (grid.keys[1][0] + 0.5) * 0.5
+
+    i, j, k, m = 4, 3, 1, 2
+    ybin = h.values[i].bins[grid.keys[1][j]]
+    expected = ybin.bins[grid.keys[2][k]].bins[m][1].entries
+    assert grid.values[i, j, k, m] == expected
+
+    # fewer levels: deeper ones are summed
+    assert np.array_equal(get_ndgrid(h, n_dim=2).values, grid.values.sum(axis=(2, 3)))
+    with pytest.raises(ValueError):
+        get_ndgrid(h, n_dim=5)
+
+
+def test_projection_and_selection():
+    h = _hist()
+    grid = get_ndgrid(h)
+    projected = grid.project(2, 0)
+    assert projected.shape == (3, 10)
+    assert np.array_equal(projected.values, grid.values.sum(axis=(1, 3)).T)
+    assert list(projected.labels[0]) == ["a", "b", "c"]
+
+    selected = grid.select(1, low=-1.0, high=1.0)
+    assert list(selected.labels[1]) == [-0.75, -0.25, 0.25, 0.75]
+    assert selected.values.shape == (10, 4, 3, 4)
+    categories = grid.select(2, keys=["c", "a", "nonexistent"])
+    assert list(categories.keys[2]) == ["c", "a"]
+    assert np.array_equal(categories.values[:, :, 1], grid.values[:, :, 0])
+
+
+def test_sparse_grid():
+    h = _hist()
+    dense = get_ndgrid(h)
+    sparse = get_coogrid(h)
+    assert sparse.shape == dense.shape
+    assert len(sparse.values) < dense.values.size
+    assert np.array_equal(sparse.to_dense().values, dense.values)
+    assert np.array_equal(sparse.project(3, 1).to_dense().values, dense.project(3, 1).values)
+    assert np.array_equal(dense.to_coo().to_dense().values, dense.values)
+
+
+def test_2dgrid_unchanged():
+    h = hg.SparselyBin(0.2, "x", hg.Categorize("c"))
+    h.fill.numpy(_data())
+    x_labels, y_labels, grid = get_2dgrid(h)
+    nd = get_ndgrid(h)
+    assert np.array_equal(grid, nd.values.T)
+    assert y_labels == [str(c) for c in nd.labels[1]]
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+import histogrammar as hg
+from histogrammar import util
+
+
+class Datum(dict):
+    __getattr__ = dict.__getitem__
+
+
+def _make():
+    return hg.Branch(
+        hg.Bin(20, -3.0, 3.0, lambda d: d["x"], hg.Deviate(lambda d: d["y"])),
+        hg.IrregularlyBin([0.0, 1.0], lambda d: d["x"], hg.Sum(lambda d: d["y"])),
+        hg.SparselyBin(0.5, lambda d: d["y"], hg.Average(lambda d: d["x"])),
+        hg.Categorize(lambda d: d["c"], hg.Bin(5, -1.0, 1.0, lambda d: d["y"])),
+        hg.Select(lambda d: d["x"] > 0, hg.Sum(lambda d: d["y"])),
+        hg.Fraction(lambda d: d["x"] > 0.5, hg.Count()),
+        hg.Minimize(lambda d: d["x"]),
+        hg.Maximize(lambda d: d["y"]),
+        hg.UntypedLabel(a=hg.Average(lambda d: d["x"] + d["y"]), b=hg.Count()),
+    )
+
+
+def _data():
+    rng = np.random.default_rng(2)
+    x = rng.normal(size=500)
+    y = rng.normal(size=500)
+    x[::37] = np.nan
+    y[::53] = np.inf
+    c = rng.choice(["one", "two", "three"], size=500)
+    w = rng.uniform(-0.5, 1.0, size=500)
+    return {"x": x, "y": y, "c": c}, w
+
+
+def _expected(data, w, times=1):
+    expected = _make()
+    for _ in range(times):
+        for xi, yi, ci, wi in zip(data["x"].tolist(), data["y"].tolist(), data["c"].tolist(), w.tolist()):
+            expected.fill(Datum(x=xi, y=yi, c=ci), wi)
+    return expected
+
+
+def test_fill_numba_python_loop(monkeypatch):
+    data, w = _data()
+    h = _make()
+    h.fill.numba(data, w, jit=False)
+    assert h == _expected(data, w)
+
+    # a second batch is merged with +, which rounds means differently from filling row by row
+    monkeypatch.setattr(util, "relativeTolerance", 1e-12)
+    monkeypatch.setattr(util, "absoluteTolerance", 1e-12)
+    h.fill.numba(data, w, jit=False)
+    assert h == _expected(data, w, 2)
+
+
+def test_fill_numba_unweighted():
+    h = hg.Bin(4, 0.0, 1.0, lambda d: d["x"])
+    h.fill.numba({"x": np.array([-1.0, 0.1, 0.3, 0.3, 2.0, np.nan])}, jit=False)
+    assert [v.entries for v in h.values] == [1.0, 2.0, 0.0, 0.0]
+    assert (h.underflow.entries, h.overflow.entries, h.nanflow.entries) == (1.0, 1.0, 1.0)
+
+
+def test_fill_numba_bin_edges():
+    h = hg.Bin(10, -1.0, 0.7, lambda d: d["x"], hg.Sum(lambda d: d["x"]))
+    edges = np.linspace(-1.0, 0.7, 11)
+    x = np.concatenate([edges, np.nextafter(edges, -np.inf), np.nextafter(edges, np.inf), [-np.inf, np.inf, np.nan]])
+    h.fill.numba({"x": x}, jit=False)
+    expected = hg.Bin(10, -1.0, 0.7, lambda d: d["x"], hg.Sum(lambda d: d["x"]))
+    for xi in x.tolist():
+        expected.fill(Datum(x=xi))
+    assert h == expected
+    assert (h.underflow.entries, h.overflow.entries, h.nanflow.entries) == (2.0, 3.0, 1.0)
+
+
+def test_fill_numba_storage_limit(monkeypatch):
+    from histogrammar import numbafill
+    monkeypatch.setattr(numbafill, "maxStorageSize", 2000)
+    h = hg.Bin(100, 0.0, 1.0, lambda d: d["x"], hg.SparselyBin(0.001, lambda d: d["x"], hg.Deviate(lambda d: d["x"])))
+    with pytest.raises(NotImplementedError):
+        h.fill.numba({"x": np.linspace(0.0, 1.0, 200)}, jit=False)
+    assert h.entries == 0.0
+    h.fill.numba({"x": np.linspace(0.0, 0.1, 3)}, jit=False)
+    assert h.entries == 3.0
+
+
+def test_fill_numba_errors():
+    with pytest.raises(NotImplementedError):
+        hg.Stack([0.0, 1.0], lambda d: d["x"]).fill.numba({"x": np.zeros(3)}, jit=False)
+    with pytest.raises(TypeError):
+        hg.Categorize(lambda d: d["x"]).fill.numba({"x": np.ones(3)}, jit=False)
+
+
+def test_fill_numba_jit():
+    pytest.importorskip("numba")
+    data, w = _data()
+    h = _make()
+    h.fill.numba(data, w)
+    assert h == _expected(data, w)
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+import histogrammar as hg
+from histogrammar.parsing import C99AstToSource, C99SourceToAst, cachedParser, vectorizedExpression
+
+
+def test_parser_is_shared():
+    assert C99SourceToAst().parser is C99SourceToAst(wholeFile=True).parser is cachedParser()
+
+
+def test_parsed_expressions_are_memoized_copies():
+    parser = C99SourceToAst()
+    generator = C99AstToSource()
+    first = parser("x + y * 2")
+    # the code generators rename identifiers in place; that must not leak into the memoized AST
+    first[0].left.name = "renamed"
+    second = parser("x + y * 2")
+    assert second[0] is not first[0]
+    assert generator(second) == "x + (y * 2)"
+    assert generator(parser("double z = x; z * z")) == "double z = x; z * z"
+
+
+def test_vectorized_expressions():
+    x = np.array([-2.5, -0.5, 0.5, 3.0])
+    y = np.array([1.0, 0.0, 2.0, -1.0])
+    columns = {"x": x, "y": y, "unused": None}
+    np.testing.assert_array_equal(vectorizedExpression("x > 0 && !(y < 1)")(columns), [False, False, True, False])
+    np.testing.assert_array_equal(vectorizedExpression("x < 0 ? -x : x * 2")(columns), [2.5, 0.5, 1.0, 6.0])
+    np.testing.assert_array_equal(vectorizedExpression("(int) x % 2")(columns), [0, 0, 0, 1])
+    np.testing.assert_allclose(vectorizedExpression("double r = hypot(x, y); sqrt(r * r)")(columns), np.hypot(x, y))
+    assert vectorizedExpression("atan2(y, x) + M_PI").variables == ["y", "x"]
+    # parsed once per string
+    assert vectorizedExpression("x > 0 && !(y < 1)") is vectorizedExpression("x > 0 && !(y < 1)")
+    # Python-only or unsupported C: no translation
+    for src in ("x ** 2", "x if y else 0", "np.sqrt(x)", "erf(x)", "x = 3"):
+        assert vectorizedExpression(src) is None
+
+
+@pytest.mark.parametrize("src,expected", [
+    ("(int) x / 2", [1, -1, 3]),
+    ("int n = x; n / 2", [1, -1, 3]),
+    ("(int) x % 2", [1, -1, 1]),
+    ("int n = x; n % -2", [1, -1, 1]),
+    ("(double) (int) x / 2", [1.5, -1.5, 3.5]),
+    ("int n = x; n / 2.0", [1.5, -1.5, 3.5]),
+])
+def test_vectorized_integer_division_is_c(src, expected):
+    # only C, so with its C meaning, as in the C backends
+    result = vectorizedExpression(src)({"x": np.array([3.0, -3.0, 7.5])})
+    np.testing.assert_array_equal(result, expected)
+    assert np.issubdtype(result.dtype, np.integer) == isinstance(expected[0], int)
+
+
+def test_vectorized_float_remainder_is_not_c():
+    assert vectorizedExpression("(int) x % 2.0") is None
+    assert vectorizedExpression("double r = x; r % 2") is None
+
+
+def test_fill_numpy_with_c99_strings():
+    rng = np.random.default_rng(3)
+    data = {"x": rng.normal(size=200), "y": rng.normal(size=200)}
+    h = hg.Select("x > 0 && y > 0", hg.Bin(10, 0.0, 3.0, "sqrt(x*x + y*y)"))
+    h.fill.numpy(data)
+    expected = hg.Select(lambda d: np.logical_and(d["x"] > 0, d["y"] > 0),
+                         hg.Bin(10, 0.0, 3.0, lambda d: np.sqrt(d["x"]**2 + d["y"]**2)))
+    expected.fill.numpy(data)
+    assert h.entries == expected.entries
+    assert h.cut.values == expected.cut.values
+
+    # Python expressions keep working, including for unstructured arrays
+    h = hg.Bin(10, 0.0, 9.0, "x ** 2")
+    h.fill.numpy(data["x"])
+    expected = hg.Bin(10, 0.0, 9.0, lambda x: x ** 2)
+    expected.fill.numpy(data["x"])
+    assert h.values == expected.values
+
+
+@pytest.mark.parametrize("make", [
+    lambda: hg.Bin(3, 0.0, 3.0, "x % 3"),
+    lambda: hg.Bin(4, -3.0, 3.0, "x // 2"),
+    lambda: hg.Bin(4, 0.0, 4.0, "i / 2"),
+    lambda: hg.Bin(4, 0.0, 4.0, "i % 3 + x * 0"),
+    lambda: hg.Select("0 < x < 3", hg.Count()),
+    lambda: hg.Select("-2 <= x < i <= 7", hg.Count()),
+    lambda: hg.Select("i & 1 == 0", hg.Count()),
+])
+def test_fill_and_fill_numpy_agree(make):
+    data = {"x": np.array([-3.5, -1.0, 2.0, 4.5]), "i": np.array([1, 2, 3, 7])}
+    h1 = make()
+    for x, i in zip(data["x"].tolist(), data["i"].tolist()):
+        h1.fill({"x": x, "i": i})
+    h2 = make()
+    h2.fill.numpy(data)
+    assert h1.toJson() == h2.toJson()
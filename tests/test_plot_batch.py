@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import histogrammar as hg
+
+pytest.importorskip("matplotlib")
+
+from histogrammar.plot.batch import extract_plot_data, plot_many  # noqa: E402
+
+
+def _hists():
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({"x": rng.normal(size=1000), "c": rng.choice(["a", "b", "c"], 1000)})
+    hists = {
+        "bin": hg.Bin(20, -3, 3, "x"),
+        "sparse": hg.SparselyBin(0.5, "x"),
+        "irregular": hg.IrregularlyBin([-1, 0, 1], "x"),
+        "central": hg.CentrallyBin([-1, 0, 1], "x"),
+        "cat/egory": hg.Categorize("c"),
+        "2d": hg.Categorize("c", hg.Bin(5, -3, 3, "x")),
+    }
+    for h in hists.values():
+        h.fill.numpy(df)
+    hists["empty"] = hg.SparselyBin(0.5, "x")
+    return hists
+
+
+def test_extract_plot_data():
+    hists = _hists()
+    data = extract_plot_data(hists["bin"])
+    assert data["kind"] == "steps" and data["title"] == "Bin"
+    assert np.array_equal(data["edges"], hists["bin"].bin_edges())
+    assert np.array_equal(data["values"], hists["bin"].bin_entries())
+
+    data = extract_plot_data(hists["cat/egory"], "c")
+    assert data["kind"] == "labels" and data["labels"] == ["a", "b", "c"] and data["title"] == "c"
+    assert extract_plot_data(hists["2d"])["values"].shape == (5, 3)
+    with pytest.raises(TypeError):
+        extract_plot_data(hg.Average("x"))
+
+
+@pytest.mark.parametrize("workers,fmt", [(1, "png"), (2, "svg")])
+def test_plot_many(tmp_path, workers, fmt):
+    hists = _hists()
+    files = plot_many(hists, str(tmp_path / "plots"), fmt=fmt, workers=workers)
+    assert list(files) == list(hists)
+    assert os.path.basename(files["cat/egory"]) == "cat_egory." + fmt
+    for path in files.values():
+        assert os.path.getsize(path) > 0
+
+    files = plot_many(list(hists.values())[:2], str(tmp_path / "list"), workers=workers)
+    assert sorted(os.path.basename(f) for f in files.values()) == ["0.png", "1.png"]
@@ -115,6 +115,8 @@ class TestRootCling(unittest.TestCase):
         self.testIndexBin()
         self.testBranchBin()
         self.testBag()
+        self.testEntryRanges()
+        self.testFillRootParallel()
 
     # Timing
 
@@ -1177,3 +1179,24 @@ public:
                             x, x]), "N2"), self.noholes)
             self.compare("Bag strings noholes", Bag("to_string((int)floor(noholes))", "S"), Bag(
                 named("to_string((int)floor(noholes))", lambda x: str(int(math.floor(x)))), "S"), self.noholes)
+
+    # Parallel filling
+
+    def testEntryRanges(self):
+        from histogrammar.rootparallel import splitRanges
+        self.assertEqual(splitRanges(0, 100, 4), [(0, 25), (25, 50), (50, 75), (75, 100)])
+        self.assertEqual(splitRanges(10, 13, 8), [(10, 11), (11, 12), (12, 13)])
+        self.assertEqual(splitRanges(5, 5, 4), [])
+        # cuts move to nearby cluster starts, but not to far-away ones
+        self.assertEqual(splitRanges(0, 100, 4, [20, 48, 90]), [(0, 20), (20, 48), (48, 75), (75, 100)])
+
+    def testFillRootParallel(self):
+        if TestRootCling.tchainFlat is not None:
+            reports = []
+            parallel = Branch(Bin(100, -3.0, 3.0, "withholes", Average("noholes")), Sum("positive"))
+            parallel.fill.rootparallel(TestRootCling.tchainFlat, numWorkers=2, numRanges=5,
+                                       progress=lambda done, total, seconds: reports.append((done, total)))
+            serial = Branch(Bin(100, -3.0, 3.0, "withholes", Average("noholes")), Sum("positive"))
+            serial.fill.root(TestRootCling.tchainFlat)
+            self.assertEqual(parallel, serial)
+            self.assertEqual(reports[-1], (TestRootCling.tchainFlat.GetEntries(),) * 2)
@@ -288,3 +288,23 @@ def test_null_histograms(spark_co):
     h = hists['eyeColor']
     assert 'NaN' in h.bins
     assert h.bins['NaN'].entries == 2
+
+
+# @pytest.mark.spark
+@pytest.mark.skipif(not spark_found, reason="spark not found")
+def test_fill_sparksql_reuses_aggregator(spark_co):
+    import histogrammar as hg
+
+    spark = spark_co
+    sdf = spark.createDataFrame(data=[(1.0, 2.0), (3.0, 4.0), (5.0, None)], schema=["x", "y"])
+
+    h = hg.Bin(10, 0.0, 10.0, sdf["x"], hg.Sum(sdf["y"]))
+    h.fill.sparksql(sdf)
+    cached = h._sparksqlAggregator(spark.sparkContext)
+    h.fill.sparksql(sdf)
+    assert h._sparksqlAggregator(spark.sparkContext)[1] is cached[1]
+    assert h.entries == 6.0
+
+    # same structure and Columns: the JVM aggregator is shared
+    other = hg.Bin(10, 0.0, 10.0, h.quantity.expr, hg.Sum(h.values[0].quantity.expr))
+    assert other._sparksqlAggregator(spark.sparkContext)[1] is cached[1]
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+
+from histogrammar.dfinterface.make_histograms import make_histograms
+from histogrammar.store import HistogramStore
+
+
+def _make_hists(df):
+    return make_histograms(
+        df,
+        features=["age", "eyeColor", "latitude", "isActive:age"],
+        bin_specs={"latitude": {"binWidth": 5, "origin": 0}},
+    )
+
+
+def test_store_roundtrip(tmp_path):
+    path = str(tmp_path / "hists.hgs")
+    hists = _make_hists(pytest.test_df)
+
+    with HistogramStore(path, mode="w") as store:
+        store.append("2022-06-01", hists)
+
+    store = HistogramStore(path)
+    assert len(store) == len(hists)
+    assert store.names() == ["2022-06-01"]
+    assert store.features("2022-06-01") == sorted(hists.keys())
+    for feature, h in hists.items():
+        assert ("2022-06-01", feature) in store
+        assert store.get("2022-06-01", feature).toJson() == h.toJson()
+
+    np.testing.assert_array_equal(store.bin_entries("2022-06-01", "latitude"), hists["latitude"].bin_entries())
+    np.testing.assert_array_equal(store.bin_edges("2022-06-01", "latitude"), hists["latitude"].bin_edges())
+    np.testing.assert_array_equal(store.bin_labels("2022-06-01", "eyeColor"), hists["eyeColor"].bin_labels())
+    with pytest.raises(KeyError):
+        store.bin_edges("2022-06-01", "eyeColor")
+    with pytest.raises(KeyError):
+        store.get("2022-06-02", "age")
+    with pytest.raises(IOError):
+        store.append("2022-06-02", hists)
+    store.close()
+
+
+def test_store_append(tmp_path):
+    path = str(tmp_path / "hists.hgs")
+    df = pytest.test_df
+    first = _make_hists(df[:200])
+    second = _make_hists(df[200:])
+
+    with HistogramStore(path, mode="a") as store:
+        store.append("slice0", first)
+    with HistogramStore(path, mode="a") as store:
+        # keep a view on the old map alive while appending
+        entries = store.bin_entries("slice0", "age")
+        store.append("slice1", second)
+        assert store.names() == ["slice0", "slice1"]
+        np.testing.assert_array_equal(entries, first["age"].bin_entries())
+
+        total = store.get("slice0", "age") + store.get("slice1", "age")
+        assert total.entries == len(df)
+
+        # re-appending under an existing name replaces those features only
+        store.append("slice0", {"age": second["age"]})
+        assert len(store) == 2 * len(first)
+        assert store.get("slice0", "age").toJson() == second["age"].toJson()
+        assert store.get("slice0", "eyeColor").toJson() == first["eyeColor"].toJson()
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import histogrammar as hg
+from histogrammar.streaming import LocalStream, WindowedAggregator
+
+
+def _batch(times, x):
+    return {"t": np.asarray(times, dtype=float), "x": np.asarray(x, dtype=float)}
+
+
+def _hist():
+    return hg.Bin(5, 0.0, 5.0, "x")
+
+
+def _entries(h):
+    return [v.entries for v in h.values]
+
+
+def test_tumbling_windows():
+    agg = WindowedAggregator(_hist(), window=10, history=2, time_column="t")
+    agg.fill(_batch([1, 2, 9], [0.5, 1.5, 1.5]))
+    agg.fill(_batch([12, 15], [3.5, 3.5]))
+    assert _entries(agg.current()) == [0, 0, 0, 2, 0]
+    (start0, end0, first), (start1, end1, second) = agg.windows()
+    assert (start0, end0, start1, end1) == (0, 10, 10, 20)
+    assert _entries(first) == [1, 2, 0, 0, 0]
+    assert second == agg.current()
+
+    # the watermark moves to the third window: the first expires, late rows for it are dropped
+    agg.fill(_batch([25, 3], [4.5, 0.5]))
+    assert [w[0] for w in agg.windows()] == [10, 20]
+    assert agg.late_entries == 1.0
+    assert _entries(agg.merged(0, 30)) == [0, 0, 0, 2, 1]
+
+
+def test_sliding_windows_match_refilling():
+    rng = np.random.default_rng(4)
+    times = np.sort(rng.uniform(0, 100, size=2000))
+    x = rng.uniform(0, 5, size=2000)
+    w = rng.uniform(0, 1, size=2000)
+
+    stream = LocalStream()
+    for i in range(0, 2000, 137):
+        stream.produce(pd.DataFrame({"t": times[i:i + 137], "x": x[i:i + 137], "w": w[i:i + 137]}))
+    agg = WindowedAggregator(_hist(), window=30, slide=5, time_column="t")
+    assert agg.consume(stream, weights_column="w") == 15
+    assert len(stream) == 0
+
+    # the current window covers [70, 100): the same as filling those rows directly
+    expected = _hist()
+    mask = times >= 70
+    expected.fill.numpy({"x": x[mask]}, w[mask])
+    assert agg.current().entries == pytest.approx(expected.entries)
+    np.testing.assert_allclose(_entries(agg.current()), _entries(expected))
+    # only the panes of the current window are kept
+    assert len(agg._panes) == 6
+
+
+def test_datetime_timestamps():
+    start = np.datetime64("2024-01-01T00:00:00")
+    times = start + np.array([0, 30, 61, 62], dtype="timedelta64[s]")
+    agg = WindowedAggregator(_hist(), window=np.timedelta64(1, "m"), history=2, origin=start)
+    agg.fill({"x": np.array([0.5, 1.5, 2.5, 2.5])}, timestamps=times)
+    assert _entries(agg.current()) == [0, 0, 2, 0, 0]
+    assert agg.merged(start, start + np.timedelta64(2, "m")).entries == 4
+
+
+def test_epoch_nanoseconds():
+    # panes of nanosecond timestamps since the epoch, which float64 can't tell apart
+    start = np.datetime64("2024-01-01T00:00:00", "ns")
+    boundary = start + np.timedelta64(1, "us")
+    agg = WindowedAggregator(_hist(), window=np.timedelta64(1, "us"), history=2)
+    agg.fill({"x": np.array([0.5, 1.5])}, timestamps=np.array([boundary - np.timedelta64(1, "ns"), boundary]))
+    first = int(start.astype(np.int64)) // 1000
+    assert [index for index, _ in agg._panes] == [first, first + 1]
+    assert _entries(agg.current()) == [0, 1, 0, 0, 0]
+    assert agg.merged(start, boundary).entries == 1
+
+
+def test_invalid_windows():
+    with pytest.raises(ValueError):
+        WindowedAggregator(_hist(), window=10, slide=3)
+    with pytest.raises(ValueError):
+        WindowedAggregator(_hist(), window=10).fill(_batch([1], [1]))
@@ -0,0 +1,59 @@
+import json
+
+import numpy as np
+import pytest
+
+import histogrammar as hg
+from histogrammar.plot.vega.jsontrans import JsonArray, JsonObject
+from histogrammar.plot.vega.spec import _TEMPLATES, histogramJson, histogramSpec
+
+
+def _values(spec):
+    return spec["data"][0]["values"][0]
+
+
+def test_binned_spec_is_columnar():
+    h = hg.SparselyBin(0.5, "x")
+    h.fill.numpy({"x": np.array([0.1, 0.2, 1.7, 3.0])})
+    spec = histogramSpec(h, "x", width=300)
+    assert spec["title"] == "x"
+    assert spec["width"] == 300
+    values = _values(spec)
+    assert values["x0"] == h.bin_edges()[:-1].tolist()
+    assert values["x1"] == h.bin_edges()[1:].tolist()
+    assert values["y"] == [2.0, 0.0, 0.0, 1.0, 0.0, 0.0, 1.0]
+    assert spec["data"][0]["transform"] == [{"type": "flatten", "fields": ["x0", "x1", "y"]}]
+    assert json.loads(histogramJson(h, "x", width=300)) == spec
+
+
+def test_labels_and_grid_specs():
+    c = hg.Categorize("c")
+    c.fill.numpy({"c": np.array(["b", "a", "b"])})
+    assert _values(histogramSpec(c)) == {"x": ["a", "b"], "y": [1.0, 2.0]}
+
+    h = hg.Bin(2, 0, 1, "x", hg.Categorize("c"))
+    h.fill.numpy({"x": np.array([0.1, 0.2, 0.7]), "c": np.array(["a", "b", "a"])})
+    spec = histogramSpec(h)
+    values = _values(spec)
+    assert len(values["x"]) == len(values["y"]) == len(values["z"]) == 4
+    assert sum(values["z"]) == 3.0
+    assert [s["domain"] for s in spec["scales"][:2]] == [["0.25", "0.75"], ["a", "b"]]
+
+    with pytest.raises(TypeError):
+        histogramSpec(hg.Count())
+
+
+def test_templates_are_not_changed():
+    h = hg.Bin(3, 0, 1, "x")
+    histogramSpec(h)["scales"][0]["type"] = "log"
+    assert histogramSpec(h)["scales"][0]["type"] == "linear"
+    assert "values" not in _TEMPLATES["steps"]["data"][0]
+
+
+def test_jsontrans_overlay():
+    obj = JsonObject(("a", 1), ("b", JsonArray(1, 2)))
+    out = obj.overlay(JsonObject(("b", 3), ("c", 4), ("c", 5)))
+    assert out == JsonObject(("a", 1), ("b", 3), ("c", 5))
+    assert out["c"] == 5 and "a" in out and "d" not in out
+    assert str(obj) == '{"a":1,"b":[1,2]}'
+    assert obj.set("a", to=2)["a"] == 2